@@ -16,6 +16,7 @@
 #
 # You should have received a copy of the GNU Lesser General Public
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
+import contextlib
 import os
 import time
 from gettext import gettext as _
@@ -36,6 +37,7 @@ from pitivi.settings import GlobalSettings
 from pitivi.settings import xdg_cache_home
 from pitivi.shortcuts import ShortcutsManager
 from pitivi.shortcuts import show_shortcuts
+from pitivi.timeline.previewers import Previewer
 from pitivi.undo.project import ProjectObserver
 from pitivi.undo.undo import UndoableActionLog
 from pitivi.utils import loggable
@@ -43,6 +45,7 @@ from pitivi.utils.loggable import Loggable
 from pitivi.utils.misc import path_from_uri
 from pitivi.utils.misc import quote_uri
 from pitivi.utils.proxy import ProxyManager
+from pitivi.utils.scenario import ScenarioRecorder
 from pitivi.utils.system import get_system
 from pitivi.utils.threads import ThreadMaster
 from pitivi.utils.timeline import Zoomable
@@ -79,7 +82,6 @@ class Pitivi(Gtk.Application, Loggable):
 
         self.action_log = None
         self.project_observer = None
-        self._last_action_time = Gst.util_get_timestamp()
 
         self.gui = None
         self.recent_manager = Gtk.RecentManager.get_default()
@@ -87,30 +89,15 @@ class Pitivi(Gtk.Application, Loggable):
 
         self._version_information = {}
 
-        self._scenario_file = None
-        self._first_action = True
+        self._scenario_recorder = None
 
         Zoomable.app = self
         self.shortcuts = ShortcutsManager(self)
 
     def write_action(self, action, **kwargs):
-        if self._scenario_file is None:
+        if self._scenario_recorder is None:
             return
 
-        if self._first_action:
-            self._scenario_file.write(
-                "description, seek=true, handles-states=true\n")
-            self._first_action = False
-
-        now = Gst.util_get_timestamp()
-        if now - self._last_action_time > 0.05 * Gst.SECOND:
-            # We need to make sure that the waiting time was more than 50 ms.
-            st = Gst.Structure.new_empty("wait")
-            st["duration"] = float((now - self._last_action_time) / Gst.SECOND)
-            self._scenario_file.write(st.to_string())
-            self._scenario_file.write("\n")
-            self._last_action_time = now
-
         if not isinstance(action, Gst.Structure):
             structure = Gst.Structure.new_empty(action)
 
@@ -120,9 +107,8 @@ class Pitivi(Gtk.Application, Loggable):
 
             action = structure
 
-        self._scenario_file.write(action.to_string())
-        self._scenario_file.write("\n")
-        self._scenario_file.flush()
+        self._scenario_recorder.record(action)
+        self.project_manager.record_action(action)
 
     def do_startup(self):
         Gtk.Application.do_startup(self)
@@ -244,24 +230,28 @@ class Pitivi(Gtk.Application, Loggable):
         else:
             # New project.
             project_path = None
-        if 'PITIVI_SCENARIO_FILE' in os.environ:
+        cache_dir = xdg_cache_home("scenarios")
+        custom_scenario = 'PITIVI_SCENARIO_FILE' in os.environ
+        if custom_scenario:
             scenario_path = os.environ['PITIVI_SCENARIO_FILE']
         else:
-            cache_dir = xdg_cache_home("scenarios")
             scenario_name = str(time.strftime("%Y%m%d-%H%M%S"))
             if project_path:
                 scenario_name += os.path.splitext(project_path.replace(os.sep, "_"))[0]
             scenario_path = os.path.join(cache_dir, scenario_name + ".scenario")
 
         scenario_path = path_from_uri(quote_uri(scenario_path))
-        self._scenario_file = open(scenario_path, "w")
+        self._scenario_recorder = ScenarioRecorder(scenario_path)
+        if not custom_scenario:
+            # Off the main thread, before the project snapshot is stored.
+            self._scenario_recorder.prune_scenarios(
+                cache_dir,
+                max_age=self.settings.scenarios_max_age * 24 * 60 * 60,
+                max_size=self.settings.scenarios_max_size * 1024 * 1024)
 
         if project_path and not project_path.endswith(".scenario"):
             # It's an xges file probably.
-            with open(project_path) as project:
-                content = project.read().replace("\n", "")
-                self.write_action("load-project",
-                                  serialized_content=content)
+            self._scenario_recorder.record_project(project_path, cache_dir)
 
     def _new_project_loaded_cb(self, unused_project_manager, project):
         uri = project.get_uri()
@@ -276,10 +266,13 @@ class Pitivi(Gtk.Application, Loggable):
                     raise e
             self.recent_manager.add_item(uri)
 
-        self.action_log = UndoableActionLog()
+        self.action_log = UndoableActionLog(max_operations=self.settings.undo_max_operations,
+                                            max_actions=self.settings.undo_max_actions)
+        self.action_log.profiling = self.settings.undo_profiling
         self.action_log.connect("pre-push", self._action_log_pre_push_cb)
         self.action_log.connect("commit", self._action_log_commit)
         self.action_log.connect("move", self._action_log_move_cb)
+        project.pipeline.set_action_log(self.action_log)
         self.project_observer = ProjectObserver(project, self.action_log)
 
         self._set_scenario_file(project.get_uri())
@@ -288,15 +281,18 @@ class Pitivi(Gtk.Application, Loggable):
         if uri:
             self.recent_manager.add_item(uri)
 
+        if self._scenario_recorder:
+            self._scenario_recorder.sync()
+
     def _project_closed_cb(self, unused_project_manager, project):
         if project.loaded:
             self.action_log = None
             self._sync_do_undo()
 
-        if self._scenario_file:
+        if self._scenario_recorder:
             self.write_action("stop")
-            self._scenario_file.close()
-            self._scenario_file = None
+            self._scenario_recorder.close()
+            self._scenario_recorder = None
 
     def _check_version(self):
         """Checks online for new versions of the app."""
@@ -356,10 +352,30 @@ class Pitivi(Gtk.Application, Loggable):
         self.shutdown()
 
     def _undo_cb(self, unused_action, unused_param):
-        self.action_log.undo()
+        with self.__batched_history_move():
+            self.action_log.undo()
 
     def _redo_cb(self, unused_action, unused_param):
-        self.action_log.redo()
+        with self.__batched_history_move():
+            self.action_log.redo()
+
+    @contextlib.contextmanager
+    def __batched_history_move(self):
+        """Minimizes the UI work done while undoing or redoing an operation.
+
+        The previewers are paused and the timeline widgets are updated
+        only once at the end. The timeline is committed at most once anyway,
+        when the operation ends, see `Pipeline.set_action_log`.
+        """
+        project = self.project_manager.current_project
+        timeline = project.ges_timeline.ui if project else None
+        with Previewer.manager.paused():
+            if not timeline:
+                yield
+                return
+
+            with timeline.updates_batched():
+                yield
 
     def _show_shortcuts_cb(self, unused_action, unused_param):
         show_shortcuts(self)
@@ -372,9 +388,11 @@ class Pitivi(Gtk.Application, Loggable):
     def _action_log_commit(self, action_log, unused_stack):
         if action_log.is_in_transaction():
             return
+        self.project_manager.commit_journal()
         self._sync_do_undo()
 
     def _action_log_move_cb(self, action_log, unused_stack):
+        self.project_manager.commit_journal()
         self._sync_do_undo()
 
     def _sync_do_undo(self):
@@ -503,7 +503,7 @@ class EffectProperties(Gtk.Expander, Loggable):
                                              finalizing_action=CommitTimelineFinalizingAction(
                                                  pipeline),
                                              toplevel=True):
-                effect = self.clip.ui.add_effect(effect_info)
+                effect = self.app.effects.add_effect(self.clip, effect_info)
                 if effect:
                     self.clip.set_top_effect_index(effect, drop_index)
 
@@ -677,13 +677,15 @@ class TransformationProperties(Gtk.Expander, Loggable):
             else:
                 self._activate_keyframes_btn.set_tooltip_text(
                     _("Activate keyframes"))
-            self.source.ui_element.show_default_keyframes()
+            if getattr(self.source, "ui_element", None):
+                self.source.ui_element.show_default_keyframes()
         else:
             self._prev_keyframe_btn.set_sensitive(True)
             self._next_keyframe_btn.set_sensitive(True)
             self._activate_keyframes_btn.set_tooltip_text(_("Hide keyframes"))
-            self.source.ui_element.show_multiple_keyframes(
-                list(self.__control_bindings.values()))
+            if getattr(self.source, "ui_element", None):
+                self.source.ui_element.show_multiple_keyframes(
+                    list(self.__control_bindings.values()))
 
     def __update_control_bindings(self):
         self.__control_bindings = {}
@@ -759,7 +761,7 @@ class TransformationProperties(Gtk.Expander, Loggable):
 
             for prop in ["posx", "posy", "width", "height"]:
                 self.source.set_child_property(
-                    prop, self.source.ui.default_position[prop])
+                    prop, self.source.positioner.default_position[prop])
 
         self.__update_keyframes_ui()
 
@@ -137,6 +137,9 @@ class EditorPerspective(Perspective, Loggable):
 
             for ges_layer in ges_timeline.get_layers():
                 for ges_clip in ges_layer.get_clips():
+                    if not getattr(ges_clip, "ui", None):
+                        # The previewers are created with the widget.
+                        continue
                     if ges_clip.get_asset().props.id in changed_files_uris:
                         if ges_clip.ui.audio_widget:
                             ges_clip.ui.audio_widget.update_previewer()
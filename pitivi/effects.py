@@ -321,6 +321,36 @@ class EffectsManager(Loggable):
         name = EffectInfo.name_from_bin_description(bin_description)
         return self._effects.get(name)
 
+    def add_effect(self, ges_clip, effect_info):
+        """Adds the specified effect if it can be applied to the clip.
+
+        Args:
+            ges_clip (GES.Clip): The clip to which to add the effect.
+            effect_info (EffectInfo): The effect to add.
+
+        Returns:
+            GES.BaseEffect: The added effect, or the duplicate effect found
+            if the effect can be applied only once, or None.
+        """
+        factory_name = effect_info.effect_name
+        if factory_name in ALLOWED_ONLY_ONCE_EFFECTS:
+            for effect in ges_clip.find_track_elements(None, GES.TrackType.VIDEO,
+                                                       GES.BaseEffect):
+                for elem in effect.get_nleobject().iterate_recurse():
+                    if elem.get_factory().get_name() == factory_name:
+                        self.error("Not adding %s as it would be duplicate"
+                                   " and this is not allowed.", factory_name)
+                        # TODO Let the user know about why it did not work.
+                        return effect
+
+        for track_element in ges_clip.get_children(False):
+            if effect_info.good_for_track_element(track_element):
+                # Actually add the effect
+                effect = GES.Effect.new(effect_info.bin_description)
+                ges_clip.add(effect)
+                return effect
+        return None
+
     def _get_effect_categories(self, effect_name):
         """Gets the categories to which the specified effect belongs.
 
@@ -544,7 +574,7 @@ class EffectListWidget(Gtk.Box, Loggable):
         with self.app.action_log.started("add effect",
                                          finalizing_action=CommitTimelineFinalizingAction(pipeline),
                                          toplevel=True):
-            clip.ui.add_effect(effect_info)
+            self.app.effects.add_effect(clip, effect_info)
 
     def _set_fav_button_state(self, button, is_active):
         """Manages the state of the favourite button."""
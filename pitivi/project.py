@@ -56,7 +56,10 @@ from pitivi.utils.misc import quote_uri
 from pitivi.utils.misc import scale_pixbuf
 from pitivi.utils.misc import unicode_error_dialog
 from pitivi.utils.pipeline import Pipeline
+from pitivi.utils.proxy import AssetClipsIndex
 from pitivi.utils.ripple_update_group import RippleUpdateGroup
+from pitivi.utils.scenario import ProjectJournal
+from pitivi.utils.timeline import FrameGrid
 from pitivi.utils.ui import AUDIO_CHANNELS
 from pitivi.utils.ui import AUDIO_RATES
 from pitivi.utils.ui import beautify_time_delta
@@ -107,7 +110,7 @@ class ProjectManager(GObject.Object, Loggable):
     """The project manager.
 
     Allows the app to close and then load a different project, handle failures,
-    make automatic backups.
+    make automatic backups and journal the operations done since the last save.
 
     Attributes:
         app (Pitivi): The app.
@@ -135,6 +138,9 @@ class ProjectManager(GObject.Object, Loggable):
         self.current_project = None
         self.disable_save = False
         self._backup_lock = 0
+        self._journal = None
+        # The path of the journal replayed for recovering the current project.
+        self._replayed_journal_path = None
         self.exitcode = 0
         self.__start_loading_time = 0
         self.time_loaded = 0
@@ -168,6 +174,53 @@ class ProjectManager(GObject.Object, Loggable):
 
         return uri
 
+    def _try_using_journal(self, uri):
+        """Asks whether to recover the operations journaled for the project.
+
+        The journal is offered only when it is at least as recent as the
+        backup file, because the backup contains all the changes, while
+        the journal contains only the ones which can be replayed.
+
+        Returns:
+            str: The URI of the journal if it should be replayed, otherwise
+            the specified project URI.
+        """
+        if has_validate is not True:
+            # The journal cannot be replayed, fallback to the backup file.
+            return uri
+
+        try:
+            path = path_from_uri(uri)
+        except UnicodeEncodeError:
+            return uri
+        journal_uri = self._make_journal_uri(uri)
+        journal_path = self._make_journal_uri(path)
+        try:
+            journal_mtime = os.path.getmtime(journal_path)
+        except OSError:
+            self.debug("Journal does not exist: %s", journal_path)
+            return uri
+
+        backup_path = self._make_backup_uri(path)
+        try:
+            use_journal = journal_mtime >= os.path.getmtime(backup_path)
+        except OSError:
+            use_journal = True
+
+        if not use_journal:
+            self.debug("Backup file is newer than the journal: %s", backup_path)
+        elif self._restore_from_journal_dialog():
+            self.debug("Replaying the journal: %s", journal_uri)
+            self._replayed_journal_path = journal_path
+            return journal_uri
+
+        # The journal is obsolete or the user does not want it.
+        try:
+            os.remove(journal_path)
+        except OSError as e:
+            self.warning("Failed removing the journal %s: %s", journal_path, e)
+        return uri
+
     def _is_validate_scenario(self, uri):
         if uri.endswith(".scenario") and has_validate is True:
             # Let's just normally fail if we do not have Validate
@@ -245,11 +298,15 @@ class ProjectManager(GObject.Object, Loggable):
     def load_project(self, uri):
         """Loads the specified URI as a project.
 
-        If a backup file exists, asks if it should be loaded instead, and if so,
-        forces the user to use "Save as" afterwards.
+        If a journal of the operations done after the project has been saved
+        exists, asks if it should be replayed. Otherwise, if a backup file
+        exists, asks if it should be loaded instead, and if so, forces the user
+        to use "Save as" afterwards.
         """
         assert self.current_project is None
 
+        if not self._is_validate_scenario(uri):
+            uri = self._try_using_journal(uri)
         is_validate_scenario = self._is_validate_scenario(uri)
         if not is_validate_scenario:
             uri = self._try_using_backup_file(uri)
@@ -289,24 +346,43 @@ class ProjectManager(GObject.Object, Loggable):
         Args:
             time_diff (int): The difference, in seconds, between file mtimes.
         """
+        message = _("An autosaved version of your project file was found. "
+                    "It is %s newer than the saved project.\n\n"
+                    "Would you like to load it instead?") % \
+            beautify_time_delta(time_diff)
+        return self.__run_restore_dialog(message,
+                                         _("Ignore backup"),
+                                         _("Restore from backup"),
+                                         "restore from backup dialog")
+
+    def _restore_from_journal_dialog(self):
+        """Asks if we need to replay the operations journaled for the project."""
+        message = _("Pitivi did not close properly the last time this "
+                    "project was edited. A journal of the unsaved changes "
+                    "was found. Replaying it recovers the editing operations, "
+                    "but some changes, such as effect or keyframe changes, "
+                    "might be missing. The recovered project has to be saved "
+                    "as a new file.\n\n"
+                    "Would you like to replay the journal?")
+        return self.__run_restore_dialog(message,
+                                         _("Ignore journal"),
+                                         _("Replay journal"),
+                                         "recover unsaved changes dialog")
+
+    def __run_restore_dialog(self, message, ignore_label, restore_label, name):
         dialog = Gtk.Dialog(title="", transient_for=self.app.gui)
-        ignore_backup_btn = dialog.add_button(_("Ignore backup"), Gtk.ResponseType.REJECT)
-        ignore_backup_btn.get_style_context().add_class("destructive-action")
-        dialog.add_button(_("Restore from backup"), Gtk.ResponseType.YES)
+        ignore_btn = dialog.add_button(ignore_label, Gtk.ResponseType.REJECT)
+        ignore_btn.get_style_context().add_class("destructive-action")
+        dialog.add_button(restore_label, Gtk.ResponseType.YES)
         dialog.set_icon_name("pitivi")
         dialog.set_modal(True)
         dialog.set_default_response(Gtk.ResponseType.YES)
-        dialog.get_accessible().set_name("restore from backup dialog")
+        dialog.get_accessible().set_name(name)
 
         primary = Gtk.Label()
         primary.set_line_wrap(True)
         primary.set_use_markup(True)
         primary.set_alignment(0, 0.5)
-
-        message = _("An autosaved version of your project file was found. "
-                    "It is %s newer than the saved project.\n\n"
-                    "Would you like to load it instead?") % \
-            beautify_time_delta(time_diff)
         primary.props.label = message
 
         # put the text in a vbox
@@ -400,6 +476,8 @@ class ProjectManager(GObject.Object, Loggable):
                 self.info("Setting the project instance's URI to: %s", uri)
                 self.current_project.uri = uri
                 self.disable_save = False
+                self.__remove_replayed_journal()
+                self.__start_journal(self.current_project)
                 self.emit("project-saved", self.current_project, uri)
             else:
                 self.debug('Saved backup: %s', uri)
@@ -499,6 +577,9 @@ class ProjectManager(GObject.Object, Loggable):
             disconnect_all_by_func(project, self._project_changed_cb)
             disconnect_all_by_func(project.pipeline, self._project_pipeline_died_cb)
             self._clean_backup(project.uri)
+            self.__stop_journal()
+            # Keep the replayed journal, as the recovery has not been saved.
+            self._replayed_journal_path = None
             self.exitcode = project.release()
 
         return True
@@ -582,6 +663,58 @@ class ProjectManager(GObject.Object, Loggable):
             os.remove(path)
             self.debug('Removed backup file: %s', path)
 
+    def record_action(self, structure):
+        """Records an action in the journal of the current project.
+
+        Args:
+            structure (Gst.Structure): The scenario action.
+        """
+        if self._journal:
+            self._journal.record(structure)
+
+    def commit_journal(self):
+        """Writes to the journal the actions of the operation just done."""
+        if self._journal:
+            self._journal.commit()
+
+    def __start_journal(self, project):
+        """Starts journaling the operations done on the saved project."""
+        self.__stop_journal()
+        if project.uri is None or self.disable_save:
+            # Blank projects and backups are not journaled.
+            return
+
+        path = path_from_uri(self._make_journal_uri(project.uri))
+        self._journal = ProjectJournal(project.uri, path)
+
+    def __stop_journal(self):
+        if self._journal:
+            self._journal.discard()
+            self._journal = None
+
+    def __remove_replayed_journal(self):
+        if not self._replayed_journal_path:
+            return
+
+        try:
+            os.remove(self._replayed_journal_path)
+        except OSError as e:
+            self.warning("Failed removing the journal %s: %s", self._replayed_journal_path, e)
+        self._replayed_journal_path = None
+
+    def _make_journal_uri(self, uri):
+        """Generates the URI of the journal of the specified project.
+
+        The journal is a scenario, so it can be loaded as a project.
+
+        Args:
+            uri (str): The project URI or file path.
+
+        Returns:
+            str: The journal version of the `uri`.
+        """
+        return uri + ".journal.scenario"
+
     def _make_backup_uri(self, uri):
         """Generates a corresponding backup URI or path.
 
@@ -613,6 +746,7 @@ class ProjectManager(GObject.Object, Loggable):
             return
         self.emit("new-project-loaded", project)
         project.loaded = True
+        self.__start_journal(project)
         self.time_loaded = time.time()
         self.info("Loaded in %s", self.time_loaded - self.__start_loading_time)
 
@@ -659,6 +793,8 @@ class Project(Loggable, GES.Project):
         self.log("uri:%s", uri)
         self.pipeline = None
         self.ges_timeline = None
+        # The timeline's URI clips by the URI of their proxy target.
+        self.clips_index = None
         self.uri = uri
         self.loaded = False
         self.at_least_one_asset_missing = False
@@ -696,6 +832,9 @@ class Project(Loggable, GES.Project):
         # regenerate the proxy.
         self.__awaited_deleted_proxy_targets = set()
 
+        # The grid of the project frames, created when needed.
+        self.__frame_grid = None
+
         # Project property default values
         self.register_meta(GES.MetaFlag.READWRITE, "author", "")
 
@@ -999,6 +1138,8 @@ class Project(Loggable, GES.Project):
     def _set_video_restriction(self, name, value):
         res = Project._set_restriction(self.video_profile, name, value)
         if res:
+            if name == "framerate":
+                self.__frame_grid = None
             self.emit("video-size-changed")
             self._has_default_video_settings = False
         return res
@@ -1040,6 +1181,17 @@ class Project(Loggable, GES.Project):
             self.update_restriction_caps()
             self._emit_change("videorate")
 
+    @property
+    def frame_grid(self):
+        """The grid of the project frames.
+
+        Returns:
+            FrameGrid: The frames quantizer for the project framerate.
+        """
+        if self.__frame_grid is None:
+            self.__frame_grid = FrameGrid(self.videorate)
+        return self.__frame_grid
+
     def set_video_properties(self, width, height, framerate):
         """Sets the video properties in one operation.
 
@@ -1547,6 +1699,7 @@ class Project(Loggable, GES.Project):
         self.container_profile = container_profile
         self.video_profile = video_profile
         self.audio_profile = audio_profile
+        self.__frame_grid = None
 
         return True
 
@@ -1720,6 +1873,7 @@ class Project(Loggable, GES.Project):
             return False
 
         self.ges_timeline.commit = self._commit
+        self.clips_index = AssetClipsIndex(self.ges_timeline)
         self.pipeline = Pipeline(self.app)
         if not self.pipeline.set_timeline(self.ges_timeline):
             self.warning("Failed to set the pipeline's timeline: %s", self.ges_timeline)
@@ -1809,6 +1963,10 @@ class Project(Loggable, GES.Project):
             self.runner = None
             self.monitor = None
 
+        if self.clips_index:
+            self.clips_index.release()
+            self.clips_index = None
+
         self.pipeline = None
         self.ges_timeline = None
 
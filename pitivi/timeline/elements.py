@@ -18,7 +18,6 @@
 import os
 from gettext import gettext as _
 
-import numpy
 from gi.repository import Gdk
 from gi.repository import GdkPixbuf
 from gi.repository import GES
@@ -26,11 +25,8 @@ from gi.repository import GObject
 from gi.repository import Gst
 from gi.repository import GstController
 from gi.repository import Gtk
-from matplotlib.backends.backend_gtk3cairo import FigureCanvasGTK3Cairo as FigureCanvas
-from matplotlib.figure import Figure
 
 from pitivi.configure import get_pixmap_dir
-from pitivi.effects import ALLOWED_ONLY_ONCE_EFFECTS
 from pitivi.timeline.previewers import AudioPreviewer
 from pitivi.timeline.previewers import ImagePreviewer
 from pitivi.timeline.previewers import TitlePreviewer
@@ -39,13 +35,12 @@ from pitivi.undo.timeline import CommitTimelineFinalizingAction
 from pitivi.utils.loggable import Loggable
 from pitivi.utils.misc import disconnect_all_by_func
 from pitivi.utils.misc import filename_from_uri
-from pitivi.utils.pipeline import PipelineError
 from pitivi.utils.timeline import SELECT
 from pitivi.utils.timeline import SELECT_ADD
-from pitivi.utils.timeline import Selected
 from pitivi.utils.timeline import UNSELECT
 from pitivi.utils.timeline import Zoomable
 from pitivi.utils.ui import EFFECT_TARGET_ENTRY
+from pitivi.utils.ui import hex_to_rgb
 from pitivi.utils.ui import set_children_state_recurse
 from pitivi.utils.ui import unset_children_state_recurse
 
@@ -55,6 +50,15 @@ KEYFRAME_LINE_COLOR = "#EDD400"  # "Tango" medium yellow
 KEYFRAME_NODE_COLOR = "#F57900"  # "Tango" medium orange
 SELECTED_KEYFRAME_NODE_COLOR = "#204A87"  # "Tango" dark sky blue
 HOVERED_KEYFRAME_NODE_COLOR = "#3465A4"  # "Tango" medium sky blue
+# Half of the diagonal of the keyframe diamonds drawn by Cairo, in pixels.
+KEYFRAME_NODE_RADIUS = 4
+# The distance in pixels between the samples of a non-linear keyframe curve.
+KEYFRAME_CURVE_SAMPLING = 4
+
+# The distance in pixels from the visible area of the timeline within which
+# the widgets of the clips are created. They are released when getting
+# farther than twice this distance.
+VIEWPORT_MARGIN = 1000
 
 CURSORS = {
     GES.Edge.EDGE_START: Gdk.Cursor.new(Gdk.CursorType.LEFT_SIDE),
@@ -73,524 +77,145 @@ def get_pspec(element_factory_name, propname):
     return [prop for prop in element.list_properties() if prop.name == propname][0]
 
 
-class KeyframeCurve(FigureCanvas, Loggable):
-    YLIM_OVERRIDES = {}
-
-    __YLIM_OVERRIDES_VALUES = [("volume", "volume", (0.0, 0.2))]
-
-    for factory_name, propname, values in __YLIM_OVERRIDES_VALUES:
+def _get_ylim_overrides():
+    overrides = {}
+    for factory_name, propname, values in [("volume", "volume", (0.0, 0.2))]:
         pspec = get_pspec(factory_name, propname)
         if pspec:
-            YLIM_OVERRIDES[pspec] = values
-
-    __gsignals__ = {
-        # Signal the keyframes or the curve are being hovered
-        "enter": (GObject.SignalFlags.RUN_LAST, None, ()),
-        # Signal the keyframes or the curve are not being hovered anymore
-        "leave": (GObject.SignalFlags.RUN_LAST, None, ()),
-    }
-
-    def __init__(self, timeline, binding):
-        figure = Figure()
-        FigureCanvas.__init__(self, figure)
-        Loggable.__init__(self)
-
-        self._timeline = timeline
-        self.__source = binding.props.control_source
-        self._connect_sources()
-        self.__property_name = binding.props.name
-        self.__paramspec = binding.pspec
-        self.get_style_context().add_class("KeyframeCurve")
-
-        self.__ylim_min, self.__ylim_max = KeyframeCurve.YLIM_OVERRIDES.get(
-            binding.pspec, (0.0, 1.0))
-        self.__ydata_drag_start = self.__ylim_min
-
-        # Curve values, basically separating source.get_values() timestamps
-        # and values.
-        self._line_xs = []
-        self._line_ys = []
-
-        # facecolor to None for transparency
-        self._ax = figure.add_axes([0, 0, 1, 1], facecolor='None')
-        # Clear the Axes object.
-        self._ax.cla()
-        self._ax.grid(False)
-        self._ax.tick_params(axis='both',
-                             which='both',
-                             bottom=False,
-                             top=False,
-                             right=False,
-                             left=False)
-
-        # This seems to also be necessary for transparency ..
-        figure.patch.set_visible(False)
-
-        # The PathCollection object holding the keyframes dots.
-        sizes = [50]
-        self._keyframes = self._ax.scatter([], [], marker='D', s=sizes,
-                                           c=KEYFRAME_NODE_COLOR, zorder=2)
-
-        # matplotlib weirdness, simply here to avoid a warning ..
-        self._keyframes.set_picker(True)
-
-        # The Line2D object holding the lines between keyframes.
-        self.__line = self._ax.plot([], [],
-                                    alpha=KEYFRAME_LINE_ALPHA,
-                                    c=KEYFRAME_LINE_COLOR,
-                                    linewidth=KEYFRAME_LINE_HEIGHT, zorder=1)[0]
-        self._update_plots()
-
-        # Drag and drop logic
-        # Whether the clicked keyframe or line has been dragged.
-        self._dragged = False
-        # The inpoint of the clicked keyframe.
-        self._offset = None
-        # The (offset, value) of both keyframes of the clicked keyframe line.
-        self.__clicked_line = ()
-        # Whether the mouse events go to the keyframes logic.
-        self.handling_motion = False
-
-        self.__hovered = False
-
-        self.connect("motion-notify-event", self.__gtk_motion_event_cb)
-        self.connect("event", self._event_cb)
-        self.connect("notify::height-request", self.__height_request_cb)
-
-        self.mpl_connect('button_press_event', self._mpl_button_press_event_cb)
-        self.mpl_connect('button_release_event', self._mpl_button_release_event_cb)
-        self.mpl_connect('motion_notify_event', self._mpl_motion_event_cb)
-
-    def release(self):
-        disconnect_all_by_func(self, self.__height_request_cb)
-        disconnect_all_by_func(self, self.__gtk_motion_event_cb)
-        disconnect_all_by_func(self, self._control_source_changed_cb)
-
-    def _connect_sources(self):
-        self.__source.connect("value-added", self._control_source_changed_cb)
-        self.__source.connect("value-removed", self._control_source_changed_cb)
-        self.__source.connect("value-changed", self._control_source_changed_cb)
-
-    def _update_plots(self):
-        values = self.__source.get_all()
-        if len(values) < 2:
-            # No plot for less than two points.
-            return
-
-        self._line_xs = []
-        self._line_ys = []
-        for value in values:
-            self._line_xs.append(value.timestamp)
-            self._line_ys.append(value.value)
-
-        self._populate_lines()
-
-    def _populate_lines(self):
-        self._ax.set_xlim(self._line_xs[0], self._line_xs[-1])
-        self.__compute_ylim()
-
-        arr = numpy.array((self._line_xs, self._line_ys))
-        arr = arr.transpose()
-        self._keyframes.set_offsets(arr)
-        self.__line.set_xdata(self._line_xs)
-        self.__line.set_ydata(self._line_ys)
-        self.queue_draw()
+            overrides[pspec] = values
+    return overrides
 
-    # Private methods
-    def __compute_ylim(self):
-        height = self.props.height_request
-
-        if height <= 0:
-            return
 
-        ylim_min = -(KEYFRAME_LINE_HEIGHT / height)
-        ylim_max = (self.__ylim_max * height) / (height - KEYFRAME_LINE_HEIGHT)
-        self._ax.set_ylim(ylim_min, ylim_max)
-
-    def __height_request_cb(self, unused_self, unused_pspec):
-        self.__compute_ylim()
-
-    def __maybe_create_keyframe(self, event):
-        line_contains = self.__line.contains(event)[0]
-        keyframe_existed = self._keyframes.contains(event)[0]
-        if line_contains and not keyframe_existed:
-            self._create_keyframe(event.xdata)
-
-    def _create_keyframe(self, timestamp):
-        res, value = self.__source.control_source_get_value(timestamp)
-        assert res
-        self.debug("Create keyframe at (%lf, %lf)", timestamp, value)
-        with self._timeline.app.action_log.started("Keyframe added",
-                                                   toplevel=True):
-            self.__source.set(timestamp, value)
-
-    def _remove_keyframe(self, timestamp):
-        self.debug("Removing keyframe at timestamp %lf", timestamp)
-        with self._timeline.app.action_log.started("Remove keyframe",
-                                                   toplevel=True):
-            self.__source.unset(timestamp)
-
-    def _move_keyframe(self, source_timestamp, dest_timestamp, dest_value):
-        self.__source.unset(source_timestamp)
-        self.__source.set(dest_timestamp, dest_value)
-
-    def _move_keyframe_line(self, line, y_dest_value, y_start_value):
-        delta = y_dest_value - y_start_value
-        for offset, value in line:
-            value = max(self.__ylim_min, min(value + delta, self.__ylim_max))
-            self.__source.set(offset, value)
-
-    def toggle_keyframe(self, offset):
-        """Sets or unsets the keyframe at the specified offset."""
-        items = self.__source.get_all()
-        if offset in (items[0].timestamp, items[-1].timestamp):
-            return
+YLIM_OVERRIDES = _get_ylim_overrides()
 
-        if offset in [item.timestamp for item in items]:
-            self.__source.unset(offset)
-        else:
-            res, value = self.__source.control_source_get_value(offset)
-            assert res
-            self.__source.set(offset, value)
 
-    # Callbacks
-    def _control_source_changed_cb(self, unused_control_source, unused_timed_value):
-        self._update_plots()
-        self._timeline.ges_timeline.get_parent().commit_timeline()
-
-    def __gtk_motion_event_cb(self, unused_widget, unused_event):
-        # We need to do this here, because Matplotlib's callbacks can't stop
-        # signal propagation.
-        if self.handling_motion:
-            return True
-        return False
+def get_keyframes_ylim(pspec):
+    """Gets the range of the values displayed for a controlled property.
 
-    def _event_cb(self, unused_element, event):
-        if event.type == Gdk.EventType.LEAVE_NOTIFY:
-            cursor = NORMAL_CURSOR
-            self._timeline.get_window().set_cursor(cursor)
-        return False
-
-    def _mpl_button_press_event_cb(self, event):
-        if event.button != 1:
-            return
-
-        result = self._keyframes.contains(event)
-        if result[0]:
-            # A keyframe has been clicked.
-            keyframe_index = result[1]['ind'][0]
-            offsets = self._keyframes.get_offsets()
-            offset = offsets[keyframe_index][0]
-
-            # pylint: disable=protected-access
-            if event.guiEvent.type == Gdk.EventType._2BUTTON_PRESS:
-                index = result[1]['ind'][0]
-                # pylint: disable=consider-using-in
-                if index == 0 or index == len(offsets) - 1:
-                    # It's an edge keyframe. These should not be removed.
-                    return
-
-                # Rollback the last operation if it is "Move keyframe".
-                # This is needed because a double-click also triggers a
-                # BUTTON_PRESS event which starts a "Move keyframe" operation
-                self._timeline.app.action_log.try_rollback("Move keyframe")
-                self._offset = None
-
-                # A keyframe has been double-clicked, remove it.
-                self._remove_keyframe(offset)
-            else:
-                # Remember the clicked frame for drag&drop.
-                self._timeline.app.action_log.begin("Move keyframe",
-                                                    toplevel=True)
-                self._offset = offset
-                self.handling_motion = True
-            return
-
-        result = self.__line.contains(event)
-        if result[0]:
-            # The line has been clicked.
-            self.debug("The keyframe curve has been clicked")
-            self._timeline.app.action_log.begin("Move keyframe curve segment",
-                                                toplevel=True)
-            x = event.xdata
-            offsets = self._keyframes.get_offsets()
-            keyframes = offsets[:, 0]
-            right = numpy.searchsorted(keyframes, x)
-            # Remember the clicked line for drag&drop.
-            self.__clicked_line = (offsets[right - 1], offsets[right])
-            self.__ydata_drag_start = max(self.__ylim_min, min(event.ydata, self.__ylim_max))
-            self.handling_motion = True
-
-    def _mpl_motion_event_cb(self, event):
-        if event.ydata is not None and event.xdata is not None:
-            # The mouse event is in the figure boundaries.
-            if self._offset is not None:
-                self._dragged = True
-                keyframe_ts = self.__compute_keyframe_new_timestamp(event)
-                ydata = max(self.__ylim_min, min(event.ydata, self.__ylim_max))
-
-                self._move_keyframe(int(self._offset), keyframe_ts, ydata)
-                self._offset = keyframe_ts
-                self._update_tooltip(event)
-                hovering = True
-            elif self.__clicked_line:
-                self._dragged = True
-                ydata = max(self.__ylim_min, min(event.ydata, self.__ylim_max))
-                self._move_keyframe_line(self.__clicked_line, ydata, self.__ydata_drag_start)
-                hovering = True
-            else:
-                hovering = self.__line.contains(event)[0]
-        else:
-            hovering = False
-
-        if hovering:
-            cursor = DRAG_CURSOR
-            self._update_tooltip(event)
-            if not self.__hovered:
-                self.emit("enter")
-                self.__hovered = True
-        else:
-            cursor = NORMAL_CURSOR
-            if self.__hovered:
-                self.emit("leave")
-                self._update_tooltip(None)
-                self.__hovered = False
-
-        self._timeline.get_window().set_cursor(cursor)
-
-    def _mpl_button_release_event_cb(self, event):
-        if event.button != 1:
-            return
-
-        # In order to make sure we seek to the exact position where we added a
-        # new keyframe, we don't use matplotlib's event.xdata, but rather
-        # compute it the same way we do for the seek logic.
-        event_widget = Gtk.get_event_widget(event.guiEvent)
-        x, unused_y = event_widget.translate_coordinates(self._timeline.layout.layers_vbox,
-                                                         event.x, event.y)
-        ges_clip = self._timeline.selection.get_single_clip(GES.Clip)
-        event.xdata = Zoomable.pixel_to_ns(x) - ges_clip.props.start + ges_clip.props.in_point
-
-        if self._offset is not None:
-            # If dragging a keyframe, make sure the keyframe ends up exactly
-            # where the mouse was released. Otherwise, the playhead will not
-            # seek exactly on the keyframe.
-            if self._dragged:
-                if event.ydata is not None:
-                    keyframe_ts = self.__compute_keyframe_new_timestamp(event)
-                    ydata = max(self.__ylim_min, min(event.ydata, self.__ylim_max))
-                    self._move_keyframe(int(self._offset), keyframe_ts, ydata)
-            self.debug("Keyframe released")
-            self._timeline.app.action_log.commit("Move keyframe")
-        elif self.__clicked_line:
-            self.debug("Line released")
-            self._timeline.app.action_log.commit("Move keyframe curve segment")
-
-            if not self._dragged:
-                # The keyframe line was clicked, but not dragged
-                assert event.guiEvent.type == Gdk.EventType.BUTTON_RELEASE
-                self.__maybe_create_keyframe(event)
-
-        self.handling_motion = False
-        self._offset = None
-        self.__clicked_line = ()
-        self._dragged = False
-
-    def _update_tooltip(self, event):
-        """Sets or clears the tooltip showing info about the hovered line."""
-        markup = None
-        if event:
-            if not event.xdata:
-                return
-            if self._offset is not None:
-                xdata = self._offset
-            else:
-                xdata = max(self._line_xs[0], min(event.xdata, self._line_xs[-1]))
-            res, value = self.__source.control_source_get_value(xdata)
-            assert res
-            pmin = self.__paramspec.minimum
-            pmax = self.__paramspec.maximum
-            value = value * (pmax - pmin) + pmin
-            # Translators: This is a tooltip for a clip's keyframe curve,
-            # showing what the keyframe curve affects, the timestamp at
-            # the mouse cursor location, and the value at that timestamp.
-            markup = _("Property: %s\nTimestamp: %s\nValue: %s") % (
-                self.__property_name,
-                Gst.TIME_ARGS(xdata),
-                "{:.3f}".format(value))
-        self.set_tooltip_markup(markup)
-
-    def __compute_keyframe_new_timestamp(self, event):
-        # The user can not change the timestamp of the first
-        # and last keyframes.
-        values = self.__source.get_all()
-        if self._offset in (values[0].timestamp, values[-1].timestamp):
-            return self._offset
-
-        if event.xdata != self._offset:
-            try:
-                kf = next(kf for kf in values if kf.timestamp == int(self._offset))
-            except StopIteration:
-                return event.xdata
-
-            i = values.index(kf)
-            keyframe_timestamp = int(event.xdata)
-            if keyframe_timestamp <= values[i - 1].timestamp:
-                keyframe_timestamp = values[i - 1].timestamp + 1
-            if keyframe_timestamp >= values[i + 1].timestamp:
-                keyframe_timestamp = values[i + 1].timestamp - 1
-            return keyframe_timestamp
+    Returns:
+        (float, float): The min and max values shown by the keyframe curves.
+    """
+    return YLIM_OVERRIDES.get(pspec, (0.0, 1.0))
 
-        return event.xdata
 
+class KeyframeCurveRenderer:
+    """Draws the keyframes of a control binding with Cairo.
 
-class MultipleKeyframeCurve(KeyframeCurve):
-    """Keyframe curve which controls multiple properties at once."""
+    Much lighter than the matplotlib based KeyframeCurve, which is
+    created only when the keyframes are edited.
 
-    def __init__(self, timeline, bindings):
-        self.__bindings = bindings
-        super().__init__(timeline, bindings[0])
+    Args:
+        binding (GstController.DirectControlBinding): The binding of the
+            controlled property.
+        widget (Gtk.Widget): The widget to redraw when the keyframes change.
+    """
 
-        self._timeline = timeline
-        self._project = timeline.app.project_manager.current_project
-        self._project.pipeline.connect("position", self._position_cb)
+    def __init__(self, binding, widget):
+        self.__source = binding.props.control_source
+        self.__widget = widget
+        self.__ylim_min, self.__ylim_max = get_keyframes_ylim(binding.pspec)
 
-        sizes = [80]
-        self.__selected_keyframe = self._ax.scatter([0], [0.5], marker='D', s=sizes,
-                                                    c=SELECTED_KEYFRAME_NODE_COLOR, zorder=3)
-        self.__hovered_keyframe = self._ax.scatter([0], [0.5], marker='D', s=sizes,
-                                                   c=HOVERED_KEYFRAME_NODE_COLOR, zorder=3)
-        self.__update_selected_keyframe()
-        self.__hovered_keyframe.set_visible(False)
+        self.__source.connect("value-added", self.__values_changed_cb)
+        self.__source.connect("value-removed", self.__values_changed_cb)
+        self.__source.connect("value-changed", self.__values_changed_cb)
 
     def release(self):
-        super().release()
-        self._project.pipeline.disconnect_by_func(self._position_cb)
-
-    def _connect_sources(self):
-        for binding in self.__bindings:
-            source = binding.props.control_source
-            source.connect("value-added", self._control_source_changed_cb)
-            source.connect("value-removed", self._control_source_changed_cb)
-            source.connect("value-changed", self._control_source_changed_cb)
-
-    def _update_plots(self):
-        timestamps = []
-        for binding in self.__bindings:
-            ts = [value.timestamp for value in binding.props.control_source.get_all()]
-            timestamps.extend(ts)
-        timestamps = sorted(list(set(timestamps)))
-
-        if len(timestamps) < 2:
-            # No plot for less than two points.
-            return
-
-        self._line_xs = []
-        self._line_ys = []
-        for timestamp in timestamps:
-            self._line_xs.append(timestamp)
-            self._line_ys.append(0.5)
-
-        self._populate_lines()
-
-    def _create_keyframe(self, timestamp):
-        with self._timeline.app.action_log.started("Add keyframe",
-                                                   toplevel=True):
-            for binding in self.__bindings:
-                binding.props.control_source.set(timestamp, binding.get_value(timestamp))
-
-    def _remove_keyframe(self, timestamp):
-        with self._timeline.app.action_log.started("Remove keyframe",
-                                                   toplevel=True):
-            for binding in self.__bindings:
-                binding.props.control_source.unset(timestamp)
-
-    def _move_keyframe(self, source_timestamp, dest_timestamp, unused_dest_value):
-        if source_timestamp == dest_timestamp:
-            return
-
-        for binding in self.__bindings:
-            dest_value = binding.get_value(source_timestamp)
-            binding.props.control_source.set(dest_timestamp, dest_value)
-            binding.props.control_source.unset(source_timestamp)
+        disconnect_all_by_func(self.__source, self.__values_changed_cb)
 
-    def _move_keyframe_line(self, line, y_dest_value, y_start_value):
-        pass
-
-    def _mpl_button_release_event_cb(self, event):
-        if event.button == 1:
-            if self._offset is not None and not self._dragged:
-                # A keyframe was clicked but not dragged, so we
-                # should select it by seeking to its position.
-                source = self._timeline.selection.get_single_clip()
-                assert source
-                position = int(self._offset) - source.props.in_point + source.props.start
-
-                if self._timeline.app.settings.leftClickAlsoSeeks:
-                    self._timeline.set_next_seek_position(position)
-                else:
-                    self._project.pipeline.simple_seek(position)
-
-        super()._mpl_button_release_event_cb(event)
-
-    def _mpl_motion_event_cb(self, event):
-        super()._mpl_motion_event_cb(event)
-
-        result = self._keyframes.contains(event)
-        if result[0]:
-            # A keyframe is hovered
-            keyframe_index = result[1]['ind'][0]
-            offset = self._keyframes.get_offsets()[keyframe_index][0]
-            self.__show_special_keyframe(self.__hovered_keyframe, offset)
-        else:
-            self.__hide_special_keyframe(self.__hovered_keyframe)
+    def __values_changed_cb(self, unused_control_source, unused_timed_value):
+        self.__widget.queue_draw()
 
-    def __show_special_keyframe(self, keyframe, offset):
-        offsets = numpy.array([[offset, 0.5]])
-        keyframe.set_offsets(offsets)
-        keyframe.set_visible(True)
-        self.queue_draw()
+    def has_keyframes(self):
+        """Checks whether the curve differs from the default flat line."""
+        values = self.__source.get_all()
+        return len(values) > 2 or len({value.value for value in values}) > 1
 
-    def __hide_special_keyframe(self, keyframe):
-        keyframe.set_visible(False)
-        self.queue_draw()
+    def get_points(self, width, height, left=0, right=None):
+        """Computes the points of the curve in the drawing area.
 
-    def _control_source_changed_cb(self, control_source, timed_value):
-        super()._control_source_changed_cb(control_source, timed_value)
-        self.__update_selected_keyframe()
-        self.__hide_special_keyframe(self.__hovered_keyframe)
+        As in KeyframeCurve, the first and last keyframes are at the left
+        and right edges of the area.
 
-    def _position_cb(self, unused_pipeline, unused_position):
-        self.__update_selected_keyframe()
+        Args:
+            width (int): The width of the drawing area.
+            height (int): The height of the drawing area.
+            left (float): The left edge of the part to be drawn.
+            right (float): The right edge of the part to be drawn.
 
-    def __update_selected_keyframe(self):
-        try:
-            position = self._project.pipeline.get_position()
-        except PipelineError:
-            self.warning("Could not get pipeline position")
-            return
+        Returns:
+            (List[(float, float)], List[(float, float)]): The points of the
+            interpolated line and the points of the keyframes.
+        """
+        values = self.__source.get_all()
+        if len(values) < 2 or width <= 0 or height <= KEYFRAME_LINE_HEIGHT:
+            # No curve for less than two points.
+            return [], []
+
+        start = values[0].timestamp
+        end = values[-1].timestamp
+        duration = end - start
+
+        def x_of(timestamp):
+            return (timestamp - start) * width / duration
+
+        def y_of(value):
+            value = max(self.__ylim_min, min(value, self.__ylim_max))
+            ratio = (value - self.__ylim_min) / (self.__ylim_max - self.__ylim_min)
+            return height - KEYFRAME_LINE_HEIGHT / 2 - ratio * (height - KEYFRAME_LINE_HEIGHT)
+
+        keyframes = [(x_of(value.timestamp), y_of(value.value)) for value in values]
+        if self.__source.props.mode == GstController.InterpolationMode.LINEAR:
+            return keyframes, keyframes
+
+        # Sample the interpolated values only where they are drawn.
+        if right is None:
+            right = width
+        step = max(1, int(duration * KEYFRAME_CURVE_SAMPLING / width))
+        timestamp = max(start, start + int(duration * left / width) - step)
+        last = min(end, start + int(duration * right / width) + step)
+        line = []
+        while timestamp < last:
+            res, value = self.__source.control_source_get_value(timestamp)
+            if res:
+                line.append((x_of(timestamp), y_of(value)))
+            timestamp += step
+        res, value = self.__source.control_source_get_value(last)
+        if res:
+            line.append((x_of(last), y_of(value)))
+        return line, keyframes
+
+    def draw(self, cr, width, height):
+        """Draws the curve and the keyframes.
 
-        source = self._timeline.selection.get_single_clip()
-        if source is None:
+        Args:
+            cr (cairo.Context): The context of the element widget.
+            width (int): The width of the drawing area.
+            height (int): The height of the drawing area.
+        """
+        left, unused_top, right, unused_bottom = cr.clip_extents()
+        line, keyframes = self.get_points(width, height, left, right)
+        if not line:
             return
-        source_position = position - source.props.start + source.props.in_point
-
-        offsets = self._keyframes.get_offsets()
-        keyframes = offsets[:, 0]
-
-        index = numpy.searchsorted(keyframes, source_position)
-        if 0 <= index < len(keyframes) and keyframes[index] == source_position:
-            self.__show_special_keyframe(self.__selected_keyframe, source_position)
-        else:
-            self.__hide_special_keyframe(self.__selected_keyframe)
 
-    def _update_tooltip(self, event):
-        markup = None
-        if event:
-            if not event.xdata:
-                return
-            markup = _("Timestamp: %s") % Gst.TIME_ARGS(event.xdata)
-        self.set_tooltip_markup(markup)
+        cr.save()
+        cr.set_line_width(KEYFRAME_LINE_HEIGHT)
+        cr.set_source_rgba(*hex_to_rgb(KEYFRAME_LINE_COLOR[1:]), KEYFRAME_LINE_ALPHA)
+        cr.move_to(*line[0])
+        for x, y in line[1:]:
+            cr.line_to(x, y)
+        cr.stroke()
+
+        cr.set_source_rgb(*hex_to_rgb(KEYFRAME_NODE_COLOR[1:]))
+        for x, y in keyframes:
+            if x + KEYFRAME_NODE_RADIUS < left or x - KEYFRAME_NODE_RADIUS > right:
+                continue
+            cr.move_to(x, y - KEYFRAME_NODE_RADIUS)
+            cr.line_to(x + KEYFRAME_NODE_RADIUS, y)
+            cr.line_to(x, y + KEYFRAME_NODE_RADIUS)
+            cr.line_to(x - KEYFRAME_NODE_RADIUS, y)
+            cr.close_path()
+        cr.fill()
+        cr.restore()
 
 
 class TimelineElement(Gtk.Layout, Zoomable, Loggable):
@@ -610,7 +235,7 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
 
         self.timeline = timeline
         self._ges_elem = element
-        self._ges_elem.selected = Selected()
+        # The selection state is kept by the layer, see `Layer._add_clip`.
         self._ges_elem.selected.connect(
             "selected-changed", self.__selected_changed_cb)
 
@@ -630,8 +255,15 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
         if self.__background:
             self.add(self.__background)
 
+        # The editor of the keyframes, created only while the element is
+        # the single selection.
         self.keyframe_curve = None
+        # The bindings edited when not only the controlled property.
+        self.__curve_bindings = None
+        self.__keyframes_renderer = None
         self.__controlled_property = None
+        # The element whose control bindings are watched.
+        self.__bindings_element = None
         self.show_all()
 
         # We set up the default mixing property right here, if a binding was
@@ -639,6 +271,10 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
         # and override that one.
         self.show_default_keyframes(lazy_render=True)
 
+        if self._ges_elem.selected:
+            # The widget is created for an element already selected.
+            self.__selected_changed_cb(self._ges_elem.selected, True)
+
     def update_previewer(self):
         """Refreshes the previewer widget."""
         if self.__previewer:
@@ -647,6 +283,10 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
     def release(self):
         if self.__previewer:
             self.__previewer.release()
+        self.__remove_keyframes()
+        self._ges_elem.selected.disconnect_by_func(self.__selected_changed_cb)
+        if getattr(self._ges_elem, "ui_element", None) is self:
+            self._ges_elem.ui_element = None
 
     # Public API
     def set_size(self, width, height):
@@ -684,6 +324,7 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
         self.__controlled_property = prop
         if self.__controlled_property:
             self.__create_control_binding(ges_elem)
+            self.__bindings_element = ges_elem
 
     def __curve_enter_cb(self, unused_keyframe_curve):
         self.emit("curve-enter")
@@ -692,6 +333,17 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
         self.emit("curve-leave")
 
     def __remove_keyframes(self):
+        self.__close_keyframe_curve()
+        self.__curve_bindings = None
+        if self.__bindings_element:
+            disconnect_all_by_func(self.__bindings_element,
+                                   self.__control_binding_added_cb)
+            self.__bindings_element = None
+        if self.__keyframes_renderer:
+            self.__keyframes_renderer.release()
+            self.__keyframes_renderer = None
+
+    def __close_keyframe_curve(self):
         if not self.keyframe_curve:
             # Nothing to remove.
             return
@@ -721,7 +373,12 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
 
     def __create_keyframe_curve(self, bindings=None):
         """Creates required keyframe curve."""
-        self.__remove_keyframes()
+        # Importing matplotlib is expensive, do it only when needed.
+        from pitivi.timeline.keyframecurve import KeyframeCurve
+        from pitivi.timeline.keyframecurve import MultipleKeyframeCurve
+
+        self.__close_keyframe_curve()
+        self.__curve_bindings = bindings
         if not bindings:
             bindings = [self._ges_elem.get_control_binding(self.__controlled_property.name)]
 
@@ -746,6 +403,7 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
 
             if binding:
                 self.__ensure_keyframes(binding)
+                self.__set_keyframes_renderer(binding)
 
                 return
 
@@ -757,6 +415,13 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
     def __control_binding_added_cb(self, unused_ges_elem, binding):
         if binding.props.name == self.__controlled_property.name:
             self.__ensure_keyframes(binding)
+            self.__set_keyframes_renderer(binding)
+
+    def __set_keyframes_renderer(self, binding):
+        if self.__keyframes_renderer:
+            self.__keyframes_renderer.release()
+        self.__keyframes_renderer = KeyframeCurveRenderer(binding, self)
+        self.queue_draw()
 
     def do_draw(self, cr):
         self.propagate_draw(self.__background, cr)
@@ -764,16 +429,24 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
         if self.__previewer:
             self.propagate_draw(self.__previewer, cr)
 
-        if self.keyframe_curve and self.keyframe_curve.is_drawable():
+        editing = self.keyframe_curve and self.keyframe_curve.is_drawable()
+        if editing:
             project = self.timeline.app.project_manager.current_project
             if project.pipeline.get_simple_state() != Gst.State.PLAYING:
                 self.propagate_draw(self.keyframe_curve, cr)
+                return
+
+        # Draw the keyframes which are not being edited, or when playing,
+        # as the matplotlib figure is too slow to redraw.
+        renderer = self.__keyframes_renderer
+        if renderer and (editing or renderer.has_keyframes()):
+            renderer.draw(cr, self.__width, self.__height)
 
     # Callbacks
     def __selected_changed_cb(self, unused_selected, selected):
-        if not self.keyframe_curve and self.__controlled_property and \
+        if not self.keyframe_curve and (self.__curve_bindings or self.__controlled_property) and \
                 selected and len(self.timeline.selection) == 1:
-            self.__create_keyframe_curve()
+            self.__create_keyframe_curve(self.__curve_bindings)
 
         if self.keyframe_curve:
             self.__update_keyframe_curve_visibility()
@@ -787,7 +460,8 @@ class TimelineElement(Gtk.Layout, Zoomable, Loggable):
             if not self.keyframe_curve.get_parent():
                 self.add(self.keyframe_curve)
         else:
-            self.remove(self.keyframe_curve)
+            # Created again when the element is selected.
+            self.__close_keyframe_curve()
 
     # Virtual methods
     def _get_previewer(self):
@@ -825,20 +499,22 @@ class VideoBackground(Gtk.Box):
         self.get_style_context().add_class("VideoBackground")
 
 
-class VideoSource(TimelineElement):
-    """Widget representing a GES.VideoSource.
+class VideoSourcePositioner(Loggable):
+    """Keeps a GES.VideoSource at its default position, if it uses it.
+
+    The default position depends on the project size and on the videoflip
+    effects of the clip. It is applied again when the effects change,
+    unless the video has been moved or resized.
 
     Attributes:
         default_position (dict): The default position (x, y, width, height)
-                                 of the VideoSource.
+                                 of the video source.
     """
 
-    __gtype_name__ = "PitiviVideoSource"
-
-    def __init__(self, element, timeline):
-        super().__init__(element, timeline)
-
-        project = self.timeline.app.project_manager.current_project
+    def __init__(self, ges_source, project):
+        Loggable.__init__(self)
+        self.__source = ges_source
+        self.__project = project
         project.connect("video-size-changed",
                         self._project_video_size_changed_cb)
 
@@ -849,25 +525,33 @@ class VideoSource(TimelineElement):
         if project.loaded:
             self.__apply_default_position()
 
-        parent = element.get_parent()
-        parent.connect("child-added", self.__parent_child_added_cb)
-        parent.connect("child-removed", self.__parent_child_removed_cb)
+        self.__parent = ges_source.get_parent()
+        self.__parent.connect("child-added", self.__parent_child_added_cb)
+        self.__parent.connect("child-removed", self.__parent_child_removed_cb)
+
+    def release(self):
+        disconnect_all_by_func(self.__project, self._project_video_size_changed_cb)
+        disconnect_all_by_func(self.__parent, self.__parent_child_added_cb)
+        disconnect_all_by_func(self.__parent, self.__parent_child_removed_cb)
+        if self.__videoflip:
+            self.__disconnect_from_videoflip()
 
     def __parent_child_added_cb(self, unused_parent, unused_child):
         self.__reset_position()
 
     def __parent_child_removed_cb(self, unused_parent, child):
         if child == self.__videoflip:
+            self.__disconnect_from_videoflip()
             self.__videoflip = None
             self.__reset_position()
-            disconnect_all_by_func(child, self.__track_element_deep_notify_cb)
-            disconnect_all_by_func(child, self.__track_element_notify_active_cb)
 
-    def __retrieve_project_size(self):
-        project = self.timeline.app.project_manager.current_project
+    def __disconnect_from_videoflip(self):
+        disconnect_all_by_func(self.__videoflip, self.__track_element_deep_notify_cb)
+        disconnect_all_by_func(self.__videoflip, self.__track_element_notify_active_cb)
 
-        self._project_width = project.videowidth
-        self._project_height = project.videoheight
+    def __retrieve_project_size(self):
+        self._project_width = self.__project.videowidth
+        self._project_height = self.__project.videoheight
 
     def _project_video_size_changed_cb(self, unused_project):
         # GES handles repositionning clips on project size change, make sure to
@@ -877,7 +561,7 @@ class VideoSource(TimelineElement):
 
     def __has_default_position(self):
         for name, default_value in self.default_position.items():
-            res, value = self._ges_elem.get_child_property(name)
+            res, value = self.__source.get_child_property(name)
             assert res
             if value != default_value:
                 return False
@@ -895,12 +579,18 @@ class VideoSource(TimelineElement):
             self.debug("Not using defaults")
 
     def __apply_default_position(self):
-        video_source = self._ges_elem
+        video_source = self.__source
         for name, value in self.default_position.items():
             video_source.set_child_property(name, value)
 
     def _get_default_position(self):
-        video_source = self._ges_elem
+        video_source = self.__source
+        if isinstance(video_source, (GES.TitleSource, GES.VideoTestSource)):
+            return {"posx": 0,
+                    "posy": 0,
+                    "width": self._project_width,
+                    "height": self._project_height}
+
         sinfo = video_source.get_asset().get_stream_info()
 
         asset_width = sinfo.get_natural_width()
@@ -956,6 +646,17 @@ class VideoSource(TimelineElement):
                                          unused_pspec):
         self.__reset_position()
 
+
+class VideoSource(TimelineElement):
+    """Widget representing a GES.VideoSource."""
+
+    __gtype_name__ = "PitiviVideoSource"
+
+    @property
+    def default_position(self):
+        """Gets the default position (x, y, width, height) of the VideoSource."""
+        return self._ges_elem.positioner.default_position
+
     def _get_background(self):
         return VideoBackground()
 
@@ -975,12 +676,6 @@ class TitleSource(VideoSource):
         previewer.get_style_context().add_class("TitleSource")
         return previewer
 
-    def _get_default_position(self):
-        return {"posx": 0,
-                "posy": 0,
-                "width": self._project_width,
-                "height": self._project_height}
-
 
 class VideoTestSource(VideoSource):
 
@@ -996,12 +691,6 @@ class VideoTestSource(VideoSource):
         previewer = ImagePreviewer(self._ges_elem, self.timeline.app.settings.previewers_max_cpu)
         return previewer
 
-    def _get_default_position(self):
-        return {"posx": 0,
-                "posy": 0,
-                "width": self._project_width,
-                "height": self._project_height}
-
 
 class VideoUriSource(VideoSource):
 
@@ -1124,13 +813,16 @@ class Clip(Gtk.EventBox, Zoomable, Loggable):
 
         self.ges_clip = ges_clip
         self.ges_clip.ui = self
-        self.ges_clip.selected = Selected()
+        # The selection state is kept by the layer, see `Layer._add_clip`.
+        self.ges_clip.selected.connect("selected-changed", self.__selected_changed_cb)
 
         self.audio_widget = None
         self.video_widget = None
 
         self._setup_widget()
         self.__force_position_update = True
+        if self.ges_clip.selected:
+            self.__selected_changed_cb(self.ges_clip.selected, True)
 
         for ges_timeline_element in self.ges_clip.get_children(False):
             self._add_child(ges_timeline_element)
@@ -1175,7 +867,7 @@ class Clip(Gtk.EventBox, Zoomable, Loggable):
             with self.app.action_log.started("add effect",
                                              finalizing_action=CommitTimelineFinalizingAction(pipeline),
                                              toplevel=True):
-                self.add_effect(effect_info)
+                self.app.effects.add_effect(self.ges_clip, effect_info)
             self.timeline.clean_drop_data()
             success = True
 
@@ -1183,31 +875,6 @@ class Clip(Gtk.EventBox, Zoomable, Loggable):
 
         return success
 
-    def add_effect(self, effect_info):
-        """Adds the specified effect if it can be applied to the clip.
-
-        Args:
-            effect_info (EffectInfo): The effect to add.
-        """
-        factory_name = effect_info.effect_name
-        if factory_name in ALLOWED_ONLY_ONCE_EFFECTS:
-            for effect in self.ges_clip.find_track_elements(None, GES.TrackType.VIDEO,
-                                                            GES.BaseEffect):
-                for elem in effect.get_nleobject().iterate_recurse():
-                    if elem.get_factory().get_name() == factory_name:
-                        self.error("Not adding %s as it would be duplicate"
-                                   " and this is not allowed.", factory_name)
-                        # TODO Let the user know about why it did not work.
-                        return effect
-
-        for track_element in self.ges_clip.get_children(False):
-            if effect_info.good_for_track_element(track_element):
-                # Actually add the effect
-                effect = GES.Effect.new(effect_info.bin_description)
-                self.ges_clip.add(effect)
-                return effect
-        return None
-
     def update_position(self):
         layer = self.layer
         if not layer or layer != self.get_parent():
@@ -1315,10 +982,20 @@ class Clip(Gtk.EventBox, Zoomable, Loggable):
 
         return False
 
+    def __selected_changed_cb(self, unused_selected, selected):
+        # Only the clip has the selected state. Its children are styled
+        # based on it, so they don't have to be updated one by one.
+        if selected:
+            self.set_state_flags(Gtk.StateFlags.SELECTED, clear=False)
+        else:
+            self.unset_state_flags(Gtk.StateFlags.SELECTED)
+
     def release(self):
         for child in self.ges_clip.get_children(True):
             self.__disconnect_from_child(child)
+            child.ui = None
 
+        self.ges_clip.selected.disconnect_by_func(self.__selected_changed_cb)
         disconnect_all_by_func(self.ges_clip, self._start_changed_cb)
         disconnect_all_by_func(self.ges_clip, self._duration_changed_cb)
         disconnect_all_by_func(self.ges_clip, self._layer_changed_cb)
@@ -1358,11 +1035,11 @@ class Clip(Gtk.EventBox, Zoomable, Loggable):
         self.update_position()
 
     def __disconnect_from_child(self, child):
-        if child.ui:
+        if getattr(child, "ui", None):
             child.ui.release()
 
     def __connect_to_child(self, child):
-        if child.ui:
+        if getattr(child, "ui", None):
             child.ui.connect("curve-enter", self.__curve_enter_cb)
             child.ui.connect("curve-leave", self.__curve_leave_cb)
 
@@ -1373,8 +1050,7 @@ class Clip(Gtk.EventBox, Zoomable, Loggable):
         self.__show_handles()
 
     def _add_child(self, ges_timeline_element):
-        ges_timeline_element.selected = Selected()
-        ges_timeline_element.ui = None
+        pass
 
     def _child_added_cb(self, unused_ges_clip, ges_timeline_element):
         self.__force_position_update = True
@@ -1522,6 +1198,13 @@ class TransitionClip(Clip):
         self.__has_video = True
         ges_timeline_element.selected.connect("selected-changed", self._selected_changed_cb, ges_timeline_element)
 
+    def release(self):
+        for child in self.ges_clip.get_children(False):
+            if isinstance(child, GES.VideoTransition):
+                disconnect_all_by_func(child.selected, self._selected_changed_cb)
+
+        Clip.release(self)
+
     def _selected_changed_cb(self, unused_selected, selected, ges_timeline_element):
         if selected:
             self.app.gui.editor.trans_list.activate(ges_timeline_element)
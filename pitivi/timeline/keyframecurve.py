@@ -0,0 +1,560 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2013, Mathieu Duponchelle <mduponchelle1@gmail.com>
+# Copyright (c) 2016, Thibault Saunier <tsaunier@gnome.org>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Keyframe curves editors based on matplotlib.
+
+This module is imported only when a keyframe curve is edited, as
+importing matplotlib and creating the figures is expensive. The
+keyframes of the elements not being edited are drawn by the
+KeyframeCurveRenderer in the elements module.
+"""
+from gettext import gettext as _
+
+import numpy
+from gi.repository import Gdk
+from gi.repository import GES
+from gi.repository import GObject
+from gi.repository import Gst
+from gi.repository import Gtk
+from matplotlib.backends.backend_gtk3cairo import FigureCanvasGTK3Cairo as FigureCanvas
+from matplotlib.figure import Figure
+
+from pitivi.timeline.elements import DRAG_CURSOR
+from pitivi.timeline.elements import get_keyframes_ylim
+from pitivi.timeline.elements import HOVERED_KEYFRAME_NODE_COLOR
+from pitivi.timeline.elements import KEYFRAME_LINE_ALPHA
+from pitivi.timeline.elements import KEYFRAME_LINE_COLOR
+from pitivi.timeline.elements import KEYFRAME_LINE_HEIGHT
+from pitivi.timeline.elements import KEYFRAME_NODE_COLOR
+from pitivi.timeline.elements import NORMAL_CURSOR
+from pitivi.timeline.elements import SELECTED_KEYFRAME_NODE_COLOR
+from pitivi.utils.loggable import Loggable
+from pitivi.utils.misc import disconnect_all_by_func
+from pitivi.utils.pipeline import PipelineError
+from pitivi.utils.timeline import Zoomable
+
+
+class KeyframeCurve(FigureCanvas, Loggable):
+    """Editor of the keyframes of a control source."""
+
+    __gsignals__ = {
+        # Signal the keyframes or the curve are being hovered
+        "enter": (GObject.SignalFlags.RUN_LAST, None, ()),
+        # Signal the keyframes or the curve are not being hovered anymore
+        "leave": (GObject.SignalFlags.RUN_LAST, None, ()),
+    }
+
+    def __init__(self, timeline, binding):
+        figure = Figure()
+        FigureCanvas.__init__(self, figure)
+        Loggable.__init__(self)
+
+        self._timeline = timeline
+        self.__source = binding.props.control_source
+        self._connect_sources()
+        self.__property_name = binding.props.name
+        self.__paramspec = binding.pspec
+        self.get_style_context().add_class("KeyframeCurve")
+
+        self.__ylim_min, self.__ylim_max = get_keyframes_ylim(binding.pspec)
+        self.__ydata_drag_start = self.__ylim_min
+
+        # Curve values, basically separating source.get_values() timestamps
+        # and values.
+        self._line_xs = []
+        self._line_ys = []
+
+        # facecolor to None for transparency
+        self._ax = figure.add_axes([0, 0, 1, 1], facecolor='None')
+        # Clear the Axes object.
+        self._ax.cla()
+        self._ax.grid(False)
+        self._ax.tick_params(axis='both',
+                             which='both',
+                             bottom=False,
+                             top=False,
+                             right=False,
+                             left=False)
+
+        # This seems to also be necessary for transparency ..
+        figure.patch.set_visible(False)
+
+        # The PathCollection object holding the keyframes dots.
+        sizes = [50]
+        self._keyframes = self._ax.scatter([], [], marker='D', s=sizes,
+                                           c=KEYFRAME_NODE_COLOR, zorder=2)
+
+        # matplotlib weirdness, simply here to avoid a warning ..
+        self._keyframes.set_picker(True)
+
+        # The Line2D object holding the lines between keyframes.
+        self.__line = self._ax.plot([], [],
+                                    alpha=KEYFRAME_LINE_ALPHA,
+                                    c=KEYFRAME_LINE_COLOR,
+                                    linewidth=KEYFRAME_LINE_HEIGHT, zorder=1)[0]
+        self._update_plots()
+
+        # Drag and drop logic
+        # Whether the clicked keyframe or line has been dragged.
+        self._dragged = False
+        # The inpoint of the clicked keyframe.
+        self._offset = None
+        # The (offset, value) of both keyframes of the clicked keyframe line.
+        self.__clicked_line = ()
+        # Whether the mouse events go to the keyframes logic.
+        self.handling_motion = False
+
+        self.__hovered = False
+
+        self.connect("motion-notify-event", self.__gtk_motion_event_cb)
+        self.connect("event", self._event_cb)
+        self.connect("notify::height-request", self.__height_request_cb)
+
+        self.mpl_connect('button_press_event', self._mpl_button_press_event_cb)
+        self.mpl_connect('button_release_event', self._mpl_button_release_event_cb)
+        self.mpl_connect('motion_notify_event', self._mpl_motion_event_cb)
+
+    def release(self):
+        disconnect_all_by_func(self, self.__height_request_cb)
+        disconnect_all_by_func(self, self.__gtk_motion_event_cb)
+        disconnect_all_by_func(self, self._control_source_changed_cb)
+
+    def _connect_sources(self):
+        self.__source.connect("value-added", self._control_source_changed_cb)
+        self.__source.connect("value-removed", self._control_source_changed_cb)
+        self.__source.connect("value-changed", self._control_source_changed_cb)
+
+    def _update_plots(self):
+        values = self.__source.get_all()
+        if len(values) < 2:
+            # No plot for less than two points.
+            return
+
+        self._line_xs = []
+        self._line_ys = []
+        for value in values:
+            self._line_xs.append(value.timestamp)
+            self._line_ys.append(value.value)
+
+        self._populate_lines()
+
+    def _populate_lines(self):
+        self._ax.set_xlim(self._line_xs[0], self._line_xs[-1])
+        self.__compute_ylim()
+
+        arr = numpy.array((self._line_xs, self._line_ys))
+        arr = arr.transpose()
+        self._keyframes.set_offsets(arr)
+        self.__line.set_xdata(self._line_xs)
+        self.__line.set_ydata(self._line_ys)
+        self.queue_draw()
+
+    # Private methods
+    def __compute_ylim(self):
+        height = self.props.height_request
+
+        if height <= 0:
+            return
+
+        ylim_min = -(KEYFRAME_LINE_HEIGHT / height)
+        ylim_max = (self.__ylim_max * height) / (height - KEYFRAME_LINE_HEIGHT)
+        self._ax.set_ylim(ylim_min, ylim_max)
+
+    def __height_request_cb(self, unused_self, unused_pspec):
+        self.__compute_ylim()
+
+    def __maybe_create_keyframe(self, event):
+        line_contains = self.__line.contains(event)[0]
+        keyframe_existed = self._keyframes.contains(event)[0]
+        if line_contains and not keyframe_existed:
+            self._create_keyframe(event.xdata)
+
+    def _create_keyframe(self, timestamp):
+        res, value = self.__source.control_source_get_value(timestamp)
+        assert res
+        self.debug("Create keyframe at (%lf, %lf)", timestamp, value)
+        with self._timeline.app.action_log.started("Keyframe added",
+                                                   toplevel=True):
+            self.__source.set(timestamp, value)
+
+    def _remove_keyframe(self, timestamp):
+        self.debug("Removing keyframe at timestamp %lf", timestamp)
+        with self._timeline.app.action_log.started("Remove keyframe",
+                                                   toplevel=True):
+            self.__source.unset(timestamp)
+
+    def _move_keyframe(self, source_timestamp, dest_timestamp, dest_value):
+        self.__source.unset(source_timestamp)
+        self.__source.set(dest_timestamp, dest_value)
+
+    def _move_keyframe_line(self, line, y_dest_value, y_start_value):
+        delta = y_dest_value - y_start_value
+        for offset, value in line:
+            value = max(self.__ylim_min, min(value + delta, self.__ylim_max))
+            self.__source.set(offset, value)
+
+    def toggle_keyframe(self, offset):
+        """Sets or unsets the keyframe at the specified offset."""
+        items = self.__source.get_all()
+        if offset in (items[0].timestamp, items[-1].timestamp):
+            return
+
+        if offset in [item.timestamp for item in items]:
+            self.__source.unset(offset)
+        else:
+            res, value = self.__source.control_source_get_value(offset)
+            assert res
+            self.__source.set(offset, value)
+
+    # Callbacks
+    def _control_source_changed_cb(self, unused_control_source, unused_timed_value):
+        self._update_plots()
+        self._timeline.ges_timeline.get_parent().commit_timeline(preview=self._dragged)
+
+    def __gtk_motion_event_cb(self, unused_widget, unused_event):
+        # We need to do this here, because Matplotlib's callbacks can't stop
+        # signal propagation.
+        if self.handling_motion:
+            return True
+        return False
+
+    def _event_cb(self, unused_element, event):
+        if event.type == Gdk.EventType.LEAVE_NOTIFY:
+            cursor = NORMAL_CURSOR
+            self._timeline.get_window().set_cursor(cursor)
+        return False
+
+    def _mpl_button_press_event_cb(self, event):
+        if event.button != 1:
+            return
+
+        result = self._keyframes.contains(event)
+        if result[0]:
+            # A keyframe has been clicked.
+            keyframe_index = result[1]['ind'][0]
+            offsets = self._keyframes.get_offsets()
+            offset = offsets[keyframe_index][0]
+
+            # pylint: disable=protected-access
+            if event.guiEvent.type == Gdk.EventType._2BUTTON_PRESS:
+                index = result[1]['ind'][0]
+                # pylint: disable=consider-using-in
+                if index == 0 or index == len(offsets) - 1:
+                    # It's an edge keyframe. These should not be removed.
+                    return
+
+                # Rollback the last operation if it is "Move keyframe".
+                # This is needed because a double-click also triggers a
+                # BUTTON_PRESS event which starts a "Move keyframe" operation
+                self._timeline.app.action_log.try_rollback("Move keyframe")
+                self._offset = None
+
+                # A keyframe has been double-clicked, remove it.
+                self._remove_keyframe(offset)
+            else:
+                # Remember the clicked frame for drag&drop.
+                self._timeline.app.action_log.begin("Move keyframe",
+                                                    toplevel=True)
+                self._offset = offset
+                self.handling_motion = True
+            return
+
+        result = self.__line.contains(event)
+        if result[0]:
+            # The line has been clicked.
+            self.debug("The keyframe curve has been clicked")
+            self._timeline.app.action_log.begin("Move keyframe curve segment",
+                                                toplevel=True)
+            x = event.xdata
+            offsets = self._keyframes.get_offsets()
+            keyframes = offsets[:, 0]
+            right = numpy.searchsorted(keyframes, x)
+            # Remember the clicked line for drag&drop.
+            self.__clicked_line = (offsets[right - 1], offsets[right])
+            self.__ydata_drag_start = max(self.__ylim_min, min(event.ydata, self.__ylim_max))
+            self.handling_motion = True
+
+    def _mpl_motion_event_cb(self, event):
+        if event.ydata is not None and event.xdata is not None:
+            # The mouse event is in the figure boundaries.
+            if self._offset is not None:
+                self._dragged = True
+                keyframe_ts = self.__compute_keyframe_new_timestamp(event)
+                ydata = max(self.__ylim_min, min(event.ydata, self.__ylim_max))
+
+                self._move_keyframe(int(self._offset), keyframe_ts, ydata)
+                self._offset = keyframe_ts
+                self._update_tooltip(event)
+                hovering = True
+            elif self.__clicked_line:
+                self._dragged = True
+                ydata = max(self.__ylim_min, min(event.ydata, self.__ylim_max))
+                self._move_keyframe_line(self.__clicked_line, ydata, self.__ydata_drag_start)
+                hovering = True
+            else:
+                hovering = self.__line.contains(event)[0]
+        else:
+            hovering = False
+
+        if hovering:
+            cursor = DRAG_CURSOR
+            self._update_tooltip(event)
+            if not self.__hovered:
+                self.emit("enter")
+                self.__hovered = True
+        else:
+            cursor = NORMAL_CURSOR
+            if self.__hovered:
+                self.emit("leave")
+                self._update_tooltip(None)
+                self.__hovered = False
+
+        self._timeline.get_window().set_cursor(cursor)
+
+    def _mpl_button_release_event_cb(self, event):
+        if event.button != 1:
+            return
+
+        # In order to make sure we seek to the exact position where we added a
+        # new keyframe, we don't use matplotlib's event.xdata, but rather
+        # compute it the same way we do for the seek logic.
+        event_widget = Gtk.get_event_widget(event.guiEvent)
+        x, unused_y = event_widget.translate_coordinates(self._timeline.layout.layers_vbox,
+                                                         event.x, event.y)
+        ges_clip = self._timeline.selection.get_single_clip(GES.Clip)
+        event.xdata = Zoomable.pixel_to_ns(x) - ges_clip.props.start + ges_clip.props.in_point
+
+        if self._offset is not None:
+            # If dragging a keyframe, make sure the keyframe ends up exactly
+            # where the mouse was released. Otherwise, the playhead will not
+            # seek exactly on the keyframe.
+            if self._dragged:
+                if event.ydata is not None:
+                    keyframe_ts = self.__compute_keyframe_new_timestamp(event)
+                    ydata = max(self.__ylim_min, min(event.ydata, self.__ylim_max))
+                    self._move_keyframe(int(self._offset), keyframe_ts, ydata)
+            self.debug("Keyframe released")
+            self._timeline.app.action_log.commit("Move keyframe")
+        elif self.__clicked_line:
+            self.debug("Line released")
+            self._timeline.app.action_log.commit("Move keyframe curve segment")
+
+            if not self._dragged:
+                # The keyframe line was clicked, but not dragged
+                assert event.guiEvent.type == Gdk.EventType.BUTTON_RELEASE
+                self.__maybe_create_keyframe(event)
+
+        self.handling_motion = False
+        self._offset = None
+        self.__clicked_line = ()
+        self._dragged = False
+
+    def _update_tooltip(self, event):
+        """Sets or clears the tooltip showing info about the hovered line."""
+        markup = None
+        if event:
+            if not event.xdata:
+                return
+            if self._offset is not None:
+                xdata = self._offset
+            else:
+                xdata = max(self._line_xs[0], min(event.xdata, self._line_xs[-1]))
+            res, value = self.__source.control_source_get_value(xdata)
+            assert res
+            pmin = self.__paramspec.minimum
+            pmax = self.__paramspec.maximum
+            value = value * (pmax - pmin) + pmin
+            # Translators: This is a tooltip for a clip's keyframe curve,
+            # showing what the keyframe curve affects, the timestamp at
+            # the mouse cursor location, and the value at that timestamp.
+            markup = _("Property: %s\nTimestamp: %s\nValue: %s") % (
+                self.__property_name,
+                Gst.TIME_ARGS(xdata),
+                "{:.3f}".format(value))
+        self.set_tooltip_markup(markup)
+
+    def __compute_keyframe_new_timestamp(self, event):
+        # The user can not change the timestamp of the first
+        # and last keyframes.
+        values = self.__source.get_all()
+        if self._offset in (values[0].timestamp, values[-1].timestamp):
+            return self._offset
+
+        if event.xdata != self._offset:
+            try:
+                kf = next(kf for kf in values if kf.timestamp == int(self._offset))
+            except StopIteration:
+                return event.xdata
+
+            i = values.index(kf)
+            keyframe_timestamp = int(event.xdata)
+            if keyframe_timestamp <= values[i - 1].timestamp:
+                keyframe_timestamp = values[i - 1].timestamp + 1
+            if keyframe_timestamp >= values[i + 1].timestamp:
+                keyframe_timestamp = values[i + 1].timestamp - 1
+            return keyframe_timestamp
+
+        return event.xdata
+
+
+class MultipleKeyframeCurve(KeyframeCurve):
+    """Keyframe curve which controls multiple properties at once."""
+
+    def __init__(self, timeline, bindings):
+        self.__bindings = bindings
+        super().__init__(timeline, bindings[0])
+
+        self._timeline = timeline
+        self._project = timeline.app.project_manager.current_project
+        self._project.pipeline.connect("position", self._position_cb)
+
+        sizes = [80]
+        self.__selected_keyframe = self._ax.scatter([0], [0.5], marker='D', s=sizes,
+                                                    c=SELECTED_KEYFRAME_NODE_COLOR, zorder=3)
+        self.__hovered_keyframe = self._ax.scatter([0], [0.5], marker='D', s=sizes,
+                                                   c=HOVERED_KEYFRAME_NODE_COLOR, zorder=3)
+        self.__update_selected_keyframe()
+        self.__hovered_keyframe.set_visible(False)
+
+    def release(self):
+        super().release()
+        self._project.pipeline.disconnect_by_func(self._position_cb)
+
+    def _connect_sources(self):
+        for binding in self.__bindings:
+            source = binding.props.control_source
+            source.connect("value-added", self._control_source_changed_cb)
+            source.connect("value-removed", self._control_source_changed_cb)
+            source.connect("value-changed", self._control_source_changed_cb)
+
+    def _update_plots(self):
+        timestamps = []
+        for binding in self.__bindings:
+            ts = [value.timestamp for value in binding.props.control_source.get_all()]
+            timestamps.extend(ts)
+        timestamps = sorted(list(set(timestamps)))
+
+        if len(timestamps) < 2:
+            # No plot for less than two points.
+            return
+
+        self._line_xs = []
+        self._line_ys = []
+        for timestamp in timestamps:
+            self._line_xs.append(timestamp)
+            self._line_ys.append(0.5)
+
+        self._populate_lines()
+
+    def _create_keyframe(self, timestamp):
+        with self._timeline.app.action_log.started("Add keyframe",
+                                                   toplevel=True):
+            for binding in self.__bindings:
+                binding.props.control_source.set(timestamp, binding.get_value(timestamp))
+
+    def _remove_keyframe(self, timestamp):
+        with self._timeline.app.action_log.started("Remove keyframe",
+                                                   toplevel=True):
+            for binding in self.__bindings:
+                binding.props.control_source.unset(timestamp)
+
+    def _move_keyframe(self, source_timestamp, dest_timestamp, unused_dest_value):
+        if source_timestamp == dest_timestamp:
+            return
+
+        for binding in self.__bindings:
+            dest_value = binding.get_value(source_timestamp)
+            binding.props.control_source.set(dest_timestamp, dest_value)
+            binding.props.control_source.unset(source_timestamp)
+
+    def _move_keyframe_line(self, line, y_dest_value, y_start_value):
+        pass
+
+    def _mpl_button_release_event_cb(self, event):
+        if event.button == 1:
+            if self._offset is not None and not self._dragged:
+                # A keyframe was clicked but not dragged, so we
+                # should select it by seeking to its position.
+                source = self._timeline.selection.get_single_clip()
+                assert source
+                position = int(self._offset) - source.props.in_point + source.props.start
+
+                if self._timeline.app.settings.leftClickAlsoSeeks:
+                    self._timeline.set_next_seek_position(position)
+                else:
+                    self._project.pipeline.simple_seek(position)
+
+        super()._mpl_button_release_event_cb(event)
+
+    def _mpl_motion_event_cb(self, event):
+        super()._mpl_motion_event_cb(event)
+
+        result = self._keyframes.contains(event)
+        if result[0]:
+            # A keyframe is hovered
+            keyframe_index = result[1]['ind'][0]
+            offset = self._keyframes.get_offsets()[keyframe_index][0]
+            self.__show_special_keyframe(self.__hovered_keyframe, offset)
+        else:
+            self.__hide_special_keyframe(self.__hovered_keyframe)
+
+    def __show_special_keyframe(self, keyframe, offset):
+        offsets = numpy.array([[offset, 0.5]])
+        keyframe.set_offsets(offsets)
+        keyframe.set_visible(True)
+        self.queue_draw()
+
+    def __hide_special_keyframe(self, keyframe):
+        keyframe.set_visible(False)
+        self.queue_draw()
+
+    def _control_source_changed_cb(self, control_source, timed_value):
+        super()._control_source_changed_cb(control_source, timed_value)
+        self.__update_selected_keyframe()
+        self.__hide_special_keyframe(self.__hovered_keyframe)
+
+    def _position_cb(self, unused_pipeline, unused_position):
+        self.__update_selected_keyframe()
+
+    def __update_selected_keyframe(self):
+        try:
+            position = self._project.pipeline.get_position()
+        except PipelineError:
+            self.warning("Could not get pipeline position")
+            return
+
+        source = self._timeline.selection.get_single_clip()
+        if source is None:
+            return
+        source_position = position - source.props.start + source.props.in_point
+
+        offsets = self._keyframes.get_offsets()
+        keyframes = offsets[:, 0]
+
+        index = numpy.searchsorted(keyframes, source_position)
+        if 0 <= index < len(keyframes) and keyframes[index] == source_position:
+            self.__show_special_keyframe(self.__selected_keyframe, source_position)
+        else:
+            self.__hide_special_keyframe(self.__selected_keyframe)
+
+    def _update_tooltip(self, event):
+        markup = None
+        if event:
+            if not event.xdata:
+                return
+            markup = _("Timestamp: %s") % Gst.TIME_ARGS(event.xdata)
+        self.set_tooltip_markup(markup)
@@ -24,7 +24,10 @@ from gi.repository import Gtk
 
 from pitivi.timeline import elements
 from pitivi.undo.timeline import CommitTimelineFinalizingAction
+from pitivi.utils.intervaltree import LayerClipsIndex
 from pitivi.utils.loggable import Loggable
+from pitivi.utils.misc import disconnect_all_by_func
+from pitivi.utils.timeline import Selected
 from pitivi.utils.timeline import Zoomable
 from pitivi.utils.ui import LAYER_HEIGHT
 from pitivi.utils.ui import PADDING
@@ -293,11 +296,22 @@ class LayerControls(Gtk.EventBox, Loggable):
 
 
 class Layer(Gtk.Layout, Zoomable, Loggable):
-    """Container for the clips widgets of a layer."""
+    """Container for the clips widgets of a layer.
+
+    The clips are kept as records in the clips index and their widgets
+    are created only when they get close to the visible area of the
+    timeline, so `ges_clip.ui` is None for the clips far from it.
+
+    Args:
+        ges_layer (GES.Layer): The layer to be represented.
+        timeline (Timeline): The timeline containing the layer.
+        viewport (Optional[Tuple[int, int]]): The scroll offset and the
+            width in pixels of the visible area of the timeline.
+    """
 
     __gtype_name__ = "PitiviLayer"
 
-    def __init__(self, ges_layer, timeline):
+    def __init__(self, ges_layer, timeline, viewport=None):
         Gtk.Layout.__init__(self)
         Zoomable.__init__(self)
         Loggable.__init__(self)
@@ -309,6 +323,18 @@ class Layer(Gtk.Layout, Zoomable, Loggable):
 
         self._children = []
         self._changed = False
+        # Whether the media types must be checked when the timeline
+        # stops batching the updates.
+        self.__media_types_outdated = False
+        self.clips_index = LayerClipsIndex(ges_layer)
+        # The (left, right) interval in pixels visible in the timeline.
+        self.__viewport = None
+        if viewport and viewport[1]:
+            left, width = viewport
+            self.__viewport = (left, left + width)
+        # The zoom ratio for which the clips close to the viewport
+        # have been laid out.
+        self.__layout_zoom_ratio = self.zoomratio
 
         self.ges_layer.connect("clip-added", self._clip_added_cb)
         self.ges_layer.connect("clip-removed", self._clip_removed_cb)
@@ -350,6 +376,7 @@ class Layer(Gtk.Layout, Zoomable, Loggable):
             self._remove_clip(ges_clip)
         self.ges_layer.disconnect_by_func(self._clip_added_cb)
         self.ges_layer.disconnect_by_func(self._clip_removed_cb)
+        self.clips_index.release()
 
     def check_media_types(self):
         if self.timeline.editing_context:
@@ -382,14 +409,16 @@ class Layer(Gtk.Layout, Zoomable, Loggable):
             self.update_position()
 
     def _clip_child_added_cb(self, ges_clip, child):
+        self.__setup_clip_child(child)
         self.check_media_types()
 
     def _clip_child_removed_cb(self, ges_clip, child):
+        self.__release_clip_child(child)
         self.check_media_types()
 
     def _clip_added_cb(self, unused_ges_layer, ges_clip):
         self._add_clip(ges_clip)
-        self.check_media_types()
+        self.__update_media_types()
 
     def _add_clip(self, ges_clip):
         ui_type = elements.GES_TYPE_UI_TYPE.get(ges_clip.__gtype__, None)
@@ -397,44 +426,177 @@ class Layer(Gtk.Layout, Zoomable, Loggable):
             self.error("Implement UI for type %s?", ges_clip.__gtype__)
             return
 
+        # The state which has to survive the widget of the clip.
+        if not hasattr(ges_clip, "selected"):
+            ges_clip.selected = Selected()
+        ges_clip.ui = None
+        for child in ges_clip.get_children(False):
+            self.__setup_clip_child(child)
+
+        # Connected before the widget is created, so the records of the
+        # children are set up before the widget handles them.
+        ges_clip.connect_after("child-added", self._clip_child_added_cb)
+        ges_clip.connect_after("child-removed", self._clip_child_removed_cb)
+        ges_clip.connect("notify::start", self.__clip_moved_cb)
+        ges_clip.connect("notify::duration", self.__clip_moved_cb)
+
+        self.__update_clip(ges_clip)
+
+    def __setup_clip_child(self, child):
+        if not hasattr(child, "selected"):
+            child.selected = Selected()
+        child.ui = None
+        if isinstance(child, GES.VideoSource):
+            project = self.app.project_manager.current_project
+            child.positioner = elements.VideoSourcePositioner(child, project)
+
+    def __release_clip_child(self, child):
+        positioner = getattr(child, "positioner", None)
+        if positioner:
+            positioner.release()
+            child.positioner = None
+
+    def __clip_moved_cb(self, ges_clip, unused_pspec):
+        self.__update_clip(ges_clip)
+
+    def __update_clip(self, ges_clip):
+        """Creates or releases the widget of the clip, if needed."""
+        distance = self.__get_clip_distance(ges_clip)
+        if not ges_clip.ui:
+            if distance is None or distance <= elements.VIEWPORT_MARGIN:
+                self.__create_clip_widget(ges_clip)
+        elif distance is not None and distance > 2 * elements.VIEWPORT_MARGIN:
+            # The widgets of the selected clips are kept, as they hold
+            # the keyframes being edited.
+            if not ges_clip.selected:
+                self.__release_clip_widget(ges_clip)
+
+    def __get_clip_distance(self, ges_clip):
+        start = ges_clip.props.start
+        x = self.ns_to_pixel(start)
+        width = self.ns_to_pixel(start + ges_clip.props.duration) - x
+        return self.get_viewport_distance(x, width)
+
+    def __create_clip_widget(self, ges_clip):
+        ui_type = elements.GES_TYPE_UI_TYPE[ges_clip.__gtype__]
         widget = ui_type(self, ges_clip)
         self._children.append(widget)
-        self._children.sort(key=lambda clip: clip.z_order)
+        if not self.timeline.batching_updates:
+            self._children.sort(key=lambda clip: clip.z_order)
         self.put(widget, self.ns_to_pixel(ges_clip.props.start), 0)
         widget.update_position()
         self._changed = True
         widget.show_all()
 
-        ges_clip.connect_after("child-added", self._clip_child_added_cb)
-        ges_clip.connect_after("child-removed", self._clip_child_removed_cb)
+    def __release_clip_widget(self, ges_clip):
+        widget = ges_clip.ui
+        if not widget:
+            return
+
+        self.remove(widget)
+        self._children.remove(widget)
+        self._changed = True
+        widget.release()
+        ges_clip.ui = None
 
     def _clip_removed_cb(self, unused_ges_layer, ges_clip):
         self._remove_clip(ges_clip)
-        self.check_media_types()
+        self.__update_media_types()
 
-    def _remove_clip(self, ges_clip):
-        if not ges_clip.ui:
+    def __update_media_types(self):
+        if self.timeline.batching_updates:
+            # Avoid scanning all the clips for every added or removed clip.
+            self.__media_types_outdated = True
             return
 
+        self.check_media_types()
+
+    def update_after_batch(self):
+        """Performs the updates deferred while the timeline batched them."""
+        self._children.sort(key=lambda clip: clip.z_order)
+        if self.__media_types_outdated:
+            self.__media_types_outdated = False
+            self.check_media_types()
+        self.queue_resize()
+
+    def _remove_clip(self, ges_clip):
         ui_type = elements.GES_TYPE_UI_TYPE.get(ges_clip.__gtype__, None)
         if ui_type is None:
             self.error("Implement UI for type %s?", ges_clip.__gtype__)
             return
 
-        self.remove(ges_clip.ui)
-        self._children.remove(ges_clip.ui)
-        self._changed = True
-        ges_clip.ui.release()
-        ges_clip.ui = None
+        self.__release_clip_widget(ges_clip)
+        for child in ges_clip.get_children(False):
+            self.__release_clip_child(child)
 
-        ges_clip.disconnect_by_func(self._clip_child_added_cb)
-        ges_clip.disconnect_by_func(self._clip_child_removed_cb)
+        disconnect_all_by_func(ges_clip, self._clip_child_added_cb)
+        disconnect_all_by_func(ges_clip, self._clip_child_removed_cb)
+        disconnect_all_by_func(ges_clip, self.__clip_moved_cb)
 
     def update_position(self):
-        for ges_clip in self.ges_layer.get_clips():
-            if hasattr(ges_clip, "ui"):
+        """Lays out the clips close to the visible area.
+
+        The widgets of the clips getting close to it are created and the
+        ones of the clips getting far from it are released.
+        """
+        self.__layout_zoom_ratio = self.zoomratio
+        if not self.__viewport:
+            ges_clips = self.ges_layer.get_clips()
+        else:
+            left, right = self.__viewport
+            margin = 2 * elements.VIEWPORT_MARGIN
+            start = self.pixel_to_ns(max(0, left - margin))
+            end = self.pixel_to_ns(right + margin)
+            # Also the clips which got far from the visible area.
+            ges_clips = {child.ges_clip for child in self._children}
+            ges_clips.update(self.clips_index.get_clips_in_interval(start, end))
+
+        for ges_clip in ges_clips:
+            if not hasattr(ges_clip, "ui"):
+                # No UI for this type of clip.
+                continue
+            self.__update_clip(ges_clip)
+            if ges_clip.ui:
                 ges_clip.ui.update_position()
 
+    def set_viewport(self, left, width):
+        """Sets the interval visible in the timeline.
+
+        The widgets of the clips far from it are released.
+
+        Args:
+            left (int): The scroll offset in pixels.
+            width (int): The width in pixels of the visible area, 0 if
+                not known yet.
+        """
+        viewport = (left, left + width) if width else None
+        if viewport == self.__viewport:
+            return
+
+        self.__viewport = viewport
+        self.update_position()
+
+    def get_viewport_distance(self, x, width):
+        """Gets the distance between an interval and the visible area.
+
+        Args:
+            x (int): The start of the interval in pixels.
+            width (int): The width of the interval in pixels.
+
+        Returns:
+            int: The distance in pixels, 0 if the interval is visible, or
+            None if the visible area is not known yet.
+        """
+        if not self.__viewport:
+            return None
+
+        left, right = self.__viewport
+        if x + width < left:
+            return left - x - width
+        if x > right:
+            return x - right
+        return 0
+
     def do_draw(self, cr):
         if self._changed:
             self._children.sort(key=lambda clip: clip.z_order)
@@ -444,5 +606,27 @@ class Layer(Gtk.Layout, Zoomable, Loggable):
                     window.raise_()
             self._changed = False
 
-        for child in self._children:
+        for child in self.__get_exposed_children(cr):
             self.propagate_draw(child, cr)
+
+    def __get_exposed_children(self, cr):
+        """Gets the clips widgets intersecting the area to be drawn.
+
+        When the playhead moves, the exposed area is a narrow column, so
+        the clips are found with the index instead of going through all.
+
+        Returns:
+            List[elements.Clip]: The widgets sorted by z-order.
+        """
+        if self.__layout_zoom_ratio != self.zoomratio:
+            # The positions of the widgets do not match the current zoom.
+            return self._children
+
+        left, unused_top, right, unused_bottom = cr.clip_extents()
+        start = self.pixel_to_ns(max(0, left - 1))
+        end = self.pixel_to_ns(right + 1)
+        children = [ges_clip.ui
+                    for ges_clip in self.clips_index.get_clips_in_interval(start, end)
+                    if getattr(ges_clip, "ui", None)]
+        children.sort(key=lambda clip: clip.z_order)
+        return children
@@ -100,7 +100,7 @@ class Marker(Gtk.EventBox, Loggable):
 class MarkersBox(Gtk.EventBox, Zoomable, Loggable):
     """Container for displaying and managing markers."""
 
-    def __init__(self, app, hadj=None):
+    def __init__(self, app, hadj=None, timeline=None):
         Gtk.EventBox.__init__(self)
         Zoomable.__init__(self)
         Loggable.__init__(self)
@@ -110,6 +110,8 @@ class MarkersBox(Gtk.EventBox, Zoomable, Loggable):
         self.get_style_context().add_class("MarkersBox")
 
         self.app = app
+        # The timeline used to snap the markers being moved.
+        self.timeline = timeline
 
         if hadj:
             hadj.connect("value-changed", self._hadj_value_changed_cb)
@@ -223,6 +225,8 @@ class MarkersBox(Gtk.EventBox, Zoomable, Loggable):
                 self.marker_moving.selected = False
                 self.marker_moving = None
                 self.app.action_log.commit("Move marker")
+                if self.timeline:
+                    self.timeline.end_snap()
             elif self.marker_new:
                 self.marker_new.selected = False
                 self.marker_new = None
@@ -237,6 +241,9 @@ class MarkersBox(Gtk.EventBox, Zoomable, Loggable):
             event_x, unused_y = event_widget.translate_coordinates(self, event.x, event.y)
             event_x = max(0, event_x)
             position_ns = self.pixel_to_ns(event_x + self.offset)
+            if self.timeline:
+                position_ns = self.timeline.snap_position(
+                    position_ns, excluded_markers=[self.marker_moving.ges_marker])
             self.__markers_container.move(self.marker_moving.ges_marker, position_ns)
 
     def _marker_added_cb(self, unused_markers, position, ges_marker):
@@ -438,6 +438,8 @@ class ImagePreviewer(Gtk.Layout, Previewer, Zoomable, Loggable):
 
         self.become_controlled()
 
+        # The width changes when the zoom changes.
+        self.connect("notify::width-request", self._width_changed_cb)
         self.connect("notify::height-request", self._height_changed_cb)
 
     def _start_thumbnailing_cb(self):
@@ -503,7 +505,7 @@ class ImagePreviewer(Gtk.Layout, Previewer, Zoomable, Loggable):
             self.remove(thumb)
         self.thumbs = thumbs
 
-    def zoom_changed(self):
+    def _width_changed_cb(self, unused_widget, unused_param_spec):
         self._update_thumbnails()
 
     def _height_changed_cb(self, unused_widget, unused_param_spec):
@@ -846,6 +848,8 @@ class VideoPreviewer(Gtk.Layout, AssetPreviewer, Zoomable):
         self.ges_elem.connect("notify::in-point", self._inpoint_changed_cb)
         self.ges_elem.connect("notify::duration", self._duration_changed_cb)
 
+        # The width changes when the zoom changes.
+        self.connect("notify::width-request", self._width_changed_cb)
         self.connect("notify::height-request", self._height_changed_cb)
 
     def set_selected(self, selected):
@@ -914,6 +918,9 @@ class VideoPreviewer(Gtk.Layout, AssetPreviewer, Zoomable):
         self.stop_generation()
         Zoomable.__del__(self)
 
+    def _width_changed_cb(self, unused_widget, unused_param_spec):
+        self._update_thumbnails()
+
     def _height_changed_cb(self, unused_widget, unused_param_spec):
         self._update_thumbnails()
 
@@ -925,9 +932,6 @@ class VideoPreviewer(Gtk.Layout, AssetPreviewer, Zoomable):
         """Handles the changing of the duration of the clip."""
         self._update_thumbnails()
 
-    def zoom_changed(self):
-        self._update_thumbnails()
-
 
 class Thumbnail(Gtk.Image):
     """Simple widget representing a Thumbnail."""
@@ -229,7 +229,7 @@ class ScaleRuler(Gtk.DrawingArea, Loggable):
             if position > timeline_duration:
                 position = timeline_duration
         human_time = beautify_length(position)
-        cur_frame = self.ges_timeline.get_frame_at(position) + 1
+        cur_frame = self.ges_timeline.get_asset().frame_grid.get_frame_at(position) + 1
         self.set_tooltip_text(human_time + "\n" + _("Frame #%d") % cur_frame)
 
 # Drawing methods
@@ -357,7 +357,8 @@ class ScaleRuler(Gtk.DrawingArea, Loggable):
             # Timeline not set yet
             return
 
-        frame_width = self.zoom.ns_to_pixel(self.ges_timeline.get_frame_time(1))
+        frame_grid = self.ges_timeline.get_asset().frame_grid
+        frame_width = self.zoom.ns_to_pixel(frame_grid.frame_duration)
         if frame_width < FRAME_MIN_WIDTH_PIXELS:
             return
 
@@ -365,11 +366,11 @@ class ScaleRuler(Gtk.DrawingArea, Loggable):
         height = context.get_target().get_height()
         y = int(height - FRAME_HEIGHT_PIXELS)
 
-        frame_num = self.ges_timeline.get_frame_at(self.zoom.pixel_to_ns(self.pixbuf_offset))
+        frame_num = frame_grid.get_frame_at(self.zoom.pixel_to_ns(self.pixbuf_offset))
         paintpos = self.pixbuf_offset - offset
         max_pos = context.get_target().get_width() + self.pixbuf_offset
         while paintpos < max_pos:
-            paintpos = self.zoom.ns_to_pixel(self.ges_timeline.get_frame_time(frame_num))
+            paintpos = self.zoom.ns_to_pixel(frame_grid.get_frame_time(frame_num))
             if frame_num % 2:
                 set_cairo_color(context, self._color_frame)
                 context.rectangle(
@@ -14,6 +14,8 @@
 #
 # You should have received a copy of the GNU Lesser General Public
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
+import contextlib
+import math
 import os
 from gettext import gettext as _
 
@@ -42,6 +44,7 @@ from pitivi.timeline.markers import MarkersBox
 from pitivi.timeline.previewers import Previewer
 from pitivi.timeline.ruler import TimelineScaleRuler
 from pitivi.undo.timeline import CommitTimelineFinalizingAction
+from pitivi.utils.intervaltree import TimelineEdgesIndex
 from pitivi.utils.loggable import Loggable
 from pitivi.utils.misc import asset_get_duration
 from pitivi.utils.proxy import get_proxy_target
@@ -208,6 +211,8 @@ class LayersLayout(Gtk.Layout, Zoomable, Loggable):
     Attributes:
         snap_position (int): The time where the snapbar should appear.
         playhead_position (int): The time where the playhead should appear.
+        layout_zoom_ratio (float): The zoom ratio for which the clips
+            have been laid out.
     """
 
     def __init__(self, timeline):
@@ -219,6 +224,7 @@ class LayersLayout(Gtk.Layout, Zoomable, Loggable):
 
         self.snap_position = 0
         self.playhead_position = 0
+        self.layout_zoom_ratio = self.zoomratio
 
         self.layers_vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
         self.layers_vbox.get_style_context().add_class("LayersBox")
@@ -237,11 +243,60 @@ class LayersLayout(Gtk.Layout, Zoomable, Loggable):
 
     def do_draw(self, cr):
         """Draws the children and indicators."""
-        Gtk.Layout.do_draw(self, cr)
+        if self.layout_zoom_ratio != self.zoomratio:
+            # Until the clips are laid out again for the new zoom ratio,
+            # stretch the current layout around the scroll offset.
+            scale = self.zoomratio / self.layout_zoom_ratio
+            offset = self.get_hadjustment().get_value()
+            cr.save()
+            cr.translate(offset * (scale - 1), 0)
+            cr.scale(scale, 1)
+            Gtk.Layout.do_draw(self, cr)
+            cr.restore()
+        else:
+            Gtk.Layout.do_draw(self, cr)
 
         self.__draw_playhead(cr)
         self.__draw_snap_indicator(cr)
 
+    def set_playhead_position(self, position):
+        """Moves the playhead, redrawing only the area it covers.
+
+        Args:
+            position (int): The time where the playhead should appear.
+        """
+        if position == self.playhead_position:
+            return
+
+        self.__queue_draw_vertical_bar(max(0, self.playhead_position), PLAYHEAD_WIDTH)
+        self.playhead_position = position
+        self.__queue_draw_vertical_bar(max(0, position), PLAYHEAD_WIDTH)
+
+    def set_snap_position(self, position):
+        """Moves or hides the snap indicator, redrawing only the area it covers.
+
+        Args:
+            position (int): The time where the snapbar should appear, or 0
+                to hide it.
+        """
+        if position == self.snap_position:
+            return
+
+        self.__queue_draw_vertical_bar(self.snap_position, SNAPBAR_WIDTH)
+        self.snap_position = position
+        self.__queue_draw_vertical_bar(position, SNAPBAR_WIDTH)
+
+    def __queue_draw_vertical_bar(self, position, width):
+        if self.layout_zoom_ratio != self.zoomratio:
+            # The entire layout is redrawn when laid out for the new zoom.
+            self.queue_draw()
+            return
+
+        # Only the clips below the bar have to be redrawn, not all of them.
+        x = self.ns_to_pixel(position) - self.get_hadjustment().get_value()
+        margin = math.ceil(width / 2) + 1
+        self.queue_draw_area(int(x) - margin, 0, 2 * margin + 1, self.get_allocated_height())
+
     def __draw_playhead(self, cr):
         """Draws the playhead line."""
         offset = self.get_hadjustment().get_value()
@@ -367,12 +422,21 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
         self._separator_accepting_drop = False
         self._separator_accepting_drop_id = 0
         self.__last_position = 0
+        # The sorted positions of the clip edges and markers.
+        self.edges_index = None
         self.scrubbing = False
         self._scrolling = False
         # The parameters for the delayed scroll to be performed after
         # the layers box is allocated a size.
         self.delayed_scroll = {}
         self.__next_seek_position = None
+        # The drag is updated at most once per frame, see __queue_drag_update.
+        self.__pending_drag_coords = None
+        self.__drag_tick_id = 0
+        # The clips are laid out on idle after zooming.
+        self.__zoom_relayout_id = 0
+        # The number of nested `updates_batched` blocks being executed.
+        self.__updates_batch_depth = 0
 
         # Clip selection.
         self.selection = Selection()
@@ -432,6 +496,7 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
         self.layout.layers_vbox.connect_after("size-allocate", self.__size_allocate_cb)
 
         self.hadj.connect("value-changed", self.__hadj_value_changed_cb)
+        self.hadj.connect("notify::page-size", self.__hadj_page_size_changed_cb)
 
     def __size_allocate_cb(self, unused_widget, unused_allocation):
         """Handles the layers vbox size allocations."""
@@ -471,6 +536,9 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
             for ges_layer in self.ges_timeline.get_layers():
                 self._remove_layer(ges_layer)
 
+            self.edges_index.release()
+            self.edges_index = None
+
             self.ges_timeline.ui = None
             self.ges_timeline = None
 
@@ -486,6 +554,8 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
             return
 
         self.ges_timeline.ui = self
+        self.edges_index = TimelineEdgesIndex(self.ges_timeline)
+        self.edges_index.playhead_position = self.__last_position
 
         for ges_layer in self.ges_timeline.get_layers():
             self._add_layer(ges_layer)
@@ -546,8 +616,9 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
             return
 
         self.__last_position = position
-        self.layout.playhead_position = position
-        self.layout.queue_draw()
+        self.layout.set_playhead_position(position)
+        if self.edges_index:
+            self.edges_index.playhead_position = position
         layout_width = self.layout.get_allocation().width
         x = self.ns_to_pixel(self.__last_position) - self.hadj.get_value()
         if pipeline.playing() and x > layout_width - 100:
@@ -558,16 +629,38 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
 
     def __snapping_started_cb(self, unused_timeline, unused_obj1, unused_obj2, position):
         """Handles a clip snap update operation."""
-        self.layout.snap_position = position
-        self.layout.queue_draw()
+        self.layout.set_snap_position(position)
 
     def __snapping_ended_cb(self, *unused_args):
-        self.__end_snap()
+        self.end_snap()
 
-    def __end_snap(self):
+    def end_snap(self):
         """Updates the UI to reflect the snap has ended."""
-        self.layout.snap_position = 0
-        self.layout.queue_draw()
+        self.layout.set_snap_position(0)
+
+    def snap_position(self, position, excluded_markers=()):
+        """Snaps a position to the nearby clip edges, markers or playhead.
+
+        Used for the objects which are not snapped by GES. The snap
+        indicator is shown when the position is snapped.
+
+        Args:
+            position (int): The position to be snapped.
+            excluded_markers (List[GES.Marker]): Markers to be ignored.
+
+        Returns:
+            int: The snapped position, or the position if nothing is
+            close enough.
+        """
+        snapped = self.edges_index.get_snap_position(
+            position, self.ges_timeline.get_snapping_distance(),
+            excluded_markers=excluded_markers)
+        if snapped is None:
+            self.end_snap()
+            return position
+
+        self.layout.set_snap_position(snapped)
+        return snapped
 
     def update_snapping_distance(self):
         """Updates the snapping distance of self.ges_timeline."""
@@ -687,15 +780,10 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
         """
         sources = []
         for layer in self.ges_timeline.layers:
-            clips = layer.get_clips()
-            for clip in clips:
-                start = clip.get_start()
-                duration = clip.get_duration()
-                if start <= position <= duration + start:
-                    source = clip.find_track_element(None, GES.VideoSource)
-                    if source:
-                        sources.append(source)
-                    continue
+            for clip in layer.ui.clips_index.get_clips_at(position):
+                source = clip.find_track_element(None, GES.VideoSource)
+                if source:
+                    sources.append(source)
         return sources
 
     def update_visible_overlays(self):
@@ -795,7 +883,7 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
                 clicked_layer, click_pos = self.get_clicked_layer_and_pos(event)
                 self.set_selection_meta_info(clicked_layer, click_pos, SELECT)
 
-        self.__end_snap()
+        self.end_snap()
         self.update_visible_overlays()
 
         return False
@@ -834,13 +922,16 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
         clips = set()
         for layer_pos in layers_pos:
             layer = layers[layer_pos]
-            clips.update(layer.get_clips_in_interval(start, end))
+            clips.update(layer.ui.clips_index.get_clips_in_interval(start, end))
 
         grouped_clips = set()
         # Also include those clips which are grouped with currently selected clips.
+        groups = set()
         for clip in clips:
             toplevel = clip.get_toplevel_parent()
-            if isinstance(toplevel, GES.Group):
+            if isinstance(toplevel, GES.Group) and toplevel not in groups:
+                # Expand each group only once, not once per clip.
+                groups.add(toplevel)
                 grouped_clips.update([c for c in toplevel.get_children(True)
                                       if isinstance(c, GES.Clip)])
 
@@ -868,7 +959,7 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
             if self.got_dragged or self.__past_threshold(event):
                 event_widget = Gtk.get_event_widget(event)
                 x, y = event_widget.translate_coordinates(self.layout.layers_vbox, event.x, event.y)
-                self.__drag_update(x, y)
+                self.__queue_drag_update(x, y)
                 self.got_dragged = True
         elif self.__moving_layer:
             event_widget = Gtk.get_event_widget(event)
@@ -919,6 +1010,24 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
 
     def __hadj_value_changed_cb(self, hadj):
         self.editor_state.set_value("scroll", hadj.get_value())
+        self.__update_viewport()
+
+    def __hadj_page_size_changed_cb(self, unused_hadj, unused_pspec):
+        self.__update_viewport()
+
+    def __update_viewport(self):
+        """Lets the layers know which part of the timeline is visible."""
+        if not self.ges_timeline:
+            return
+
+        if self.__zoom_relayout_id:
+            # The layers are updated when the clips are laid out again.
+            return
+
+        left = self.hadj.get_value()
+        width = self.hadj.props.page_size
+        for ges_layer in self.ges_timeline.get_layers():
+            ges_layer.ui.set_viewport(left, width)
 
     def update_position(self):
         for ges_layer in self.ges_timeline.get_layers():
@@ -1016,7 +1125,7 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
             if not self.dropping_clips:
                 # The preview clips have not been created yet.
                 self.__create_clips(x, y)
-            self.__drag_update(x, y)
+            self.__queue_drag_update(x, y)
         Gdk.drag_status(context, Gdk.DragAction.COPY, timestamp)
         return True
 
@@ -1024,6 +1133,12 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
         # De-highlight the separators. We still need to remember them.
         # See how __on_separators is used in __dragDropCb for details
         self._set_separators_prelight(False)
+        if self.dragging_element:
+            # GTK emits drag-leave before drag-drop, so the dropped clips
+            # have to be at the last position of the pointer.
+            self.flush_drag_update()
+        else:
+            self.__cancel_drag_update()
 
         target = self.drag_dest_find_target(context, None)
         if self.dragging_element:
@@ -1101,7 +1216,8 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
     # Handle layers
     def _layer_added_cb(self, unused_ges_timeline, ges_layer):
         self._add_layer(ges_layer)
-        self.__update_layers()
+        if not self.batching_updates:
+            self.__update_layers()
 
     def move_layer(self, ges_layer, index):
         self.debug("Moving layer %s to %s", ges_layer.props.priority, index)
@@ -1114,7 +1230,8 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
 
     def _add_layer(self, ges_layer):
         """Adds widgets for controlling and showing the specified layer."""
-        layer = Layer(ges_layer, self)
+        viewport = (self.hadj.get_value(), self.hadj.props.page_size)
+        layer = Layer(ges_layer, self, viewport=viewport)
         ges_layer.ui = layer
 
         if not self._separators:
@@ -1149,7 +1266,8 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
 
     def __layer_priority_changed_cb(self, unused_ges_layer, unused_pspec):
         """Handles the changing of a layer's priority."""
-        self.__update_layers()
+        if not self.batching_updates:
+            self.__update_layers()
 
     def __update_layers(self):
         """Updates the layer widgets if their priorities are in good order."""
@@ -1202,7 +1320,31 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
 
     def _layer_removed_cb(self, unused_ges_timeline, ges_layer):
         self._remove_layer(ges_layer)
-        self.__update_layers()
+        if not self.batching_updates:
+            self.__update_layers()
+
+    @property
+    def batching_updates(self):
+        """Whether the widgets updates are deferred, see `updates_batched`."""
+        return self.__updates_batch_depth > 0
+
+    @contextlib.contextmanager
+    def updates_batched(self):
+        """Defers the updates of the widgets while changing the timeline.
+
+        Useful when performing many changes at once, for example when
+        undoing the removal of many clips. The layers are updated and laid
+        out only once, at the end.
+        """
+        self.__updates_batch_depth += 1
+        try:
+            yield
+        finally:
+            self.__updates_batch_depth -= 1
+            if not self.__updates_batch_depth and self.ges_timeline:
+                for ges_layer in self.ges_timeline.get_layers():
+                    ges_layer.ui.update_after_batch()
+                self.__update_layers()
 
     def separator_priority(self, separator):
         position = self.layout.layers_vbox.child_get_property(separator, "position")
@@ -1218,9 +1360,21 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
         self.update_snapping_distance()
         self.zoomed_fitted = False
 
-        self.update_position()
+        # The layout draws the clips stretched until they are laid out
+        # again, so zooming repeatedly stays responsive.
+        if not self.__zoom_relayout_id:
+            self.__zoom_relayout_id = GLib.idle_add(self.__zoom_relayout_cb)
         self.editor_state.set_value("zoom-level", Zoomable.get_current_zoom_level())
 
+    def __zoom_relayout_cb(self):
+        self.__zoom_relayout_id = 0
+        if self.ges_timeline:
+            self.__update_viewport()
+            self.update_position()
+        self.layout.layout_zoom_ratio = Zoomable.zoomratio
+        self.layout.queue_draw()
+        return GLib.SOURCE_REMOVE
+
     def set_best_zoom_ratio(self, allow_zoom_in=False):
         """Sets the zoom level so that the entire timeline is in view."""
         duration = 0 if not self.ges_timeline else self.ges_timeline.get_duration()
@@ -1333,6 +1487,51 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
             else:
                 unset_children_state_recurse(sep, Gtk.StateFlags.PRELIGHT)
 
+    def __queue_drag_update(self, x, y):
+        """Updates the drag operation at most once per frame.
+
+        The pointer can report motion events much more often than the
+        frames are drawn and each edit is expensive, so the coordinates
+        received while an update has already been done in the current
+        frame are kept and only the latest ones are applied on the next
+        frame clock tick.
+
+        Args:
+            x (int): The x coordinate relative to the layers box.
+            y (int): The y coordinate relative to the layers box.
+        """
+        if self.__drag_tick_id:
+            self.__pending_drag_coords = x, y
+            return
+
+        self.__drag_update(x, y)
+        if self.get_frame_clock():
+            self.__drag_tick_id = self.add_tick_callback(self.__drag_tick_cb)
+
+    def __drag_tick_cb(self, unused_widget, unused_frame_clock):
+        if self.__pending_drag_coords:
+            x, y = self.__pending_drag_coords
+            self.__pending_drag_coords = None
+            self.__drag_update(x, y)
+            return GLib.SOURCE_CONTINUE
+
+        self.__drag_tick_id = 0
+        return GLib.SOURCE_REMOVE
+
+    def __cancel_drag_update(self):
+        """Forgets the pending drag update, if any."""
+        if self.__drag_tick_id:
+            self.remove_tick_callback(self.__drag_tick_id)
+            self.__drag_tick_id = 0
+        self.__pending_drag_coords = None
+
+    def flush_drag_update(self):
+        """Applies the pending drag update, if any."""
+        coords = self.__pending_drag_coords
+        self.__cancel_drag_update()
+        if coords:
+            self.__drag_update(*coords)
+
     def __drag_update(self, x, y):
         """Updates a clip or asset drag operation.
 
@@ -1408,8 +1607,11 @@ class Timeline(Gtk.EventBox, Zoomable, Loggable):
         return new_ges_layer
 
     def drag_end(self):
+        # Make sure the clips end up where the pointer has been released.
+        self.flush_drag_update()
+
         if self.editing_context:
-            self.__end_snap()
+            self.end_snap()
 
             if self._separator_accepting_drop and self.__on_separators and self.__got_dragged and not self.__clicked_handle:
                 priority = self.separator_priority(self.__on_separators[1])
@@ -1473,12 +1675,11 @@ class TimelineContainer(Gtk.Grid, Zoomable, Loggable):
         """
         original_asset = get_proxy_target(asset)
         replacement_asset = proxy or asset
-        for clip in self.timeline.clips():
-            if not isinstance(clip, GES.UriClip):
-                continue
+        for clip in self._project.clips_index.get_clips(original_asset):
             if get_proxy_target(clip) == original_asset:
                 clip.set_asset(replacement_asset)
-        self._project.pipeline.commit_timeline()
+        # Many proxies can become ready at once.
+        self._project.pipeline.queue_commit_timeline()
 
     def insert_assets(self, assets, position=None):
         """Creates clips out of the specified assets on the longest layer."""
@@ -1493,7 +1694,7 @@ class TimelineContainer(Gtk.Grid, Zoomable, Loggable):
             first_layer = layers[0]
             start = self.__get_insert_position(position)
             end = start + sum([clip.get_duration() for clip in clips])
-            intersecting_clips = first_layer.get_clips_in_interval(start, end)
+            intersecting_clips = first_layer.ui.clips_index.get_clips_in_interval(start, end)
             if intersecting_clips:
                 first_layer = self.timeline.create_layer(0)
             self._insert_clips_and_assets(clips, start, first_layer)
@@ -1544,7 +1745,7 @@ class TimelineContainer(Gtk.Grid, Zoomable, Loggable):
             for clip in layer.get_clips():
                 if asset_id == clip.get_id():
                     layer.remove_clip(clip)
-        self._project.pipeline.commit_timeline()
+        self._project.pipeline.queue_commit_timeline()
 
     def scroll_to_pixel(self, x):
         if x > self.timeline.hadj.props.upper:
@@ -1643,7 +1844,7 @@ class TimelineContainer(Gtk.Grid, Zoomable, Loggable):
         self.gapless_button = builder.get_object("gapless_button")
         self.gapless_button.set_active(self._settings.timelineAutoRipple)
 
-        self.markers = MarkersBox(self.app, hadj=self.timeline.hadj)
+        self.markers = MarkersBox(self.app, hadj=self.timeline.hadj, timeline=self.timeline)
 
         self.attach(self.markers, 1, 0, 1, 1)
         self.attach(self.zoom_box, 0, 1, 1, 1)
@@ -2004,30 +2205,18 @@ class TimelineContainer(Gtk.Grid, Zoomable, Loggable):
     def first_clip_edge(self, before=None, after=None):
         assert (after is not None) != (before is not None)
 
+        edges_index = self.timeline.edges_index
         if after is not None:
-            start = after
             end = self.ges_timeline.props.duration
-            edges = [end]
+            if after >= end:
+                return None
+            edge = edges_index.get_next_clip_edge(after)
+            return end if edge is None else min(edge, end)
         else:
-            start = 0
-            end = before
-            edges = [start]
-
-        if start >= end:
-            return None
-
-        for layer in self.ges_timeline.layers:
-            clips = layer.get_clips_in_interval(start, end)
-            for clip in clips:
-                if clip.start > start:
-                    edges.append(clip.start)
-                if clip.start + clip.duration < end:
-                    edges.append(clip.start + clip.duration)
-
-        if after is not None:
-            return min(edges)
-        else:
-            return max(edges)
+            if before <= 0:
+                return None
+            edge = edges_index.get_previous_clip_edge(before)
+            return 0 if edge is None else max(edge, 0)
 
     def _seek_forward_clip_cb(self, unused_action, unused_parameter):
         """Seeks to the first clip edge at the right of the playhead."""
@@ -2050,7 +2239,8 @@ class TimelineContainer(Gtk.Grid, Zoomable, Loggable):
     def __add_effect_cb(self, unused_action, unused_parameter):
         clip = self.timeline.selection.getSingleClip()
         if clip:
-            self.effects_popover.set_relative_to(clip.ui)
+            # The clip has no widget when far from the visible area.
+            self.effects_popover.set_relative_to(clip.ui or self.timeline)
             self.effects_popover.popup()
 
     def _align_selected_cb(self, unused_action, unused_parameter):
@@ -2126,6 +2316,9 @@ class TimelineContainer(Gtk.Grid, Zoomable, Loggable):
 
         with self.app.action_log.started("Toggle keyframe", toplevel=True):
             for ges_track_element in ges_track_elements:
+                if not ges_track_element.ui or not ges_track_element.ui.keyframe_curve:
+                    # The clip is far from the visible area.
+                    continue
                 keyframe_curve = ges_track_element.ui.keyframe_curve
                 keyframe_curve.toggle_keyframe(offset)
 
@@ -2157,12 +2350,12 @@ class TimelineContainer(Gtk.Grid, Zoomable, Loggable):
         self.timeline.scroll_to_playhead(align=Gtk.Align.CENTER, when_not_in_view=True)
 
     def _seek_backward_one_frame_cb(self, unused_action, unused_parameter):
-        self._project.pipeline.step_frame(self._project.videorate, -1)
+        self._project.pipeline.step_frame(self._project.frame_grid, -1)
         self.timeline.scroll_to_playhead(align=Gtk.Align.CENTER, when_not_in_view=True)
 
     def _seek_forward_one_frame_cb(self, unused_action, unused_parameter):
 
-        self._project.pipeline.step_frame(self._project.videorate, 1)
+        self._project.pipeline.step_frame(self._project.frame_grid, 1)
         self.timeline.scroll_to_playhead(align=Gtk.Align.CENTER, when_not_in_view=True)
 
     def do_focus_in_event(self, unused_event):
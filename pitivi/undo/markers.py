@@ -18,6 +18,7 @@
 from gi.repository import Gst
 
 from pitivi.undo.undo import MetaContainerObserver
+from pitivi.undo.undo import profiled_observer
 from pitivi.undo.undo import UndoableAutomaticObjectAction
 from pitivi.utils.loggable import Loggable
 
@@ -51,17 +52,20 @@ class MarkerListObserver(Loggable):
         marker_observer = MetaContainerObserver(ges_marker, self.action_log)
         self.marker_observers[ges_marker] = marker_observer
 
+    @profiled_observer
     def _marker_added_cb(self, ges_marker_list, position, ges_marker):
         action = MarkerAdded(ges_marker_list, ges_marker)
         self.action_log.push(action)
         self._connect(ges_marker)
 
+    @profiled_observer
     def _marker_removed_cb(self, ges_marker_list, ges_marker):
         action = MarkerRemoved(ges_marker_list, ges_marker)
         self.action_log.push(action)
         marker_observer = self.marker_observers.pop(ges_marker)
         marker_observer.release()
 
+    @profiled_observer
     def _marker_moved_cb(self, ges_marker_list, old_position, position, ges_marker):
         action = MarkerMoved(ges_marker_list, ges_marker, old_position)
         self.action_log.push(action)
@@ -22,6 +22,7 @@ from gi.repository import Gst
 from pitivi.undo.timeline import TimelineObserver
 from pitivi.undo.undo import Action
 from pitivi.undo.undo import MetaContainerObserver
+from pitivi.undo.undo import profiled_observer
 from pitivi.undo.undo import UndoableAction
 
 
@@ -136,12 +137,14 @@ class ProjectObserver(MetaContainerObserver):
         self.timeline_observer = TimelineObserver(project.ges_timeline,
                                                   action_log)
 
+    @profiled_observer
     def _asset_added_cb(self, unused_project, asset):
         if not isinstance(asset, GES.UriClipAsset):
             return
         action = AssetAddedAction(asset)
         self.action_log.push(action)
 
+    @profiled_observer
     def _asset_removed_cb(self, project, asset):
         if not isinstance(asset, GES.UriClipAsset):
             return
@@ -14,7 +14,10 @@
 #
 # You should have received a copy of the GNU Lesser General Public
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
+import weakref
+
 from gi.repository import GES
+from gi.repository import GLib
 from gi.repository import GObject
 from gi.repository import Gst
 
@@ -22,6 +25,7 @@ from pitivi.effects import PROPS_TO_IGNORE
 from pitivi.undo.undo import FinalizingAction
 from pitivi.undo.undo import GObjectObserver
 from pitivi.undo.undo import MetaContainerObserver
+from pitivi.undo.undo import profiled_observer
 from pitivi.undo.undo import UndoableAction
 from pitivi.undo.undo import UndoableAutomaticObjectAction
 from pitivi.utils.loggable import Loggable
@@ -77,6 +81,17 @@ class TrackElementPropertyChanged(UndoableAction):
         st['value'] = GObject.Value(pspec.value_type, value)
         return st
 
+    def expand(self, action):
+        if not isinstance(action, TrackElementPropertyChanged) or \
+                self.track_element != action.track_element or \
+                self.property_name != action.property_name:
+            return False
+        self.new_value = action.new_value
+        return True
+
+    def coalesce(self, action):
+        return self.expand(action)
+
 
 class TimelineElementObserver(Loggable):
     """Monitors the props of an element and all its children.
@@ -102,12 +117,19 @@ class TimelineElementObserver(Loggable):
             assert res, prop_name
             self._properties[prop_name] = value
 
+        # Maps a property name to the last action reporting its change
+        # and a weak reference to the operation it has been pushed in,
+        # so the operations forgotten by the action log are released.
+        self.__last_actions = {}
+
         ges_timeline_element.connect('deep-notify', self._property_changed_cb)
 
     def release(self):
         self.ges_timeline_element.disconnect_by_func(self._property_changed_cb)
         self.ges_timeline_element = None
+        self.__last_actions = {}
 
+    @profiled_observer
     def _property_changed_cb(self, ges_timeline_element, unused_gst_element, pspec):
         prop_name = child_property_name(pspec)
         if pspec.name in PROPS_TO_IGNORE:
@@ -124,10 +146,29 @@ class TimelineElementObserver(Loggable):
             # Nothing to see here.
             return
 
+        self._properties[prop_name] = new_value
+
+        action_log = self.action_log
+        if action_log.stacks and not action_log.running and not action_log.rolling_back:
+            stack = action_log.stacks[-1]
+        else:
+            # The action is not pushed.
+            stack = None
+        last_action, last_stack_ref = self.__last_actions.pop(prop_name, (None, None))
+        if stack and last_stack_ref and stack is last_stack_ref():
+            # Include the change in the action reporting the previous change
+            # of the property in the same operation, even if other changes
+            # have been reported in the meantime.
+            last_action.new_value = new_value
+            self.__last_actions[prop_name] = (last_action, last_stack_ref)
+            action_log.report_expanded(last_action)
+            return
+
         action = TrackElementPropertyChanged(
             ges_timeline_element, prop_name, old_value, new_value)
-        self._properties[prop_name] = new_value
-        self.action_log.push(action)
+        action_log.push(action)
+        if stack and stack.done_actions[-1] is action:
+            self.__last_actions[prop_name] = (action, weakref.ref(stack))
 
 
 class TrackElementObserver(TimelineElementObserver):
@@ -237,9 +278,9 @@ class ControlSourceObserver(GObject.Object):
         self.action_info = action_info
         self.control_source = control_source
 
-        self.keyframes = {}
-        for keyframe in self.control_source.get_all():
-            self.keyframes[keyframe.timestamp] = (keyframe.timestamp, keyframe.value)
+        # Maps the timestamps of the keyframes to their values.
+        self.keyframes = {keyframe.timestamp: keyframe.value
+                          for keyframe in self.control_source.get_all()}
 
         control_source.connect("value-added", self._keyframe_added_cb)
         control_source.connect("value-changed", self._keyframe_moved_cb)
@@ -251,21 +292,23 @@ class ControlSourceObserver(GObject.Object):
         self.control_source.disconnect_by_func(self._keyframe_removed_cb)
         self.control_source = None
 
+    @profiled_observer
     def _keyframe_added_cb(self, control_source, keyframe):
-        self.keyframes[keyframe.timestamp] = (keyframe.timestamp, keyframe.value)
+        self.keyframes[keyframe.timestamp] = keyframe.value
 
         action = KeyframeAddedAction(control_source, keyframe, self.action_info)
         self.action_log.push(action)
 
+    @profiled_observer
     def _keyframe_moved_cb(self, control_source, keyframe):
-        old_snapshot = self.keyframes[keyframe.timestamp]
-        new_snapshot = (keyframe.timestamp, keyframe.value)
-        self.keyframes[keyframe.timestamp] = new_snapshot
+        old_value = self.keyframes[keyframe.timestamp]
+        self.keyframes[keyframe.timestamp] = keyframe.value
 
-        action = KeyframeChangedAction(control_source,
-                                       old_snapshot, new_snapshot)
+        action = KeyframeChangedAction(control_source, keyframe.timestamp,
+                                       old_value, keyframe.value)
         self.action_log.push(action)
 
+    @profiled_observer
     def _keyframe_removed_cb(self, control_source, keyframe):
         del self.keyframes[keyframe.timestamp]
 
@@ -530,19 +573,63 @@ class LayerMoved(UndoableAction):
         return st
 
 
-class KeyframeAddedAction(UndoableAction):
+class KeyframesAction(UndoableAction):
+    """Base class for the changes of the keyframes of a control source.
 
-    def __init__(self, control_source, keyframe, action_info):
+    Only the keyframes touched by the changes are tracked, in the `old_values`
+    and `new_values` dicts mapping a timestamp to the value of the keyframe,
+    or to None when there is no keyframe at that timestamp.
+
+    Consecutive changes of the same control source, such as the ones done
+    while dragging a keyframe, are merged in a single action by `expand`,
+    so the memory used and the time needed for undoing depend only on the
+    number of keyframes touched.
+    """
+
+    def __init__(self, control_source, old_values, new_values):
         UndoableAction.__init__(self)
         self.control_source = control_source
-        self.keyframe = keyframe
-        self.action_info = action_info
+        self.old_values = old_values
+        self.new_values = new_values
 
     def do(self):
-        self.control_source.set(self.keyframe.timestamp, self.keyframe.value)
+        self._apply_values(self.new_values)
 
     def undo(self):
-        self.control_source.unset(self.keyframe.timestamp)
+        self._apply_values(self.old_values)
+
+    def expand(self, action):
+        if not isinstance(action, KeyframesAction) or \
+                action.control_source != self.control_source:
+            return False
+
+        for timestamp, value in action.old_values.items():
+            self.old_values.setdefault(timestamp, value)
+        self.new_values.update(action.new_values)
+
+        # Forget the keyframes which ended up unchanged.
+        for timestamp, value in list(self.new_values.items()):
+            if self.old_values[timestamp] == value:
+                del self.old_values[timestamp]
+                del self.new_values[timestamp]
+        return True
+
+    def _apply_values(self, values):
+        for timestamp, value in values.items():
+            if value is None:
+                self.control_source.unset(timestamp)
+            else:
+                self.control_source.set(timestamp, value)
+
+
+class KeyframeAddedAction(KeyframesAction):
+
+    def __init__(self, control_source, keyframe, action_info):
+        KeyframesAction.__init__(self, control_source,
+                                 {keyframe.timestamp: None},
+                                 {keyframe.timestamp: keyframe.value})
+        self.keyframe = keyframe
+        self.action_info = action_info
 
     def as_scenario_action(self):
         st = Gst.Structure.new_empty("add-keyframe")
@@ -553,20 +640,15 @@ class KeyframeAddedAction(UndoableAction):
         return st
 
 
-class KeyframeRemovedAction(UndoableAction):
+class KeyframeRemovedAction(KeyframesAction):
 
     def __init__(self, control_source, keyframe, action_info):
-        UndoableAction.__init__(self)
-        self.control_source = control_source
+        KeyframesAction.__init__(self, control_source,
+                                 {keyframe.timestamp: keyframe.value},
+                                 {keyframe.timestamp: None})
         self.keyframe = keyframe
         self.action_info = action_info
 
-    def do(self):
-        self.control_source.unset(self.keyframe.timestamp)
-
-    def undo(self):
-        self.control_source.set(self.keyframe.timestamp, self.keyframe.value)
-
     def as_scenario_action(self):
         st = Gst.Structure.new_empty("remove-keyframe")
         for key, value in self.action_info.items():
@@ -576,23 +658,12 @@ class KeyframeRemovedAction(UndoableAction):
         return st
 
 
-class KeyframeChangedAction(UndoableAction):
-
-    def __init__(self, control_source, old_snapshot, new_snapshot):
-        UndoableAction.__init__(self)
-        self.control_source = control_source
-        self.old_snapshot = old_snapshot
-        self.new_snapshot = new_snapshot
+class KeyframeChangedAction(KeyframesAction):
 
-    def do(self):
-        self._apply_snapshot(self.new_snapshot)
-
-    def undo(self):
-        self._apply_snapshot(self.old_snapshot)
-
-    def _apply_snapshot(self, snapshot):
-        time, value = snapshot
-        self.control_source.set(time, value)
+    def __init__(self, control_source, timestamp, old_value, new_value):
+        KeyframesAction.__init__(self, control_source,
+                                 {timestamp: old_value},
+                                 {timestamp: new_value})
 
 
 class ControlSourceSetAction(UndoableAction):
@@ -649,14 +720,22 @@ class ControlSourceRemoveAction(UndoableAction):
 class LayerObserver(MetaContainerObserver, Loggable):
     """Monitors a Layer and reports UndoableActions.
 
+    When lazy, the clips already in the layer are observed only when an
+    operation begins or, in the meantime, gradually when idle. The changes
+    done before are not undoable anyway, since no operation records them.
+
     Args:
         ges_layer (GES.Layer): The layer to observe.
+        lazy (bool): Whether to delay observing the clips in the layer.
 
     Attributes:
         action_log (UndoableActionLog): The action log where to report actions.
     """
 
-    def __init__(self, ges_layer, action_log):
+    # The max number of pending clips to connect to in an idle callback.
+    PENDING_CLIPS_CHUNK_SIZE = 100
+
+    def __init__(self, ges_layer, action_log, lazy=False):
         MetaContainerObserver.__init__(self, ges_layer, action_log)
         Loggable.__init__(self)
         self.action_log = action_log
@@ -670,8 +749,53 @@ class LayerObserver(MetaContainerObserver, Loggable):
         ges_layer.connect("notify::priority", self.__layer_moved_cb)
 
         self.clip_observers = {}
-        for ges_clip in ges_layer.get_clips():
+        # The clips not observed yet, in a dict for the fast removal.
+        self.__pending_clips = {}
+        self.__pending_clips_source_id = None
+        if lazy:
+            self.__pending_clips = dict.fromkeys(ges_layer.get_clips())
+            if self.__pending_clips:
+                action_log.connect("pre-begin", self.__pre_begin_cb)
+                self.__pending_clips_source_id = GLib.idle_add(
+                    self.__connect_to_pending_clips_cb, priority=GLib.PRIORITY_LOW)
+        else:
+            for ges_clip in ges_layer.get_clips():
+                self._connect_to_clip(ges_clip)
+
+    def connect_to_pending_clips(self, max_count=None):
+        """Starts observing the clips whose observation has been delayed.
+
+        Args:
+            max_count (Optional[int]): The max number of clips to process.
+
+        Returns:
+            bool: Whether clips are still pending.
+        """
+        while self.__pending_clips and max_count != 0:
+            ges_clip = next(iter(self.__pending_clips))
+            del self.__pending_clips[ges_clip]
             self._connect_to_clip(ges_clip)
+            if max_count is not None:
+                max_count -= 1
+
+        if self.__pending_clips:
+            return True
+
+        if self.__pending_clips_source_id:
+            GLib.source_remove(self.__pending_clips_source_id)
+            self.__pending_clips_source_id = None
+            self.action_log.disconnect_by_func(self.__pre_begin_cb)
+        return False
+
+    def __connect_to_pending_clips_cb(self):
+        if self.connect_to_pending_clips(self.PENDING_CLIPS_CHUNK_SIZE):
+            return True
+
+        # The source has been removed by `connect_to_pending_clips`.
+        return GLib.SOURCE_REMOVE
+
+    def __pre_begin_cb(self, unused_action_log):
+        self.connect_to_pending_clips()
 
     def _connect_to_clip(self, ges_clip):
         ges_clip.connect("child-added", self._clip_track_element_added_cb)
@@ -688,6 +812,10 @@ class LayerObserver(MetaContainerObserver, Loggable):
         self.clip_observers[ges_clip] = clip_observer
 
     def _disconnect_from_clip(self, ges_clip):
+        if ges_clip in self.__pending_clips:
+            del self.__pending_clips[ges_clip]
+            return
+
         ges_clip.disconnect_by_func(self._clip_track_element_added_cb)
         ges_clip.disconnect_by_func(self._clip_track_element_removed_cb)
 
@@ -700,11 +828,13 @@ class LayerObserver(MetaContainerObserver, Loggable):
         clip_observer = self.clip_observers.pop(ges_clip)
         clip_observer.release()
 
+    @profiled_observer
     def _control_binding_added_cb(self, track_element, binding):
         self._connect_to_control_source(track_element, binding)
         action = ControlSourceSetAction(track_element, binding)
         self.action_log.push(action)
 
+    @profiled_observer
     def _control_binding_removed_cb(self, track_element, binding):
         self._disconnect_from_control_source(binding)
         action = ControlSourceRemoveAction(track_element, binding)
@@ -758,6 +888,7 @@ class LayerObserver(MetaContainerObserver, Loggable):
         observer = self.keyframe_observers.pop(control_source)
         observer.release()
 
+    @profiled_observer
     def _clip_added_cb(self, layer, clip):
         self._connect_to_clip(clip)
         if isinstance(clip, GES.TransitionClip):
@@ -765,6 +896,7 @@ class LayerObserver(MetaContainerObserver, Loggable):
         action = ClipAdded(layer, clip)
         self.action_log.push(action)
 
+    @profiled_observer
     def _clip_removed_cb(self, layer, clip):
         self._disconnect_from_clip(clip)
         if isinstance(clip, GES.TransitionClip):
@@ -775,17 +907,20 @@ class LayerObserver(MetaContainerObserver, Loggable):
         action = ClipRemoved(layer, clip)
         self.action_log.push(action)
 
+    @profiled_observer
     def _clip_track_element_added_cb(self, clip, ges_track_element):
         self._connect_to_track_element(ges_track_element)
         action = TrackElementAdded(clip, ges_track_element)
         self.action_log.push(action)
 
+    @profiled_observer
     def _clip_track_element_removed_cb(self, clip, ges_track_element):
         self.debug("%s REMOVED from %s", ges_track_element, clip)
         self._disconnect_from_track_element(ges_track_element)
         action = TrackElementRemoved(clip, ges_track_element)
         self.action_log.push(action)
 
+    @profiled_observer
     def __layer_moved_cb(self, ges_layer, unused_param):
         current = ges_layer.props.priority
         action = LayerMoved(ges_layer, self.priority, current)
@@ -846,10 +981,12 @@ class GroupObserver(Loggable):
         ges_group.connect_after("child-added", self.__child_added_cb)
         ges_group.connect("child-removed", self.__child_removed_cb)
 
+    @profiled_observer
     def __child_added_cb(self, ges_group, ges_timeline_element):
         action = TimelineElementAddedToGroup(ges_group, ges_timeline_element)
         self.action_log.push(action)
 
+    @profiled_observer
     def __child_removed_cb(self, ges_group, ges_timeline_element):
         action = TimelineElementRemovedFromGroup(ges_group, ges_timeline_element)
         self.action_log.push(action)
@@ -863,7 +1000,7 @@ class TimelineObserver(MetaContainerObserver, Loggable):
         action_log (UndoableActionLog): The action log where to report actions.
     """
 
-    def __init__(self, ges_timeline, action_log):
+    def __init__(self, ges_timeline, action_log, lazy=True):
         MetaContainerObserver.__init__(self, ges_timeline, action_log)
         Loggable.__init__(self)
         self.ges_timeline = ges_timeline
@@ -872,8 +1009,10 @@ class TimelineObserver(MetaContainerObserver, Loggable):
         self.layer_observers = {}
         self.group_observers = {}
 
+        # The clips added during an operation must be observed right away.
+        lazy = lazy and not action_log.is_in_transaction()
         for ges_layer in ges_timeline.get_layers():
-            self._connect_to_layer(ges_layer)
+            self._connect_to_layer(ges_layer, lazy)
 
         ges_timeline.connect("layer-added", self.__layer_added_cb)
         ges_timeline.connect("layer-removed", self.__layer_removed_cb)
@@ -885,15 +1024,17 @@ class TimelineObserver(MetaContainerObserver, Loggable):
         # We don't care about the group-removed signal because this greatly
         # simplifies the logic.
 
+    @profiled_observer
     def __layer_added_cb(self, ges_timeline, ges_layer):
         action = LayerAdded(self.ges_timeline, ges_layer)
         self.action_log.push(action)
         self._connect_to_layer(ges_layer)
 
-    def _connect_to_layer(self, ges_layer):
-        layer_observer = LayerObserver(ges_layer, self.action_log)
+    def _connect_to_layer(self, ges_layer, lazy=False):
+        layer_observer = LayerObserver(ges_layer, self.action_log, lazy)
         self.layer_observers[ges_layer] = layer_observer
 
+    @profiled_observer
     def __layer_removed_cb(self, ges_timeline, ges_layer):
         action = LayerRemoved(ges_timeline, ges_layer)
         self.action_log.push(action)
@@ -911,6 +1052,7 @@ class TimelineObserver(MetaContainerObserver, Loggable):
             self.group_observers[ges_group] = group_observer
         return True
 
+    @profiled_observer
     def __group_added_cb(self, unused_ges_timeline, ges_group):
         if not self._connect_to_group(ges_group):
             return
@@ -15,14 +15,34 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
 """Undo/redo."""
+import collections
 import contextlib
+import functools
+import sys
+import time
 
 from gi.repository import GES
 from gi.repository import GObject
 
+from pitivi.settings import GlobalSettings
 from pitivi.utils.loggable import Loggable
 
 
+GlobalSettings.add_config_section("undo")
+GlobalSettings.add_config_option("undo_max_operations",
+                                 section="undo",
+                                 key="max-operations",
+                                 default=1000)
+GlobalSettings.add_config_option("undo_max_actions",
+                                 section="undo",
+                                 key="max-actions",
+                                 default=100000)
+GlobalSettings.add_config_option("undo_profiling",
+                                 section="undo",
+                                 key="profiling",
+                                 default=False)
+
+
 class UndoError(Exception):
     """Base class for undo/redo exceptions."""
 
@@ -31,6 +51,92 @@ class UndoWrongStateError(UndoError):
     """Exception related to the current state of the undo/redo stack."""
 
 
+def profiled_observer(func):
+    """Decorates a signal handler of an observer to measure its duration.
+
+    The time is accounted to the operation being recorded, if the action
+    log is profiling. The observer must have an `action_log` attribute.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args):
+        action_log = self.action_log
+        if not action_log or not action_log.profiling:
+            return func(self, *args)
+
+        with action_log.observing():
+            return func(self, *args)
+
+    return wrapper
+
+
+def estimate_size(action):
+    """Estimates the memory retained by an action.
+
+    The objects of the project referenced by the action are not counted,
+    as they are kept alive by the project anyway.
+
+    Args:
+        action (UndoableAction): The action, not a stack.
+
+    Returns:
+        int: The estimated size in bytes.
+    """
+    size = sys.getsizeof(action)
+    attrs = getattr(action, "__dict__", {})
+    size += sys.getsizeof(attrs)
+    for value in attrs.values():
+        if isinstance(value, GObject.Object):
+            continue
+        size += sys.getsizeof(value)
+        if isinstance(value, dict):
+            value = list(value.keys()) + list(value.values())
+        if isinstance(value, (list, tuple, set, frozenset)):
+            size += sum(sys.getsizeof(item) for item in value
+                        if not isinstance(item, GObject.Object))
+    return size
+
+
+class OperationStats:
+    """Profiling statistics of an operation.
+
+    Attributes:
+        actions_count_by_class (Dict[str, int]): The number of actions of
+            each class, including the ones in the nested stacks.
+        estimated_bytes (int): The memory retained by the actions, see
+            `estimate_size`.
+        observers_seconds (float): The time spent by the observers while
+            the operation was being recorded.
+        do_count (int): How many times the operation has been redone.
+        do_seconds (float): The total time spent redoing the operation.
+        undo_count (int): How many times the operation has been undone.
+        undo_seconds (float): The total time spent undoing the operation.
+    """
+
+    def __init__(self):
+        self.actions_count_by_class = {}
+        self.estimated_bytes = 0
+        self.observers_seconds = 0.0
+        self.do_count = 0
+        self.do_seconds = 0.0
+        self.undo_count = 0
+        self.undo_seconds = 0.0
+
+    def __repr__(self):
+        return "<OperationStats %d actions, ~%d bytes, observers %.3fs, do %d/%.3fs, undo %d/%.3fs>" % (
+            sum(self.actions_count_by_class.values()), self.estimated_bytes,
+            self.observers_seconds, self.do_count, self.do_seconds,
+            self.undo_count, self.undo_seconds)
+
+    def update_actions(self, stack):
+        """Updates the statistics about the actions of the stack."""
+        counter = collections.Counter()
+        self.estimated_bytes = 0
+        for action in stack.iter_actions():
+            counter[type(action).__name__] += 1
+            self.estimated_bytes += estimate_size(action)
+        self.actions_count_by_class = dict(counter)
+
+
 class Action(GObject.Object, Loggable):
     """Something which might worth logging in a scenario."""
 
@@ -69,6 +175,22 @@ class UndoableAction(Action):
         """
         return False
 
+    # pylint: disable=unused-argument
+    def coalesce(self, action):
+        """Allows the action to include the action of the next operation.
+
+        Used for merging the operations done in quick succession, such as
+        the changes done while dragging a slider.
+
+        Args:
+            action (UndoableAction): The single action of the next operation.
+
+        Returns:
+            bool: Whether the action has been included, in which case
+                the next operation is merged into the current one.
+        """
+        return False
+
 
 class UndoableAutomaticObjectAction(UndoableAction):
     """An action on an automatically created object.
@@ -123,6 +245,13 @@ class UndoableActionStack(UndoableAction, Loggable):
             the stack.
         finalizing_action (FinalizingAction): The action to be performed
             at the end of undoing or redoing the stacked actions.
+        actions_count (int): The number of actions in the stack, including
+            the ones in the nested stacks, as counted by the action log.
+        compacted (bool): Whether the stack has been compacted.
+        revision (int): The revision of the history when the stack has
+            been committed, set by the action log.
+        stats (OperationStats): The profiling statistics, if the operation
+            has been recorded while the action log was profiling.
     """
 
     def __init__(self, action_group_name, finalizing_action=None):
@@ -131,10 +260,22 @@ class UndoableActionStack(UndoableAction, Loggable):
         self.action_group_name = action_group_name
         self.done_actions = []
         self.finalizing_action = finalizing_action
+        self.actions_count = 0
+        self.compacted = False
+        self.revision = 0
+        self.stats = None
 
     def __repr__(self):
         return "%s: %s" % (self.action_group_name, self.done_actions)
 
+    def iter_actions(self):
+        """Iterates over the actions, including the ones in the nested stacks."""
+        for action in self.done_actions:
+            if isinstance(action, UndoableActionStack):
+                yield from action.iter_actions()
+            else:
+                yield action
+
     def push(self, action):
         if self.done_actions:
             last_action = self.done_actions[-1]
@@ -161,14 +302,68 @@ class UndoableActionStack(UndoableAction, Loggable):
             return
         self.finalizing_action.do()
 
+    def count_actions(self):
+        """Counts the actions, including the ones in the nested stacks.
+
+        Returns:
+            int: The number of actions which are not stacks.
+        """
+        return sum(action.count_actions() if isinstance(action, UndoableActionStack) else 1
+                   for action in self.done_actions)
+
+    def compact(self):
+        """Reduces the number of actions without changing the outcome.
+
+        The nested stacks without a finalizing action are flattened and
+        the consecutive changes of the same property are coalesced.
+        """
+        actions = []
+        for action in self.done_actions:
+            if isinstance(action, UndoableActionStack):
+                action.compact()
+                if not action.finalizing_action:
+                    self.__append_coalesced(actions, action.done_actions)
+                    continue
+            self.__append_coalesced(actions, [action])
+
+        self.done_actions = actions
+        self.actions_count = self.count_actions()
+        self.compacted = True
+
+    @staticmethod
+    def __append_coalesced(actions, new_actions):
+        for action in new_actions:
+            # Other kinds of actions expand only while being pushed,
+            # see `push`, as they rely on the order they are reported in.
+            if actions and isinstance(action, PropertyChangedAction) and \
+                    isinstance(actions[-1], PropertyChangedAction) and \
+                    actions[-1].expand(action):
+                continue
+            actions.append(action)
+
 
 class UndoableActionLog(GObject.Object, Loggable):
     """The undo/redo manager.
 
     A separate instance should be created for each Project instance.
+
+    An operation composed of a single action is merged into the previous
+    one if they have the same name, if they are committed in less than
+    `COALESCING_WINDOW` seconds and if the action can be coalesced.
+
+    The operations older than the last `COMPACTION_DELAY` ones are
+    compacted. When the limits are exceeded, the oldest operations are
+    forgotten, releasing the objects they hold.
+
+    Args:
+        max_operations (int): The max number of operations which can be
+            undone, or 0 for no limit.
+        max_actions (int): The max number of actions in the operations
+            which can be undone, or 0 for no limit.
     """
 
     __gsignals__ = {
+        "pre-begin": (GObject.SignalFlags.RUN_LAST, None, ()),
         "begin": (GObject.SignalFlags.RUN_LAST, None, (object,)),
         "pre-push": (GObject.SignalFlags.RUN_LAST, None, (object,)),
         "push": (GObject.SignalFlags.RUN_LAST, None, (object, object)),
@@ -177,16 +372,42 @@ class UndoableActionLog(GObject.Object, Loggable):
         "move": (GObject.SignalFlags.RUN_LAST, None, (object,)),
     }
 
-    def __init__(self):
+    # The number of recent operations left as recorded, for inspecting them.
+    COMPACTION_DELAY = 10
+
+    # The max number of seconds between the operations being merged.
+    COALESCING_WINDOW = 0.5
+
+    def __init__(self, max_operations=0, max_actions=0):
         GObject.Object.__init__(self)
         Loggable.__init__(self)
 
+        self.max_operations = max_operations
+        self.max_actions = max_actions
+        # The number of actions in the undo stacks.
+        self.__actions_count = 0
+        # The revision of the last committed operation. The revision of
+        # the history is the revision of the last operation which can be
+        # undone, or `__base_revision` if there is none.
+        self.__last_revision = 0
+        # The revision of the last forgotten operation, see `max_operations`.
+        self.__base_revision = 0
+        # When the last toplevel operation has been committed.
+        self.__last_commit_time = 0
+        # The actions updated in place since being pushed, by id, which
+        # have to be reported again when the operation is committed.
+        self.__expanded_actions = {}
+        # Whether the operations are profiled, see `get_stats`.
+        self.profiling = False
+        # The number of nested `observing` blocks being executed.
+        self.__observing_depth = 0
+
         self.undo_stacks = []
         self.redo_stacks = []
         self.stacks = []
         self.running = False
         self.rolling_back = False
-        self._checkpoint = self._take_snapshot()
+        self._checkpoint = self.__get_revision()
 
     @contextlib.contextmanager
     def started(self, action_group_name, **kwargs):
@@ -218,7 +439,10 @@ class UndoableActionLog(GObject.Object, Loggable):
         if toplevel and self.is_in_transaction():
             raise UndoWrongStateError("Toplevel operation started as suboperation", self.stacks)
 
+        self.emit("pre-begin")
         stack = UndoableActionStack(action_group_name, finalizing_action)
+        if self.profiling and not self.stacks:
+            stack.stats = OperationStats()
         self.stacks.append(stack)
         self.debug("begin action group %s, nested %s",
                    stack.action_group_name, len(self.stacks))
@@ -256,6 +480,24 @@ class UndoableActionLog(GObject.Object, Loggable):
                    action, stack.action_group_name)
         self.emit("push", stack, action)
 
+    def report_expanded(self, action):
+        """Reports that an action already pushed has been updated in place.
+
+        The action is reported again through the "pre-push" signal only
+        once, when the toplevel operation is committed, so the intermediate
+        changes are not recorded in the scenario.
+
+        Args:
+            action (Action): The action which now includes a new change.
+        """
+        self.__expanded_actions[id(action)] = action
+
+    def __report_expanded_actions(self):
+        expanded_actions = self.__expanded_actions
+        self.__expanded_actions = {}
+        for action in expanded_actions.values():
+            self.emit("pre-push", action)
+
     def rollback(self, undo=True):
         """Forgets about the last started operation.
 
@@ -273,6 +515,8 @@ class UndoableActionLog(GObject.Object, Loggable):
             stack = self._get_last_stack(pop=True)
             self.debug("rollback action group %s, nested %s",
                        stack.action_group_name, len(self.stacks))
+            for action in stack.iter_actions():
+                self.__expanded_actions.pop(id(action), None)
             self.emit("rollback", stack)
             if undo:
                 stack.undo()
@@ -303,8 +547,25 @@ class UndoableActionLog(GObject.Object, Loggable):
             self.debug("Ignore empty stack %s", stack.action_group_name)
             return
         if not self.stacks:
-            self.undo_stacks.append(stack)
-            stack.finish_operation()
+            self.__report_expanded_actions()
+            if self.__coalesce(stack):
+                self.debug("Merged %s into the previous operation", stack.action_group_name)
+                stack.finish_operation()
+                last_stack = self.undo_stacks[-1]
+                if stack.stats and last_stack.stats:
+                    last_stack.stats.observers_seconds += stack.stats.observers_seconds
+                stack = last_stack
+            else:
+                self.__last_revision += 1
+                stack.revision = self.__last_revision
+                stack.actions_count = stack.count_actions()
+                self.__append_undo_stack(stack)
+                stack.finish_operation()
+                self.__compact_undo_stacks()
+                self.__trim_undo_stacks()
+            self.__last_commit_time = time.monotonic()
+            if stack.stats:
+                stack.stats.update_actions(stack)
         else:
             self.stacks[-1].push(stack)
 
@@ -323,8 +584,13 @@ class UndoableActionLog(GObject.Object, Loggable):
             raise UndoWrongStateError("Nothing to undo")
 
         stack = self.undo_stacks.pop(-1)
+        self.__actions_count -= stack.actions_count
         self.debug("Undo %s", stack)
+        start = time.perf_counter()
         self._run(stack.undo)
+        if stack.stats:
+            stack.stats.undo_count += 1
+            stack.stats.undo_seconds += time.perf_counter() - start
         self.redo_stacks.append(stack)
         self.emit("move", stack)
 
@@ -337,22 +603,108 @@ class UndoableActionLog(GObject.Object, Loggable):
 
         stack = self.redo_stacks.pop(-1)
         self.debug("Redo %s", stack)
+        start = time.perf_counter()
         self._run(stack.do)
-        self.undo_stacks.append(stack)
+        if stack.stats:
+            stack.stats.do_count += 1
+            stack.stats.do_seconds += time.perf_counter() - start
+        self.__append_undo_stack(stack)
         self.emit("move", stack)
 
-    def _take_snapshot(self):
-        return list(self.undo_stacks)
+    @contextlib.contextmanager
+    def observing(self):
+        """Measures the time spent by an observer reporting changes.
+
+        The time is added to the statistics of the operation being recorded.
+        """
+        self.__observing_depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.__observing_depth -= 1
+            # The nested blocks are included in the outermost one.
+            if not self.__observing_depth and self.stacks and self.stacks[0].stats:
+                self.stacks[0].stats.observers_seconds += time.perf_counter() - start
+
+    def get_stats(self):
+        """Gets the statistics of the operations profiled.
+
+        Returns:
+            List[Tuple[UndoableActionStack, OperationStats]]: The operations
+            which can be undone, oldest first, followed by the ones which
+            can be redone.
+        """
+        stacks = self.undo_stacks + self.redo_stacks[::-1]
+        return [(stack, stack.stats) for stack in stacks if stack.stats]
+
+    def __coalesce(self, stack):
+        """Tries to merge the operation into the last one."""
+        if not self.undo_stacks or self.redo_stacks:
+            return False
+
+        if time.monotonic() - self.__last_commit_time > self.COALESCING_WINDOW:
+            return False
+
+        last_stack = self.undo_stacks[-1]
+        if last_stack.action_group_name != stack.action_group_name or \
+                len(last_stack.done_actions) != 1 or len(stack.done_actions) != 1:
+            return False
+
+        if not self.dirty():
+            # The last operation has been saved, it must be kept as it is.
+            return False
+
+        return last_stack.done_actions[0].coalesce(stack.done_actions[0])
+
+    def __append_undo_stack(self, stack):
+        self.undo_stacks.append(stack)
+        self.__actions_count += stack.actions_count
+
+    def __compact_undo_stacks(self):
+        if len(self.undo_stacks) <= self.COMPACTION_DELAY:
+            return
+
+        stack = self.undo_stacks[-self.COMPACTION_DELAY - 1]
+        if stack.compacted:
+            return
+
+        actions_count = stack.actions_count
+        stack.compact()
+        self.__actions_count += stack.actions_count - actions_count
+
+    def __trim_undo_stacks(self):
+        """Forgets the oldest operations exceeding the limits."""
+        count = 0
+        actions_count = self.__actions_count
+        while len(self.undo_stacks) - count > 1:
+            if (not self.max_operations or len(self.undo_stacks) - count <= self.max_operations) and \
+                    (not self.max_actions or actions_count <= self.max_actions):
+                break
+            actions_count -= self.undo_stacks[count].actions_count
+            count += 1
+        if not count:
+            return
+
+        self.debug("Forgetting the oldest %d operations", count)
+        self.__base_revision = self.undo_stacks[count - 1].revision
+        del self.undo_stacks[:count]
+        self.__actions_count = actions_count
+
+    def __get_revision(self):
+        if self.undo_stacks:
+            return self.undo_stacks[-1].revision
+        return self.__base_revision
 
     def checkpoint(self):
         if self.stacks:
             raise UndoWrongStateError("Recording a transaction", self.stacks)
 
-        self._checkpoint = self._take_snapshot()
+        self._checkpoint = self.__get_revision()
 
     def dirty(self):
-        current_snapshot = self._take_snapshot()
-        return current_snapshot != self._checkpoint
+        """Checks whether the history changed since the last checkpoint."""
+        return self.__get_revision() != self._checkpoint
 
     def _run(self, operation):
         self.running = True
@@ -421,6 +773,7 @@ class MetaContainerObserver(GObject.Object):
 
         meta_container.connect("notify-meta", self._notify_meta_cb)
 
+    @profiled_observer
     def _notify_meta_cb(self, meta_container, item, value):
         current_value = self.metas.get(item)
         action = MetaChangedAction(meta_container, item, current_value, value)
@@ -464,6 +817,9 @@ class PropertyChangedAction(UndoableAutomaticObjectAction):
         self.new_value = action.new_value
         return True
 
+    def coalesce(self, action):
+        return self.expand(action)
+
 
 class GObjectObserver(GObject.Object):
     """Monitor for GObject.Object's props, reporting UndoableActions.
@@ -492,6 +848,7 @@ class GObjectObserver(GObject.Object):
         self.gobject.disconnect_by_func(self._property_changed_cb)
         self.gobject = None
 
+    @profiled_observer
     def _property_changed_cb(self, gobject, pspec, property_name, field_name):
         old_value = self.properties[property_name]
         property_value = gobject.get_property(field_name)
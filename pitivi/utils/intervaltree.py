@@ -0,0 +1,475 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2020, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Indexes for querying the clips by time range."""
+import bisect
+import itertools
+import random
+from collections import Counter
+
+from pitivi.utils.loggable import Loggable
+
+
+class _Node:
+    """Node of an IntervalTree, ordered by its key."""
+
+    __slots__ = ("key", "end", "item", "priority", "left", "right", "max_end")
+
+    def __init__(self, key, end, item):
+        # The key is a (start, serial) tuple so the items with the same
+        # start are ordered by their insertion order.
+        self.key = key
+        self.end = end
+        self.item = item
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        # The max end of the intervals in the subtree.
+        self.max_end = end
+
+    def update(self):
+        max_end = self.end
+        if self.left and self.left.max_end > max_end:
+            max_end = self.left.max_end
+        if self.right and self.right.max_end > max_end:
+            max_end = self.right.max_end
+        self.max_end = max_end
+
+
+class IntervalTree:
+    """Set of items with an interval, for finding the ones in a range.
+
+    Implemented as a treap augmented with the max end of each subtree, so
+    adding, removing and moving an item take O(log n) and the queries take
+    O(log n + k), where k is the number of items returned.
+
+    The items must be hashable. They are returned ordered by start.
+    """
+
+    def __init__(self):
+        self.__root = None
+        # Maps the items to their nodes.
+        self.__nodes = {}
+        self.__serials = itertools.count()
+
+    def __len__(self):
+        return len(self.__nodes)
+
+    def __contains__(self, item):
+        return item in self.__nodes
+
+    def __iter__(self):
+        return iter(self.find_overlapping(float("-inf"), float("inf")))
+
+    def add(self, item, start, end):
+        """Adds an item.
+
+        Args:
+            item (object): The item to be added.
+            start (int): The start of the item's interval.
+            end (int): The end of the item's interval.
+        """
+        assert item not in self.__nodes
+        node = _Node((start, next(self.__serials)), end, item)
+        self.__nodes[item] = node
+        self.__root = self.__insert(self.__root, node)
+
+    def remove(self, item):
+        """Removes an item."""
+        node = self.__nodes.pop(item)
+        self.__root = self.__delete(self.__root, node.key)
+
+    def update(self, item, start, end):
+        """Moves an item to the specified interval."""
+        node = self.__nodes[item]
+        if node.key[0] == start and node.end == end:
+            return
+        self.remove(item)
+        self.add(item, start, end)
+
+    def get_interval(self, item):
+        """Gets the interval of an item.
+
+        Returns:
+            (int, int): The start and end of the item.
+        """
+        node = self.__nodes[item]
+        return node.key[0], node.end
+
+    def find_at(self, position):
+        """Finds the items containing a position, including the edges.
+
+        Returns:
+            List[object]: The items with start <= position <= end.
+        """
+        result = []
+        self.__collect(self.__root, position, position, True, result)
+        return result
+
+    def find_overlapping(self, start, end):
+        """Finds the items overlapping an interval, excluding the edges.
+
+        Returns:
+            List[object]: The items which start before `end` and end
+            after `start`.
+        """
+        result = []
+        self.__collect(self.__root, start, end, False, result)
+        return result
+
+    def __collect(self, node, low, high, inclusive, result):
+        while node:
+            # Skip the subtree if all its intervals end before low.
+            if node.max_end < low or (not inclusive and node.max_end == low):
+                return
+            self.__collect(node.left, low, high, inclusive, result)
+            start = node.key[0]
+            # The nodes in the right subtree start after this one.
+            if start > high or (not inclusive and start == high):
+                return
+            if node.end > low or (inclusive and node.end == low):
+                result.append(node.item)
+            node = node.right
+
+    def __insert(self, root, node):
+        if not root:
+            return node
+
+        if node.priority > root.priority:
+            node.left, node.right = self.__split(root, node.key)
+            node.update()
+            return node
+
+        if node.key < root.key:
+            root.left = self.__insert(root.left, node)
+        else:
+            root.right = self.__insert(root.right, node)
+        root.update()
+        return root
+
+    def __delete(self, root, key):
+        if root.key == key:
+            return self.__merge(root.left, root.right)
+
+        if key < root.key:
+            root.left = self.__delete(root.left, key)
+        else:
+            root.right = self.__delete(root.right, key)
+        root.update()
+        return root
+
+    def __split(self, root, key):
+        """Splits a subtree in the nodes before key and the others."""
+        if not root:
+            return None, None
+
+        if root.key < key:
+            root.right, right = self.__split(root.right, key)
+            root.update()
+            return root, right
+
+        left, root.left = self.__split(root.left, key)
+        root.update()
+        return left, root
+
+    def __merge(self, left, right):
+        """Merges two subtrees, all the keys in left being smaller."""
+        if not left:
+            return right
+        if not right:
+            return left
+
+        if left.priority > right.priority:
+            left.right = self.__merge(left.right, right)
+            left.update()
+            return left
+
+        right.left = self.__merge(left, right.left)
+        right.update()
+        return right
+
+
+class LayerClipsIndex(Loggable):
+    """Index of the clips of a layer by their position in the timeline.
+
+    Kept up to date as the clips are added, removed, moved and trimmed.
+
+    Attributes:
+        ges_layer (GES.Layer): The indexed layer.
+    """
+
+    def __init__(self, ges_layer):
+        Loggable.__init__(self)
+        self.ges_layer = ges_layer
+        self.__tree = IntervalTree()
+
+        ges_layer.connect("clip-added", self.__clip_added_cb)
+        ges_layer.connect("clip-removed", self.__clip_removed_cb)
+        for ges_clip in ges_layer.get_clips():
+            self.__add_clip(ges_clip)
+
+    def release(self):
+        self.ges_layer.disconnect_by_func(self.__clip_added_cb)
+        self.ges_layer.disconnect_by_func(self.__clip_removed_cb)
+        for ges_clip in list(self.__tree):
+            self.__remove_clip(ges_clip)
+
+    def get_clips_at(self, position):
+        """Gets the clips containing a position, including the edges.
+
+        Returns:
+            List[GES.Clip]: The found clips, ordered by start.
+        """
+        return self.__tree.find_at(position)
+
+    def get_clips_in_interval(self, start, end):
+        """Gets the clips overlapping an interval.
+
+        Similar to `GES.Layer.get_clips_in_interval`, without scanning
+        all the clips of the layer.
+
+        Returns:
+            List[GES.Clip]: The found clips, ordered by start.
+        """
+        return self.__tree.find_overlapping(start, end)
+
+    def __add_clip(self, ges_clip):
+        self.__tree.add(ges_clip, ges_clip.props.start,
+                        ges_clip.props.start + ges_clip.props.duration)
+        ges_clip.connect("notify::start", self.__clip_changed_cb)
+        ges_clip.connect("notify::duration", self.__clip_changed_cb)
+
+    def __remove_clip(self, ges_clip):
+        ges_clip.disconnect_by_func(self.__clip_changed_cb)
+        self.__tree.remove(ges_clip)
+
+    def __clip_added_cb(self, unused_ges_layer, ges_clip):
+        self.__add_clip(ges_clip)
+
+    def __clip_removed_cb(self, unused_ges_layer, ges_clip):
+        self.__remove_clip(ges_clip)
+
+    def __clip_changed_cb(self, ges_clip, unused_pspec):
+        self.__tree.update(ges_clip, ges_clip.props.start,
+                           ges_clip.props.start + ges_clip.props.duration)
+
+
+class TimelineEdgesIndex(Loggable):
+    """Sorted positions of the clip edges and markers of a timeline.
+
+    Kept up to date as the clips and markers are added, removed and
+    moved, so the nearest edges of a position are found in O(log n).
+
+    Attributes:
+        ges_timeline (GES.Timeline): The indexed timeline.
+        playhead_position (int): The position of the playhead, which is
+            a snapping target.
+    """
+
+    def __init__(self, ges_timeline):
+        Loggable.__init__(self)
+        self.ges_timeline = ges_timeline
+        self.playhead_position = 0
+
+        # Maps the clips to their (start, end) edges.
+        self.__clips = {}
+        # The edges of the clips, sorted, with duplicates.
+        self.__clip_edges = []
+        # The positions of the markers, sorted, with duplicates.
+        self.__marker_positions = []
+
+        ges_timeline.connect("layer-added", self.__layer_added_cb)
+        ges_timeline.connect("layer-removed", self.__layer_removed_cb)
+        for ges_layer in ges_timeline.get_layers():
+            self.__add_layer(ges_layer)
+
+        self.__ges_markers = ges_timeline.get_marker_list("markers")
+        if self.__ges_markers:
+            self.__ges_markers.connect("marker-added", self.__marker_added_cb)
+            self.__ges_markers.connect("marker-removed", self.__marker_removed_cb)
+            self.__ges_markers.connect("marker-moved", self.__marker_moved_cb)
+            for ges_marker in self.__ges_markers.get_markers():
+                bisect.insort(self.__marker_positions, ges_marker.props.position)
+
+    def release(self):
+        self.ges_timeline.disconnect_by_func(self.__layer_added_cb)
+        self.ges_timeline.disconnect_by_func(self.__layer_removed_cb)
+        for ges_layer in self.ges_timeline.get_layers():
+            self.__remove_layer(ges_layer)
+
+        if self.__ges_markers:
+            self.__ges_markers.disconnect_by_func(self.__marker_added_cb)
+            self.__ges_markers.disconnect_by_func(self.__marker_removed_cb)
+            self.__ges_markers.disconnect_by_func(self.__marker_moved_cb)
+            self.__ges_markers = None
+        self.__marker_positions = []
+
+    def get_next_clip_edge(self, position):
+        """Gets the first clip edge after a position.
+
+        Returns:
+            int: The position of the edge or None if there is none.
+        """
+        index = bisect.bisect_right(self.__clip_edges, position)
+        if index == len(self.__clip_edges):
+            return None
+        return self.__clip_edges[index]
+
+    def get_previous_clip_edge(self, position):
+        """Gets the last clip edge before a position.
+
+        Returns:
+            int: The position of the edge or None if there is none.
+        """
+        index = bisect.bisect_left(self.__clip_edges, position)
+        if index == 0:
+            return None
+        return self.__clip_edges[index - 1]
+
+    def get_snap_position(self, position, distance, excluded_clips=(),
+                          excluded_markers=()):
+        """Gets the nearest clip edge, marker or playhead around a position.
+
+        Args:
+            position (int): The position to be snapped.
+            distance (int): The max distance to the snapped position.
+            excluded_clips (List[GES.Clip]): Clips whose edges are ignored,
+                for example the clips being moved.
+            excluded_markers (List[GES.Marker]): Markers which are ignored,
+                for example the marker being moved.
+
+        Returns:
+            int: The position to snap to or None if nothing is close enough.
+        """
+        excluded_edges = Counter()
+        for ges_clip in excluded_clips:
+            excluded_edges.update(self.__clips.get(ges_clip, ()))
+        excluded_positions = Counter(ges_marker.props.position
+                                     for ges_marker in excluded_markers)
+
+        candidates = [self.__nearest(self.__clip_edges, position, distance, excluded_edges),
+                      self.__nearest(self.__marker_positions, position, distance,
+                                     excluded_positions)]
+        if abs(self.playhead_position - position) <= distance:
+            candidates.append(self.playhead_position)
+
+        candidates = [candidate for candidate in candidates if candidate is not None]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda candidate: abs(candidate - position))
+
+    @staticmethod
+    def __nearest(values, position, distance, excluded):
+        """Gets the nearest value which is not excluded.
+
+        Args:
+            values (List[int]): Sorted values, with duplicates.
+            position (int): The position around which to look.
+            distance (int): The max distance to the position.
+            excluded (Counter): The number of times each value is excluded.
+
+        Returns:
+            int: The nearest value or None if none is close enough.
+        """
+        nearest = None
+        # Look to the right.
+        index = bisect.bisect_left(values, position)
+        while index < len(values) and values[index] - position <= distance:
+            value = values[index]
+            next_index = bisect.bisect_right(values, value, index)
+            if next_index - index > excluded[value]:
+                nearest = value
+                break
+            index = next_index
+
+        # Look to the left, only as far as the value found at the right.
+        index = bisect.bisect_left(values, position)
+        while index > 0 and position - values[index - 1] <= distance:
+            value = values[index - 1]
+            if nearest is not None and position - value >= nearest - position:
+                break
+            previous_index = bisect.bisect_left(values, value, 0, index)
+            if index - previous_index > excluded[value]:
+                nearest = value
+                break
+            index = previous_index
+
+        return nearest
+
+    def __add_layer(self, ges_layer):
+        ges_layer.connect("clip-added", self.__clip_added_cb)
+        ges_layer.connect("clip-removed", self.__clip_removed_cb)
+        for ges_clip in ges_layer.get_clips():
+            self.__add_clip(ges_clip)
+
+    def __remove_layer(self, ges_layer):
+        ges_layer.disconnect_by_func(self.__clip_added_cb)
+        ges_layer.disconnect_by_func(self.__clip_removed_cb)
+        for ges_clip in ges_layer.get_clips():
+            self.__remove_clip(ges_clip)
+
+    def __add_clip(self, ges_clip):
+        self.__add_clip_edges(ges_clip)
+        ges_clip.connect("notify::start", self.__clip_changed_cb)
+        ges_clip.connect("notify::duration", self.__clip_changed_cb)
+
+    def __remove_clip(self, ges_clip):
+        ges_clip.disconnect_by_func(self.__clip_changed_cb)
+        self.__remove_clip_edges(ges_clip)
+
+    def __add_clip_edges(self, ges_clip):
+        start = ges_clip.props.start
+        edges = (start, start + ges_clip.props.duration)
+        self.__clips[ges_clip] = edges
+        for edge in edges:
+            bisect.insort(self.__clip_edges, edge)
+
+    def __remove_clip_edges(self, ges_clip):
+        for edge in self.__clips.pop(ges_clip):
+            self.__remove_value(self.__clip_edges, edge)
+
+    @staticmethod
+    def __remove_value(values, value):
+        index = bisect.bisect_left(values, value)
+        assert values[index] == value
+        del values[index]
+
+    def __layer_added_cb(self, unused_ges_timeline, ges_layer):
+        self.__add_layer(ges_layer)
+
+    def __layer_removed_cb(self, unused_ges_timeline, ges_layer):
+        self.__remove_layer(ges_layer)
+
+    def __clip_added_cb(self, unused_ges_layer, ges_clip):
+        self.__add_clip(ges_clip)
+
+    def __clip_removed_cb(self, unused_ges_layer, ges_clip):
+        self.__remove_clip(ges_clip)
+
+    def __clip_changed_cb(self, ges_clip, unused_pspec):
+        self.__remove_clip_edges(ges_clip)
+        self.__add_clip_edges(ges_clip)
+
+    def __marker_added_cb(self, unused_ges_markers, position, unused_ges_marker):
+        bisect.insort(self.__marker_positions, position)
+
+    def __marker_removed_cb(self, unused_ges_markers, ges_marker):
+        self.__remove_value(self.__marker_positions, ges_marker.props.position)
+
+    def __marker_moved_cb(self, unused_ges_markers, prev_position, position,
+                          unused_ges_marker):
+        self.__remove_value(self.__marker_positions, prev_position)
+        bisect.insort(self.__marker_positions, position)
@@ -534,7 +534,17 @@ class AssetPipeline(SimplePipeline):
 
 
 class Pipeline(GES.Pipeline, SimplePipeline):
-    """Helper to handle GES.Pipeline through the SimplePipeline API."""
+    """Helper to handle GES.Pipeline through the SimplePipeline API.
+
+    The timeline commits requested while an operation is being recorded
+    in the action log, or while undoing or redoing, are merged into a
+    single commit performed when the operation ends. The preview commits
+    done while the user is dragging are performed right away.
+
+    Attributes:
+        commits_count (int): The number of times the timeline has been
+            committed.
+    """
 
     __gsignals__ = PIPELINE_SIGNALS
 
@@ -547,6 +557,10 @@ class Pipeline(GES.Pipeline, SimplePipeline):
         self._was_empty = False
         self._commit_wanted = False
         self._prevent_commits = 0
+        self.commits_count = 0
+        self.__commit_deferred = False
+        self.__commit_idle_id = 0
+        self.__action_log = None
 
         if "watchdog" in os.environ.get("PITIVI_UNSTABLE_FEATURES", ''):
             watchdog = Gst.ElementFactory.make("watchdog", None)
@@ -575,13 +589,14 @@ class Pipeline(GES.Pipeline, SimplePipeline):
 
         return GES.Pipeline.do_change_state(self, state)
 
-    def step_frame(self, framerate, frames_offset):
+    def step_frame(self, frame_grid, frames_offset):
         """Seeks backwards or forwards the specified amount of frames.
 
         This clamps the playhead to the project frames.
 
         Args:
-            framerate (Gst.Fraction): The framerate of the project.
+            frame_grid (pitivi.utils.timeline.FrameGrid): The grid of the
+                project frames.
             frames_offset (int): The number of frames to step. Negative number
                 for stepping backwards.
         """
@@ -592,11 +607,11 @@ class Pipeline(GES.Pipeline, SimplePipeline):
                 "Couldn't get position (you're framestepping too quickly), ignoring this request")
             return
 
-        cur_frame = int(
-            round(position * framerate.num / float(Gst.SECOND * framerate.denom), 2))
+        cur_frame = frame_grid.get_frame_at(position)
         new_frame = cur_frame + frames_offset
-        new_pos = int(new_frame * Gst.SECOND * framerate.denom / framerate.num) + \
-            int((Gst.SECOND * framerate.denom / framerate.num) / 2)
+        # Seek in the middle of the frame.
+        new_pos = frame_grid.get_frame_time(new_frame) + frame_grid.frame_duration // 2
+        framerate = frame_grid.framerate
         Loggable.info(self, "From frame %d to %d at %f fps, seek to %s s",
                       cur_frame,
                       new_frame,
@@ -634,11 +649,79 @@ class Pipeline(GES.Pipeline, SimplePipeline):
                 self._commit_wanted:
             self.debug("Committing now that ASYNC is DONE")
             self._add_waiting_for_async_done_timeout()
-            self.props.timeline.commit()
+            self.__commit()
             self._commit_wanted = False
         else:
             SimplePipeline._bus_message_cb(self, bus, message)
 
+    def release(self):
+        self.set_action_log(None)
+        self.__remove_commit_idle()
+        SimplePipeline.release(self)
+
+    def set_action_log(self, action_log):
+        """Sets the log of the operations during which commits are merged.
+
+        Args:
+            action_log (UndoableActionLog): The log of the project or None.
+        """
+        if self.__action_log:
+            self.__action_log.disconnect_by_func(self._action_log_commit_cb)
+            self.__action_log.disconnect_by_func(self._action_log_rollback_cb)
+            self.__action_log.disconnect_by_func(self._action_log_move_cb)
+        self.__action_log = action_log
+        if action_log:
+            action_log.connect("commit", self._action_log_commit_cb)
+            action_log.connect("rollback", self._action_log_rollback_cb)
+            action_log.connect("move", self._action_log_move_cb)
+
+    def _action_log_commit_cb(self, action_log, unused_stack):
+        if not action_log.is_in_transaction():
+            self.__flush_deferred_commit()
+
+    def _action_log_rollback_cb(self, action_log, unused_stack):
+        if self.__commit_deferred and not action_log.is_in_transaction():
+            # The operation is being undone right after this signal.
+            self.queue_commit_timeline()
+
+    def _action_log_move_cb(self, unused_action_log, unused_stack):
+        self.__flush_deferred_commit()
+
+    def __flush_deferred_commit(self):
+        if self.__commit_deferred:
+            self.debug("Performing the deferred commit")
+            self.commit_timeline()
+
+    def __remove_commit_idle(self):
+        if self.__commit_idle_id:
+            GLib.source_remove(self.__commit_idle_id)
+            self.__commit_idle_id = 0
+
+    def queue_commit_timeline(self):
+        """Commits the timeline once the current main loop iteration ends.
+
+        All the requests made until then result in a single commit.
+        """
+        if self.__commit_idle_id:
+            return
+        self.__commit_idle_id = GLib.idle_add(self.__commit_idle_cb,
+                                              priority=GLib.PRIORITY_HIGH_IDLE)
+
+    def __commit_idle_cb(self):
+        self.__commit_idle_id = 0
+        if not self.__is_operation_ongoing():
+            self.commit_timeline()
+        # Otherwise the commit is performed when the operation ends.
+        return GLib.SOURCE_REMOVE
+
+    def __is_operation_ongoing(self):
+        action_log = self.__action_log
+        return bool(action_log) and (action_log.is_in_transaction() or action_log.running)
+
+    def __commit(self):
+        self.commits_count += 1
+        self.props.timeline.commit()
+
     @contextlib.contextmanager
     def commit_timeline_after(self):
         self._prevent_commits += 1
@@ -649,11 +732,27 @@ class Pipeline(GES.Pipeline, SimplePipeline):
             self._prevent_commits -= 1
             self.commit_timeline()
 
-    def commit_timeline(self):
+    def commit_timeline(self, preview=False):
+        """Commits the timeline or defers it until the operation ends.
+
+        Args:
+            preview (Optional[bool]): Whether to commit right away, to show
+                the result while the user is interacting, for example
+                dragging, during an operation.
+        """
         if self._prevent_commits > 0 or self.get_simple_state() == Gst.State.NULL:
             # No need to commit. NLE will do it automatically when
             # changing state from READY to PAUSED.
             return
+        if not preview and self.__is_operation_ongoing():
+            # Commit only once, at the end of the operation.
+            self.log("Deferring the commit until the operation ends")
+            self.__commit_deferred = True
+            # In case the operation ends without being recorded.
+            self.queue_commit_timeline()
+            return
+        self.__commit_deferred = False
+        self.__remove_commit_idle()
         is_empty = self.props.timeline.is_empty()
         if self._busy_async and not self._was_empty and not is_empty:
             self._commit_wanted = True
@@ -661,7 +760,7 @@ class Pipeline(GES.Pipeline, SimplePipeline):
             self.log("commit wanted")
         else:
             self._add_waiting_for_async_done_timeout()
-            self.props.timeline.commit()
+            self.__commit()
             self.debug("Committing right now")
             self._was_empty = is_empty
 
@@ -14,7 +14,11 @@
 #
 # You should have received a copy of the GNU Lesser General Public
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
+import heapq
+import itertools
+import json
 import os
+import sys
 import time
 from fractions import Fraction
 from gettext import gettext as _
@@ -30,6 +34,7 @@ from gi.repository import GstTranscoder
 from pitivi.configure import get_gstpresets_dir
 from pitivi.dialogs.prefs import PreferencesDialog
 from pitivi.settings import GlobalSettings
+from pitivi.settings import xdg_cache_home
 from pitivi.utils.loggable import Loggable
 from pitivi.utils.misc import ASSET_DURATION_META
 from pitivi.utils.misc import asset_get_duration
@@ -44,6 +49,20 @@ class ProxyingStrategy:
     NOTHING = "nothing"
 
 
+class ProxyJobKind:
+    """The kinds of transcoding jobs handled by the ProxyManager."""
+
+    HQ = "hq"
+    SCALED = "scaled"
+    # A HQ proxy created to shadow a scaled proxy of an unsupported asset.
+    SHADOW = "shadow"
+
+    # The job kinds which produce a HQ proxy.
+    OPTIMISATION_KINDS = (HQ, SHADOW)
+    # Maps a job kind to the kind of the job it is paired with, if any.
+    PAIRED_KINDS = {SCALED: SHADOW, SHADOW: SCALED}
+
+
 GlobalSettings.add_config_section("proxy")
 GlobalSettings.add_config_option('proxying_strategy',
                                  section='proxy',
@@ -94,6 +113,142 @@ ENCODING_FORMAT_PRORES = "prores-raw-in-qt.gep"
 ENCODING_FORMAT_JPEG = "jpeg-raw-in-qt.gep"
 
 
+class TranscodingThroughputModel(Loggable):
+    """Model of how fast the assets are transcoded on this machine.
+
+    The realtime factors, meaning how many media seconds are transcoded
+    per second, are learned per job class from the completed jobs. A job
+    class groups the jobs by kind, codec and resolution, for example
+    "hq:video/x-h265:uhd".
+
+    Args:
+        path (Optional[str]): The file where the learned factors are kept.
+            If None, they are kept only in memory.
+    """
+
+    # The upper height limits of the resolution classes.
+    RESOLUTION_CLASSES = ((576, "sd"), (720, "hd"), (1080, "fhd"), (2160, "uhd"),
+                          (sys.maxsize, "8k"))
+    # The weight of the last completed job in the learned realtime factor.
+    SMOOTHING = 0.3
+    DEFAULT_REALTIME_FACTOR = 1.0
+    # The number of seconds after which the rate observed for a running job
+    # is trusted more than the learned realtime factor.
+    OBSERVATION_SECONDS = 10
+
+    def __init__(self, path=None):
+        Loggable.__init__(self)
+
+        self._path = path
+        self._factors = {}
+        self.load()
+
+    @classmethod
+    def get_job_class(cls, asset, kind):
+        """Gets the class of a transcoding job for the specified asset.
+
+        Args:
+            asset (GES.UriClipAsset): The asset to be transcoded.
+            kind (str): The ProxyJobKind or "remux".
+
+        Returns:
+            str: The class of the job.
+        """
+        info = asset.get_info()
+        videos = info.get_video_streams()
+        if videos:
+            stream = videos[0]
+            height = stream.get_height()
+            resolution = next(name for max_height, name in cls.RESOLUTION_CLASSES
+                              if height <= max_height)
+        else:
+            audios = info.get_audio_streams()
+            stream = audios[0] if audios else None
+            resolution = "audio"
+        codec = stream.get_caps().get_structure(0).get_name() if stream else "unknown"
+        return "%s:%s:%s" % (kind, codec, resolution)
+
+    def get_realtime_factor(self, job_class):
+        """Gets the number of media seconds transcoded per second."""
+        try:
+            return self._factors[job_class]
+        except KeyError:
+            pass
+
+        # Use what we know about the same kind of jobs, if anything.
+        kind = job_class.split(":", 1)[0] + ":"
+        factors = [factor for other_class, factor in self._factors.items()
+                   if other_class.startswith(kind)] or list(self._factors.values())
+        if not factors:
+            return self.DEFAULT_REALTIME_FACTOR
+        return sum(factors) / len(factors)
+
+    def estimate(self, job_class, media_seconds, transcoded_seconds=0, elapsed_seconds=0):
+        """Estimates the number of seconds until a job finishes.
+
+        Args:
+            job_class (str): The class of the job.
+            media_seconds (float): The duration of the asset being transcoded.
+            transcoded_seconds (Optional[float]): How much has been transcoded.
+            elapsed_seconds (Optional[float]): For how long the job is running.
+
+        Returns:
+            float: The estimated remaining time in seconds.
+        """
+        factor = self.get_realtime_factor(job_class)
+        if transcoded_seconds > 0 and elapsed_seconds > 0:
+            # Move gradually from the learned factor to the observed one.
+            weight = min(1, elapsed_seconds / self.OBSERVATION_SECONDS)
+            factor = weight * transcoded_seconds / elapsed_seconds + (1 - weight) * factor
+        return max(0, media_seconds - transcoded_seconds) / factor
+
+    def record(self, job_class, media_seconds, elapsed_seconds):
+        """Learns from a completed job.
+
+        Args:
+            job_class (str): The class of the job.
+            media_seconds (float): The duration of the transcoded asset.
+            elapsed_seconds (float): How long the job took.
+        """
+        if media_seconds <= 0 or elapsed_seconds <= 0:
+            return
+
+        observed = media_seconds / elapsed_seconds
+        factor = self._factors.get(job_class)
+        if factor is None:
+            factor = observed
+        else:
+            factor += self.SMOOTHING * (observed - factor)
+        self.debug("Realtime factor for %s: %f", job_class, factor)
+        self._factors[job_class] = factor
+        self.save()
+
+    def load(self):
+        """Loads the learned realtime factors."""
+        if not self._path:
+            return
+
+        try:
+            with open(self._path, "r") as file:
+                try:
+                    self._factors = json.load(file)
+                except (json.decoder.JSONDecodeError, ValueError) as e:
+                    self.warning("Transcoding throughput could not be read: %s", e)
+        except FileNotFoundError:
+            return
+
+    def save(self):
+        """Saves the learned realtime factors."""
+        if not self._path:
+            return
+
+        try:
+            with open(self._path, "w") as file:
+                json.dump(self._factors, file)
+        except OSError as e:
+            self.warning("Transcoding throughput could not be saved: %s", e)
+
+
 def create_encoding_profile_simple(container_caps, audio_caps, video_caps):
     container_profile = GstPbutils.EncodingContainerProfile.new(None, None,
                                                                 Gst.Caps(container_caps),
@@ -110,7 +265,14 @@ def create_encoding_profile_simple(container_caps, audio_caps, video_caps):
 
 
 class ProxyManager(GObject.Object, Loggable):
-    """Transcodes assets and manages proxies."""
+    """Transcodes assets and manages proxies.
+
+    Args:
+        app (Pitivi): The app.
+        throughput (Optional[TranscodingThroughputModel]): The model used
+            for estimating the transcoding time. By default, the learned
+            factors are kept in the cache dir.
+    """
 
     __gsignals__ = {
         "progress": (GObject.SignalFlags.RUN_LAST, None, (object, int, int)),
@@ -139,26 +301,43 @@ class ProxyManager(GObject.Object, Loggable):
         a = GstPbutils.EncodingAudioProfile.new(Gst.Caps(audio), None, None, 0)
         WHITELIST_FORMATS.append(a)
 
+    # Video codecs where each frame is encoded independently, so they
+    # are already good for editing once they are in a seekable container.
+    INTRA_VIDEO_CAPS = ["image/jpeg", "video/x-raw", "video/x-prores",
+                        "video/x-dnxhd", "video/x-huffyuv", "video/x-ffv",
+                        "image/png"]
+    # The container used for the proxies which are only remuxed.
+    REMUX_CONTAINER_CAPS = "video/quicktime"
+    REMUX_MUXER = "qtmux"
+
     hq_proxy_extension = "proxy.mov"
     scaled_proxy_extension = "scaledproxy.mov"
     # Suffix for filenames of proxies being created.
     part_suffix = ".part"
 
-    def __init__(self, app):
+    def __init__(self, app, throughput=None):
         GObject.Object.__init__(self)
         Loggable.__init__(self)
 
         self.app = app
-        # Total time to transcode in seconds.
-        self._total_time_to_transcode = 0
-        # Transcoded time per asset in seconds.
-        self._transcoded_durations = {}
-        self._start_proxying_time = 0
-        self.__running_transcoders = []
-        self.__pending_transcoders = []
+        if throughput is None:
+            throughput = TranscodingThroughputModel(
+                os.path.join(xdg_cache_home(), "transcoding_throughput.json"))
+        self.throughput = throughput
+        # The running and pending transcoders, by (src_uri, ProxyJobKind).
+        self.__jobs = {}
+        self.__running_transcoders = set()
+        self.__pending_transcoders = set()
+        # Heap of (estimated_seconds, order, transcoder) for starting the
+        # shortest pending jobs first. Contains also cancelled transcoders,
+        # which are skipped when popped.
+        self.__pending_queue = []
+        self.__pending_order = itertools.count()
+        # The estimated duration of the pending jobs, in seconds.
+        self.__pending_seconds = 0
         # The scaled proxy transcoders waiting for their corresponding shadow
-        # HQ proxy transcoder to finish.
-        self.__waiting_transcoders = []
+        # HQ proxy transcoder to finish, by src_uri.
+        self.__waiting_transcoders = {}
 
         self.__encoding_target_file = None
         self.proxying_unsupported = False
@@ -368,6 +547,60 @@ class ProxyManager(GObject.Object, Loggable):
 
         return False
 
+    def _asset_can_be_remuxed(self, asset):
+        """Returns whether a proxy can be created without decoding the asset.
+
+        This is the case when the video codec is intra-frame or whitelisted
+        and all the streams can be stored as they are in a seekable container.
+        """
+        info = asset.get_info()
+        videos = info.get_video_streams()
+        if len(videos) != 1:
+            return False
+
+        video_codec = videos[0].get_caps().get_structure(0).get_name()
+        if video_codec not in self.INTRA_VIDEO_CAPS and \
+                video_codec not in self.WHITELIST_VIDEO_CAPS:
+            return False
+
+        muxer = Gst.ElementFactory.find(self.REMUX_MUXER)
+        if not muxer:
+            return False
+
+        for stream in videos + info.get_audio_streams():
+            if not muxer.can_sink_any_caps(stream.get_caps()):
+                return False
+
+        return True
+
+    def _asset_should_be_remuxed(self, asset, scaled=False):
+        """Returns whether the HQ proxy of the asset should only be remuxed."""
+        if scaled or not self._asset_can_be_remuxed(asset):
+            return False
+
+        video_codec = asset.get_info().get_video_streams()[0].get_caps().get_structure(0).get_name()
+        if video_codec in self.INTRA_VIDEO_CAPS:
+            return True
+
+        # A whitelisted inter-frame codec is not editing friendly, so when
+        # the user explicitly asks for a proxy we transcode it anyway.
+        return not asset.force_proxying
+
+    def __get_remux_profile(self, asset):
+        """Gets a profile for rewrapping the asset's streams without decoding."""
+        container_profile = GstPbutils.EncodingContainerProfile.new(
+            None, None, Gst.Caps(self.REMUX_CONTAINER_CAPS), None)
+
+        info = asset.get_info()
+        for stream in info.get_video_streams():
+            container_profile.add_profile(
+                GstPbutils.EncodingVideoProfile.new(stream.get_caps(), None, None, 0))
+        for stream in info.get_audio_streams():
+            container_profile.add_profile(
+                GstPbutils.EncodingAudioProfile.new(stream.get_caps(), None, None, 0))
+
+        return container_profile
+
     def asset_matches_target_res(self, asset):
         """Returns whether the asset's size <= the scaled proxy size."""
         stream = asset.get_info().get_video_streams()[0]
@@ -398,9 +631,14 @@ class ProxyManager(GObject.Object, Loggable):
 
         if self.app.settings.proxying_strategy == ProxyingStrategy.AUTOMATIC \
                 and not scaled and not self.is_hq_proxy(asset) and \
+                asset.get_info().get_seekable() and \
                 self.is_asset_format_well_supported(asset):
             return False
 
+        if self.is_hq_proxy(asset) and self._asset_can_be_remuxed(asset):
+            # The HQ proxy has been created by remuxing the asset.
+            return False
+
         if not self._asset_matches_encoding_format(asset, self.__encoding_profile):
             return True
 
@@ -423,10 +661,9 @@ class ProxyManager(GObject.Object, Loggable):
 
     def __start_transcoder(self, transcoder):
         self.debug("Starting %s", transcoder.props.src_uri)
-        if self._start_proxying_time == 0:
-            self._start_proxying_time = time.time()
+        transcoder.start_time = time.monotonic()
         transcoder.run_async()
-        self.__running_transcoders.append(transcoder)
+        self.__running_transcoders.add(transcoder)
 
     def __assets_match(self, asset, proxy):
         if self.__asset_needs_transcoding(proxy):
@@ -471,28 +708,25 @@ class ProxyManager(GObject.Object, Loggable):
                       asset.props.id, Gst.TIME_ARGS(asset_duration), Gst.TIME_ARGS(duration))
             asset.set_uint64(ASSET_DURATION_META, duration)
             proxy.set_uint64(ASSET_DURATION_META, duration)
-            target_uri = self.get_target_uri(asset)
-
-            for clip in self.app.project_manager.current_project.ges_timeline.iter_clips():
-                if not isinstance(clip, GES.UriClip):
-                    continue
-                if self.get_target_uri(clip.props.uri) == target_uri:
-                    if clip.props.in_point + clip.props.duration > duration:
-                        new_duration = duration - clip.props.in_point
-                        if new_duration > 0:
-                            self.warning("%s resetting duration to %s as"
-                                         " new proxy has a shorter duration",
-                                         clip, Gst.TIME_ARGS(new_duration))
-                            clip.set_duration(new_duration)
-                        else:
-                            new_inpoint = new_duration - clip.props.in_point
-                            self.error("%s resetting duration to %s"
-                                       " and inpoint to %s as the proxy"
-                                       " is shorter",
-                                       clip, Gst.TIME_ARGS(new_duration), Gst.TIME_ARGS(new_inpoint))
-                            clip.set_inpoint(new_inpoint)
-                            clip.set_duration(duration - new_inpoint)
-                        clip.set_max_duration(duration)
+
+            clips_index = self.app.project_manager.current_project.clips_index
+            for clip in clips_index.get_clips(asset):
+                if clip.props.in_point + clip.props.duration > duration:
+                    new_duration = duration - clip.props.in_point
+                    if new_duration > 0:
+                        self.warning("%s resetting duration to %s as"
+                                     " new proxy has a shorter duration",
+                                     clip, Gst.TIME_ARGS(new_duration))
+                        clip.set_duration(new_duration)
+                    else:
+                        new_inpoint = new_duration - clip.props.in_point
+                        self.error("%s resetting duration to %s"
+                                   " and inpoint to %s as the proxy"
+                                   " is shorter",
+                                   clip, Gst.TIME_ARGS(new_duration), Gst.TIME_ARGS(new_inpoint))
+                        clip.set_inpoint(new_inpoint)
+                        clip.set_duration(duration - new_inpoint)
+                    clip.set_max_duration(duration)
 
         if shadow:
             self.app.project_manager.current_project.finalize_proxy(proxy)
@@ -510,18 +744,21 @@ class ProxyManager(GObject.Object, Loggable):
 
         self.debug("Transcoder done with %s", asset.get_id())
 
-        self.__running_transcoders.remove(transcoder)
+        # Look for the second transcoder before unregistering the job.
+        second_transcoder = self._get_second_transcoder(transcoder)
+        self.__remove_job(transcoder)
+        self.throughput.record(transcoder.job_class, transcoder.media_seconds,
+                               time.monotonic() - transcoder.start_time)
 
         proxy_uri = transcoder.props.dest_uri.rstrip(ProxyManager.part_suffix)
         os.rename(Gst.uri_get_location(transcoder.props.dest_uri),
                   Gst.uri_get_location(proxy_uri))
 
         shadow = self._is_shadow_transcoder(transcoder)
-        second_transcoder = self._get_second_transcoder(transcoder)
         if second_transcoder and not shadow:
             # second_transcoder is the shadow for transcoder.
             # Defer loading until the shadow transcoder finishes.
-            self.__waiting_transcoders.append([transcoder, asset])
+            self.__waiting_transcoders[transcoder.props.src_uri] = (transcoder, asset)
         else:
             # Make sure that if it first failed loading, the proxy is forced to
             # be reloaded in the GES cache.
@@ -531,34 +768,76 @@ class ProxyManager(GObject.Object, Loggable):
 
         if shadow:
             # Finish deferred loading for waiting scaled proxy transcoder.
-            for pair in self.__waiting_transcoders:
+            pair = self.__waiting_transcoders.pop(transcoder.props.src_uri, None)
+            if pair:
                 waiting_transcoder, waiting_asset = pair
-                if waiting_transcoder.props.src_uri == transcoder.props.src_uri:
-                    proxy_uri = waiting_transcoder.props.dest_uri.rstrip(ProxyManager.part_suffix)
-                    GES.Asset.needs_reload(GES.UriClip, proxy_uri)
-                    GES.Asset.request_async(GES.UriClip, proxy_uri, None,
-                                            self.__asset_loaded_cb, waiting_asset, waiting_transcoder)
+                proxy_uri = waiting_transcoder.props.dest_uri.rstrip(ProxyManager.part_suffix)
+                GES.Asset.needs_reload(GES.UriClip, proxy_uri)
+                GES.Asset.request_async(GES.UriClip, proxy_uri, None,
+                                        self.__asset_loaded_cb, waiting_asset, waiting_transcoder)
+
+        pending_transcoder = self.__pop_pending_transcoder()
+        if pending_transcoder:
+            self.__start_transcoder(pending_transcoder)
+
+    def __queue_pending_transcoder(self, transcoder):
+        self.__pending_transcoders.add(transcoder)
+        self.__pending_seconds += transcoder.estimated_seconds
+        heapq.heappush(self.__pending_queue,
+                       (transcoder.estimated_seconds, next(self.__pending_order), transcoder))
+
+    def __pop_pending_transcoder(self):
+        """Gets the pending transcoder estimated to finish first, if any."""
+        while self.__pending_queue:
+            unused_seconds, unused_order, transcoder = heapq.heappop(self.__pending_queue)
+            if transcoder in self.__pending_transcoders:
+                self.__pending_transcoders.remove(transcoder)
+                self.__pending_seconds -= transcoder.estimated_seconds
+                return transcoder
+        return None
 
-                    self.__waiting_transcoders.remove(pair)
-                    break
+    def __estimate_running_job(self, transcoder, now):
+        return self.throughput.estimate(transcoder.job_class,
+                                        transcoder.media_seconds,
+                                        transcoder.transcoded_seconds,
+                                        now - transcoder.start_time)
 
-        try:
-            self.__start_transcoder(self.__pending_transcoders.pop())
-        except IndexError:
-            if not self.__running_transcoders:
-                self._transcoded_durations = {}
-                self._total_time_to_transcode = 0
-                self._start_proxying_time = 0
+    def get_estimated_time(self, asset):
+        """Estimates the time until the jobs of the specified asset finish.
+
+        Args:
+            asset (GES.Asset): The original asset.
+
+        Returns:
+            float: The estimated time in seconds, or None if not queued.
+        """
+        now = time.monotonic()
+        estimates = []
+        for kind in (ProxyJobKind.HQ, ProxyJobKind.SCALED, ProxyJobKind.SHADOW):
+            transcoder = self.__jobs.get((asset.props.id, kind))
+            if not transcoder:
+                continue
+            if transcoder in self.__running_transcoders:
+                estimates.append(self.__estimate_running_job(transcoder, now))
+            else:
+                estimates.append(transcoder.estimated_seconds)
+        return max(estimates) if estimates else None
+
+    def __estimate_remaining_time(self):
+        """Estimates the time until all the jobs finish, in seconds."""
+        now = time.monotonic()
+        running = [self.__estimate_running_job(transcoder, now)
+                   for transcoder in self.__running_transcoders]
+        if not running:
+            return 0
+
+        # The pending jobs are spread over the parallel jobs slots.
+        num_jobs = max(1, self.app.settings.num_transcoding_jobs)
+        return max(max(running), (sum(running) + self.__pending_seconds) / num_jobs)
 
     def __emit_progress(self, asset, creation_progress):
         """Handles the transcoding progress of the specified asset."""
-        if self._transcoded_durations:
-            time_spent = time.time() - self._start_proxying_time
-            transcoded_seconds = sum(self._transcoded_durations.values())
-            remaining_seconds = max(0, self._total_time_to_transcode - transcoded_seconds)
-            estimated_time = remaining_seconds * time_spent / transcoded_seconds
-        else:
-            estimated_time = 0
+        estimated_time = self.__estimate_remaining_time()
 
         asset.creation_progress = creation_progress
         self.emit("progress", asset, asset.creation_progress, estimated_time)
@@ -572,7 +851,7 @@ class ProxyManager(GObject.Object, Loggable):
         if second_transcoder is not None:
             position = (position + second_transcoder.props.position) // 2
 
-        self._transcoded_durations[asset] = position / Gst.SECOND
+        transcoder.transcoded_seconds = position / Gst.SECOND
 
         duration = transcoder.props.duration
         if duration <= 0 or duration == Gst.CLOCK_TIME_NONE:
@@ -587,19 +866,27 @@ class ProxyManager(GObject.Object, Loggable):
 
     def _get_second_transcoder(self, transcoder):
         """Gets the shadow of a scaled proxy or the other way around."""
-        all_transcoders = self.__running_transcoders + self.__pending_transcoders
-        for transcoder2 in all_transcoders:
-            if transcoder2.props.position_update_interval == transcoder.props.position_update_interval:
-                # Both transcoders are of the same type.
-                continue
-            if transcoder2.props.src_uri == transcoder.props.src_uri:
-                return transcoder2
-        return None
+        paired_kind = ProxyJobKind.PAIRED_KINDS.get(transcoder.job_kind)
+        if paired_kind is None:
+            return None
+        return self.__jobs.get((transcoder.props.src_uri, paired_kind))
 
     def _is_shadow_transcoder(self, transcoder):
-        if transcoder.props.position_update_interval == 1001:
-            return True
-        return False
+        return transcoder.job_kind == ProxyJobKind.SHADOW
+
+    def __add_job(self, transcoder, kind):
+        transcoder.job_kind = kind
+        self.__jobs[(transcoder.props.src_uri, kind)] = transcoder
+
+    def __remove_job(self, transcoder):
+        """Unregisters the specified transcoder, running or pending."""
+        key = (transcoder.props.src_uri, transcoder.job_kind)
+        if self.__jobs.get(key) is transcoder:
+            del self.__jobs[key]
+        self.__running_transcoders.discard(transcoder)
+        if transcoder in self.__pending_transcoders:
+            self.__pending_transcoders.remove(transcoder)
+            self.__pending_seconds -= transcoder.estimated_seconds
 
     def is_asset_queued(self, asset, optimisation=True, scaling=True):
         """Returns whether the specified asset is queued for transcoding.
@@ -612,29 +899,18 @@ class ProxyManager(GObject.Object, Loggable):
         Returns:
             bool: True if the asset is being transcoded or pending.
         """
-        all_transcoders = self.__running_transcoders + self.__pending_transcoders
-        is_queued = False
-        for transcoder in all_transcoders:
-            transcoder_uri = transcoder.props.dest_uri
-            scaling_ext = "." + self.scaled_proxy_extension + ProxyManager.part_suffix
-            optimisation_ext = "." + self.hq_proxy_extension + ProxyManager.part_suffix
+        uri = asset.props.id
+        if optimisation:
+            for kind in ProxyJobKind.OPTIMISATION_KINDS:
+                if (uri, kind) in self.__jobs:
+                    return True
 
-            scaling_transcoder = transcoder_uri.endswith(scaling_ext)
-            optimisation_transcoder = transcoder_uri.endswith(optimisation_ext)
-
-            if transcoder.props.src_uri == asset.props.id:
-                if optimisation and optimisation_transcoder:
-                    is_queued = True
-                    break
-
-                if scaling and scaling_transcoder:
-                    is_queued = True
-                    break
+        if scaling and (uri, ProxyJobKind.SCALED) in self.__jobs:
+            return True
 
-        return is_queued
+        return False
 
     def __create_transcoder(self, asset, scaled=False, shadow=False):
-        self._total_time_to_transcode += asset.get_duration() / Gst.SECOND
         asset_uri = asset.get_id()
         proxy_uri = self.get_proxy_uri(asset, scaled=scaled)
 
@@ -663,28 +939,49 @@ class ProxyManager(GObject.Object, Loggable):
 
         dispatcher = GstTranscoder.TranscoderGMainContextSignalDispatcher.new()
 
-        enc_profile = self.__get_encoding_profile(self.__encoding_target_file,
-                                                  asset, width, height)
+        remux = self._asset_should_be_remuxed(asset, scaled)
+        if remux:
+            self.debug("Remuxing %s instead of transcoding it", asset_uri)
+            enc_profile = self.__get_remux_profile(asset)
+        else:
+            enc_profile = self.__get_encoding_profile(self.__encoding_target_file,
+                                                      asset, width, height)
 
         transcoder = GstTranscoder.Transcoder.new_full(
             asset_uri, proxy_uri + ProxyManager.part_suffix, enc_profile,
             dispatcher)
+        # The streams matching the profile are passed through as they are.
+        transcoder.set_avoid_reencoding(remux)
 
+        transcoder.props.position_update_interval = 1000
         if shadow:
-            # Used to identify shadow transcoder
-            transcoder.props.position_update_interval = 1001
+            kind = ProxyJobKind.SHADOW
+        elif scaled:
+            kind = ProxyJobKind.SCALED
         else:
-            transcoder.props.position_update_interval = 1000
-
-        thumbnailbin = Gst.ElementFactory.make("teedthumbnailbin")
-        thumbnailbin.props.uri = asset.get_id()
-
-        waveformbin = Gst.ElementFactory.make("waveformbin")
-        waveformbin.props.uri = asset.get_id()
-        waveformbin.props.duration = asset.get_duration()
-
-        transcoder.props.pipeline.props.video_filter = thumbnailbin
-        transcoder.props.pipeline.props.audio_filter = waveformbin
+            kind = ProxyJobKind.HQ
+        self.__add_job(transcoder, kind)
+
+        transcoder.job_class = self.throughput.get_job_class(asset, "remux" if remux else kind)
+        transcoder.media_seconds = asset.get_duration() / Gst.SECOND
+        transcoder.transcoded_seconds = 0
+        transcoder.estimated_seconds = self.throughput.estimate(transcoder.job_class,
+                                                                transcoder.media_seconds)
+
+        if not remux:
+            # Generate the thumbnails and the waveform while transcoding.
+            # When remuxing, the filters would never see raw buffers, so
+            # the previewers generate them from the asset, as they do
+            # when the cache is missing.
+            thumbnailbin = Gst.ElementFactory.make("teedthumbnailbin")
+            thumbnailbin.props.uri = asset.get_id()
+
+            waveformbin = Gst.ElementFactory.make("waveformbin")
+            waveformbin.props.uri = asset.get_id()
+            waveformbin.props.duration = asset.get_duration()
+
+            transcoder.props.pipeline.props.video_filter = thumbnailbin
+            transcoder.props.pipeline.props.audio_filter = waveformbin
 
         transcoder.set_cpu_usage(self.app.settings.max_cpu_usage)
         transcoder.connect("position-updated",
@@ -697,7 +994,7 @@ class ProxyManager(GObject.Object, Loggable):
         if len(self.__running_transcoders) < self.app.settings.num_transcoding_jobs:
             self.__start_transcoder(transcoder)
         else:
-            self.__pending_transcoders.append(transcoder)
+            self.__queue_pending_transcoder(transcoder)
 
     def cancel_job(self, asset):
         """Cancels the transcoding job for the specified asset, if any.
@@ -705,26 +1002,23 @@ class ProxyManager(GObject.Object, Loggable):
         Args:
             asset (GES.Asset): The original asset.
         """
-        if not self.is_asset_queued(asset):
-            return
+        for kind in (ProxyJobKind.HQ, ProxyJobKind.SCALED, ProxyJobKind.SHADOW):
+            transcoder = self.__jobs.get((asset.props.id, kind))
+            if not transcoder:
+                continue
 
-        for transcoder in self.__running_transcoders:
-            if asset.props.id == transcoder.props.src_uri:
+            if transcoder in self.__running_transcoders:
                 self.info("Cancelling running transcoder %s %s",
                           transcoder.props.src_uri,
                           transcoder.__grefcount__)
-                self.__running_transcoders.remove(transcoder)
-                self.emit("asset-preparing-cancelled", asset)
-
-        for transcoder in self.__pending_transcoders:
-            if asset.props.id == transcoder.props.src_uri:
+            else:
                 self.info("Cancelling pending transcoder %s",
                           transcoder.props.src_uri)
-                # Removing the transcoder from the list
-                # will lead to its destruction (only reference)
-                # here, which means it will be stopped.
-                self.__pending_transcoders.remove(transcoder)
-                self.emit("asset-preparing-cancelled", asset)
+            # Unregistering a pending transcoder will lead to its
+            # destruction (only reference) here, which means it will
+            # be stopped.
+            self.__remove_job(transcoder)
+            self.emit("asset-preparing-cancelled", asset)
 
     def add_job(self, asset, scaled=False, shadow=False):
         """Adds a transcoding job for the specified asset if needed.
@@ -770,6 +1064,91 @@ class ProxyManager(GObject.Object, Loggable):
         self.__create_transcoder(asset, scaled=scaled, shadow=shadow)
 
 
+class AssetClipsIndex(Loggable):
+    """Index of the URI clips of a timeline by the URI of their proxy target.
+
+    Allows finding quickly the clips using an asset or any of its proxies.
+
+    Args:
+        ges_timeline (GES.Timeline): The timeline to be indexed.
+    """
+
+    def __init__(self, ges_timeline):
+        Loggable.__init__(self)
+
+        self.ges_timeline = ges_timeline
+        # The target URI of each indexed clip.
+        self.__clip_uris = {}
+        # The indexed clips by target URI.
+        self.__clips = {}
+
+        self.ges_timeline.connect("layer-added", self._layer_added_cb)
+        self.ges_timeline.connect("layer-removed", self._layer_removed_cb)
+        for ges_layer in self.ges_timeline.get_layers():
+            self._layer_added_cb(self.ges_timeline, ges_layer)
+
+    def release(self):
+        """Disconnects from the timeline."""
+        for ges_layer in self.ges_timeline.get_layers():
+            self._layer_removed_cb(self.ges_timeline, ges_layer)
+        self.ges_timeline.disconnect_by_func(self._layer_added_cb)
+        self.ges_timeline.disconnect_by_func(self._layer_removed_cb)
+
+    def get_clips(self, obj):
+        """Gets the clips using the specified asset or any of its proxies.
+
+        Args:
+            obj (GES.Asset|str): The asset or its URI.
+
+        Returns:
+            List[GES.UriClip]: The clips, in no particular order.
+        """
+        target_uri = ProxyManager.get_target_uri(obj)
+        return list(self.__clips.get(target_uri, ()))
+
+    def _layer_added_cb(self, unused_ges_timeline, ges_layer):
+        ges_layer.connect("clip-added", self._clip_added_cb)
+        ges_layer.connect("clip-removed", self._clip_removed_cb)
+        for ges_clip in ges_layer.get_clips():
+            self._clip_added_cb(ges_layer, ges_clip)
+
+    def _layer_removed_cb(self, unused_ges_timeline, ges_layer):
+        ges_layer.disconnect_by_func(self._clip_added_cb)
+        ges_layer.disconnect_by_func(self._clip_removed_cb)
+        for ges_clip in ges_layer.get_clips():
+            self._clip_removed_cb(ges_layer, ges_clip)
+
+    def _clip_added_cb(self, unused_ges_layer, ges_clip):
+        if not isinstance(ges_clip, GES.UriClip) or ges_clip in self.__clip_uris:
+            return
+
+        ges_clip.connect("notify::uri", self._clip_uri_changed_cb)
+        self.__add(ges_clip)
+
+    def _clip_removed_cb(self, unused_ges_layer, ges_clip):
+        if ges_clip not in self.__clip_uris:
+            return
+
+        ges_clip.disconnect_by_func(self._clip_uri_changed_cb)
+        self.__remove(ges_clip)
+
+    def _clip_uri_changed_cb(self, ges_clip, unused_pspec):
+        self.__remove(ges_clip)
+        self.__add(ges_clip)
+
+    def __add(self, ges_clip):
+        target_uri = ProxyManager.get_target_uri(ges_clip.props.uri)
+        self.__clip_uris[ges_clip] = target_uri
+        self.__clips.setdefault(target_uri, set()).add(ges_clip)
+
+    def __remove(self, ges_clip):
+        target_uri = self.__clip_uris.pop(ges_clip)
+        clips = self.__clips[target_uri]
+        clips.remove(ges_clip)
+        if not clips:
+            del self.__clips[target_uri]
+
+
 def get_proxy_target(obj):
     if isinstance(obj, GES.UriClip):
         asset = obj.get_asset()
@@ -0,0 +1,460 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2020, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Recording of the user actions as GstValidate scenarios."""
+import functools
+import hashlib
+import itertools
+import os
+import queue
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from gi.repository import Gst
+
+from pitivi.settings import GlobalSettings
+from pitivi.utils.loggable import Loggable
+
+GlobalSettings.add_config_section("scenarios")
+GlobalSettings.add_config_option("scenarios_max_age",
+                                 section="scenarios",
+                                 key="max-age-days",
+                                 default=30)
+GlobalSettings.add_config_option("scenarios_max_size",
+                                 section="scenarios",
+                                 key="max-size-mb",
+                                 default=500)
+
+# The min time between two actions for recording a wait, in nanoseconds.
+MIN_WAIT_DURATION = Gst.SECOND // 20
+
+# The actions merged when repeated, mapped to the fields identifying
+# the element and the kind of change being done.
+MERGED_ACTIONS_FIELDS = {
+    "edit-container": ("container-name", "edit-mode", "edge"),
+    "set-child-property": ("element-name", "property"),
+}
+
+# The subdir of the scenarios dir where the project snapshots are stored.
+SNAPSHOTS_DIR = "projects"
+
+SNAPSHOT_NAME_REGEX = re.compile(r"[0-9a-f]{64}\.xges")
+
+# The number of lines at the start of a scenario where the
+# "load-project" action is looked for.
+SCENARIO_HEADER_LINES = 3
+
+CHUNK_SIZE = 1024 * 1024
+
+# The actions which do not change the project, not journaled.
+VIEW_ACTIONS = ("play", "pause", "seek", "stop",
+                "zoom-fit", "zoom-in", "zoom-out", "set-zoom-level")
+
+
+def store_project_snapshot(project_path, scenarios_dir):
+    """Stores a copy of the project file named by the hash of its content.
+
+    The distinct project contents are stored only once.
+
+    Args:
+        project_path (str): The path of the project file.
+        scenarios_dir (str): The dir containing the scenarios.
+
+    Returns:
+        str: The path of the snapshot.
+    """
+    digest = hashlib.sha256()
+    with open(project_path, "rb") as project:
+        for chunk in iter(functools.partial(project.read, CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    snapshots_dir = os.path.join(scenarios_dir, SNAPSHOTS_DIR)
+    os.makedirs(snapshots_dir, exist_ok=True)
+    snapshot_path = os.path.join(snapshots_dir, digest.hexdigest() + ".xges")
+    if os.path.exists(snapshot_path):
+        # Mark it as recently used.
+        os.utime(snapshot_path)
+        return snapshot_path
+
+    # Copy to a temporary file first so a partial copy is never used.
+    fd, temp_path = tempfile.mkstemp(dir=snapshots_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as snapshot, open(project_path, "rb") as project:
+            shutil.copyfileobj(project, snapshot, CHUNK_SIZE)
+        os.replace(temp_path, snapshot_path)
+    except OSError:
+        os.unlink(temp_path)
+        raise
+
+    return snapshot_path
+
+
+def prune_scenarios(scenarios_dir, max_age, max_size):
+    """Removes the old scenarios and the snapshots not referenced anymore.
+
+    Args:
+        scenarios_dir (str): The dir containing the scenarios.
+        max_age (int): The max age of the scenarios to keep, in seconds.
+        max_size (int): The max total size of the scenarios and of the
+            snapshots, in bytes. The oldest scenarios are removed first.
+    """
+    scenarios = []
+    for entry in os.scandir(scenarios_dir):
+        if entry.is_file() and entry.name.endswith(".scenario"):
+            stat = entry.stat()
+            scenarios.append((stat.st_mtime, stat.st_size, entry.path))
+    scenarios.sort(reverse=True)
+
+    snapshots = {}
+    snapshots_dir = os.path.join(scenarios_dir, SNAPSHOTS_DIR)
+    if os.path.isdir(snapshots_dir):
+        for entry in os.scandir(snapshots_dir):
+            if entry.is_file() and SNAPSHOT_NAME_REGEX.fullmatch(entry.name):
+                snapshots[entry.name] = entry.stat().st_size
+
+    # Keep the most recent scenarios within the limits.
+    min_mtime = time.time() - max_age
+    total_size = 0
+    referenced = set()
+    for mtime, size, path in scenarios:
+        names = _get_referenced_snapshots(path)
+        new_names = names - referenced
+        size += sum(snapshots.get(name, 0) for name in new_names)
+        if mtime >= min_mtime and total_size + size <= max_size:
+            total_size += size
+            referenced |= new_names
+            continue
+
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    for name in snapshots.keys() - referenced:
+        try:
+            os.unlink(os.path.join(snapshots_dir, name))
+        except OSError:
+            pass
+
+
+def _get_referenced_snapshots(scenario_path):
+    try:
+        with open(scenario_path) as scenario:
+            header = "".join(itertools.islice(scenario, SCENARIO_HEADER_LINES))
+    except (OSError, UnicodeDecodeError):
+        return set()
+
+    return set(SNAPSHOT_NAME_REGEX.findall(header))
+
+
+class ScenarioRecorder(Loggable):
+    """Writes the actions to a scenario file in a background thread.
+
+    The actions are written in batches, so they are guaranteed to be on
+    the disk only after `sync` or `close`.
+
+    The consecutive "edit-container" actions on the same container, such
+    as the ones done while dragging a clip, and the consecutive
+    "set-child-property" actions on the same property are merged into
+    the last one.
+
+    Args:
+        path (str): The path of the scenario file.
+        waits (Optional[bool]): Whether to record the time passed between
+            the actions, so they are replayed at the same pace.
+    """
+
+    # The max number of writes waiting to be done by the thread.
+    QUEUE_SIZE = 1000
+
+    def __init__(self, path, waits=True):
+        Loggable.__init__(self)
+        self.path = path
+        self.waits = waits
+
+        self.__file = open(path, "w")
+        self.__queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self.__first_action = True
+        self.__last_action_time = Gst.util_get_timestamp()
+        # The wait duration and the action listed in MERGED_ACTIONS_FIELDS
+        # not written yet because they can be replaced by the next action.
+        self.__pending_edit = None
+
+        self.__thread = threading.Thread(target=self.__write_cb,
+                                         name="scenario-recorder",
+                                         daemon=True)
+        self.__thread.start()
+
+    def record(self, structure):
+        """Records an action.
+
+        Args:
+            structure (Gst.Structure): The action.
+        """
+        lines = self.__take_header()
+
+        now = Gst.util_get_timestamp()
+        wait_duration = 0
+        if self.waits and now - self.__last_action_time > MIN_WAIT_DURATION:
+            wait_duration = now - self.__last_action_time
+            self.__last_action_time = now
+
+        if self.__pending_edit:
+            pending_wait_duration, pending_structure = self.__pending_edit
+            if self.__is_same_edit(pending_structure, structure):
+                self.__pending_edit = (pending_wait_duration + wait_duration, structure)
+                return
+
+            self.__pending_edit = None
+            lines.extend(self.__format(pending_wait_duration, pending_structure))
+
+        if structure.get_name() in MERGED_ACTIONS_FIELDS:
+            self.__pending_edit = (wait_duration, structure)
+        else:
+            lines.extend(self.__format(wait_duration, structure))
+
+        if lines:
+            self.__queue.put("\n".join(lines) + "\n")
+
+    def record_project(self, project_path, scenarios_dir):
+        """Records loading the project from a snapshot of its current content.
+
+        The snapshot is stored by the writing thread, to avoid reading
+        the project file in the main thread.
+
+        Args:
+            project_path (str): The path of the project file.
+            scenarios_dir (str): The dir where the snapshot is stored.
+        """
+        self.__write_pending_edit()
+        lines = self.__take_header()
+        if lines:
+            self.__queue.put("\n".join(lines) + "\n")
+        self.__queue.put(functools.partial(self.__format_project,
+                                           project_path, scenarios_dir))
+
+    def prune_scenarios(self, scenarios_dir, max_age, max_size):
+        """Removes the old scenarios in the writing thread.
+
+        See `prune_scenarios`. The snapshots stored by the recorder
+        afterwards are not affected.
+
+        Args:
+            scenarios_dir (str): The dir containing the scenarios.
+            max_age (int): The max age of the scenarios to keep, in seconds.
+            max_size (int): The max total size of the scenarios and of the
+                snapshots, in bytes.
+        """
+        self.__queue.put(functools.partial(self.__prune_scenarios,
+                                           scenarios_dir, max_age, max_size))
+
+    def sync(self):
+        """Writes the recorded actions to the disk, blocking until done."""
+        self.__write_pending_edit()
+        written = threading.Event()
+        self.__queue.put(written)
+        written.wait()
+
+    def flush(self):
+        """Writes the recorded actions to the disk, without waiting."""
+        self.__write_pending_edit()
+        self.__queue.put(threading.Event())
+
+    def close(self):
+        """Writes the recorded actions and stops the recording."""
+        self.__write_pending_edit()
+        self.__queue.put(None)
+        self.__thread.join()
+
+    def __take_header(self):
+        if not self.__first_action:
+            return []
+
+        self.__first_action = False
+        return ["description, seek=true, handles-states=true"]
+
+    def __prune_scenarios(self, scenarios_dir, max_age, max_size):
+        try:
+            prune_scenarios(scenarios_dir, max_age, max_size)
+        except OSError as e:
+            self.warning("Failed pruning the scenarios in %s: %s", scenarios_dir, e)
+        return ""
+
+    def __format_project(self, project_path, scenarios_dir):
+        try:
+            snapshot_path = store_project_snapshot(project_path, scenarios_dir)
+        except OSError as e:
+            self.warning("Failed storing a snapshot of the project %s: %s", project_path, e)
+            return ""
+
+        structure = Gst.Structure.new_empty("load-project")
+        structure["uri"] = Gst.filename_to_uri(snapshot_path)
+        return structure.to_string() + "\n"
+
+    @staticmethod
+    def __is_same_edit(structure1, structure2):
+        if structure1.get_name() != structure2.get_name():
+            return False
+
+        fields = MERGED_ACTIONS_FIELDS[structure1.get_name()]
+        return all(structure1.has_field(field) and structure2.has_field(field) and
+                   structure1.get_value(field) == structure2.get_value(field)
+                   for field in fields)
+
+    @staticmethod
+    def __format(wait_duration, structure):
+        lines = []
+        if wait_duration:
+            wait = Gst.Structure.new_empty("wait")
+            wait["duration"] = float(wait_duration / Gst.SECOND)
+            lines.append(wait.to_string())
+        lines.append(structure.to_string())
+        return lines
+
+    def __write_pending_edit(self):
+        if not self.__pending_edit:
+            return
+
+        lines = self.__format(*self.__pending_edit)
+        self.__pending_edit = None
+        self.__queue.put("\n".join(lines) + "\n")
+
+    def __write_cb(self):
+        failed = False
+        while True:
+            items = [self.__queue.get()]
+            # Write everything available at once.
+            while True:
+                try:
+                    items.append(self.__queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            texts = []
+            for item in items:
+                if isinstance(item, str):
+                    texts.append(item)
+                    continue
+
+                if callable(item):
+                    texts.append(item())
+                    continue
+
+                failed = self.__write(texts, True, failed)
+                texts = []
+                if item is None:
+                    self.__file.close()
+                    return
+                item.set()
+
+            failed = self.__write(texts, False, failed)
+
+    def __write(self, texts, sync, failed):
+        """Writes the texts, returning whether the writing failed."""
+        if failed:
+            # The recording stopped because of a previous error.
+            return True
+
+        try:
+            if texts:
+                self.__file.write("".join(texts))
+            if sync:
+                self.__file.flush()
+                os.fsync(self.__file.fileno())
+        except OSError as e:
+            self.warning("Failed writing the scenario %s: %s", self.path, e)
+            return True
+
+        return False
+
+
+class ProjectJournal(Loggable):
+    """Journal of the operations done on a project since it has been saved.
+
+    The journal is a scenario loading the saved project and replaying the
+    operations, for recovering them after a crash. The actions are written
+    only when the operation including them is committed, so an operation
+    is either journaled entirely or not at all.
+
+    Args:
+        project_uri (str): The URI of the saved project.
+        path (str): The path of the journal file, created when the first
+            operation is committed.
+    """
+
+    def __init__(self, project_uri, path):
+        Loggable.__init__(self)
+        self.project_uri = project_uri
+        self.path = path
+
+        self.__recorder = None
+        self.__pending_actions = []
+        # Whether the journal file could not be created.
+        self.__failed = False
+
+    def record(self, structure):
+        """Records an action of the operation being done.
+
+        Args:
+            structure (Gst.Structure): The action.
+        """
+        if self.__failed or structure.get_name() in VIEW_ACTIONS:
+            return
+
+        self.__pending_actions.append(structure)
+
+    def commit(self):
+        """Writes the actions of the completed operation to the disk."""
+        if not self.__pending_actions:
+            return
+
+        if not self.__recorder:
+            # The project has to be loaded before replaying the actions.
+            load_project = Gst.Structure.new_empty("load-project")
+            load_project["uri"] = self.project_uri
+            try:
+                self.__recorder = ScenarioRecorder(self.path, waits=False)
+            except OSError as e:
+                # For example when the project is in a read-only dir.
+                self.warning("Failed creating the journal %s, disabling it: %s", self.path, e)
+                self.__failed = True
+                self.__pending_actions = []
+                return
+            self.__recorder.record(load_project)
+            self.debug("Started the journal %s", self.path)
+
+        for structure in self.__pending_actions:
+            self.__recorder.record(structure)
+        self.__pending_actions = []
+        self.__recorder.flush()
+
+    def discard(self):
+        """Stops the journaling and removes the journal file."""
+        self.__pending_actions = []
+        if not self.__recorder:
+            return
+
+        self.__recorder.close()
+        self.__recorder = None
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            self.warning("Failed removing the journal %s: %s", self.path, e)
+        else:
+            self.debug("Removed the journal %s", self.path)
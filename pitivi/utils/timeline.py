@@ -18,7 +18,6 @@
 from gi.repository import GES
 from gi.repository import GObject
 from gi.repository import Gst
-from gi.repository import Gtk
 
 from pitivi.utils.loggable import Loggable
 
@@ -36,6 +35,66 @@ class TimelineError(Exception):
     """Base Exception for errors happening in `Timeline`s or `Clip`s."""
 
 
+class FrameGrid:
+    """Quantizes timestamps to the frames of a framerate.
+
+    Does the same rational arithmetic as `GES.Timeline.get_frame_at` and
+    `GES.Timeline.get_frame_time`, without calling into GES.
+
+    Attributes:
+        framerate (Gst.Fraction): The framerate of the frames.
+        frame_duration (int): The duration of a frame in nanoseconds,
+            rounded up.
+    """
+
+    def __init__(self, framerate):
+        self.framerate = framerate
+        self.__num = framerate.num
+        self.__denom = framerate.denom * Gst.SECOND
+        self.frame_duration = self.get_frame_time(1)
+
+    def get_frame_at(self, timestamp):
+        """Gets the number of the frame displayed at the specified time.
+
+        Args:
+            timestamp (int): The time in nanoseconds.
+
+        Returns:
+            int: The frame number.
+        """
+        return timestamp * self.__num // self.__denom
+
+    def get_frame_time(self, frame):
+        """Gets the time at which the specified frame starts.
+
+        Args:
+            frame (int): The frame number.
+
+        Returns:
+            int: The time in nanoseconds.
+        """
+        return -(-frame * self.__denom // self.__num)
+
+    def snap(self, timestamp):
+        """Gets the frame boundary closest to the specified time.
+
+        Args:
+            timestamp (int): The time in nanoseconds.
+
+        Returns:
+            int: The start time of the closest frame.
+        """
+        frame = self.get_frame_at(timestamp)
+        time = self.get_frame_time(frame)
+        if timestamp == time:
+            return time
+
+        next_time = self.get_frame_time(frame + 1)
+        if abs(timestamp - next_time) < self.frame_duration / 2:
+            return next_time
+        return time
+
+
 class Selected(GObject.Object):
     """Allows keeping track of the selection status for individual elements.
 
@@ -121,14 +180,8 @@ class Selection(GObject.Object, Loggable):
         self.selected = selection
 
         for obj, selected in self.__get_selection_changes(old_selection):
+            # The clip widget updates its state when this changes.
             obj.selected.selected = selected
-            if obj.ui:
-                if selected:
-                    from pitivi.utils.ui import set_children_state_recurse
-                    set_children_state_recurse(obj.ui, Gtk.StateFlags.SELECTED)
-                else:
-                    from pitivi.utils.ui import unset_children_state_recurse
-                    unset_children_state_recurse(obj.ui, Gtk.StateFlags.SELECTED)
             for element in obj.get_children(False):
                 if isinstance(obj, (GES.BaseEffect, GES.TextOverlay)):
                     continue
@@ -291,8 +344,10 @@ class EditingContext(GObject.Object, Loggable):
 
     def finish(self):
         if self.__log_actions:
+            # The finalizing action commits the timeline.
             self.app.action_log.commit("move-clip")
-        self.timeline.get_asset().pipeline.commit_timeline()
+        else:
+            self.timeline.get_asset().pipeline.commit_timeline()
         self.timeline.ui.app.gui.editor.viewer.clip_trim_preview_finished()
 
     def set_mode(self, mode):
@@ -321,15 +376,7 @@ class EditingContext(GObject.Object, Loggable):
         self.new_priority = priority
 
         if self.with_video:
-            frame = self.timeline.get_frame_at(position)
-            time = self.timeline.get_frame_time(frame)
-            if position != time:
-                frame_dur = self.timeline.get_frame_time(1)
-                next_time = self.timeline.get_frame_time(frame + 1)
-                if abs(position - next_time) < frame_dur / 2:
-                    position = next_time
-                else:
-                    position = time
+            position = self.timeline.get_asset().frame_grid.snap(position)
 
         res = self.focus.edit([], priority, self.mode, self.edge, int(position))
         if res:
@@ -372,6 +419,10 @@ class Zoomable:
     . set_zoom_ratio
     Instance Methods
     . zoom_changed()
+
+    Only the instances overriding zoom_changed() are notified when the
+    zoom ratio changes. The clips and their previewers are laid out again
+    by the timeline, only when close to the visible area.
     """
 
     sigid = None
@@ -387,7 +438,8 @@ class Zoomable:
 
     def __init__(self):
         # FIXME: ideally we should deprecate this
-        Zoomable.add_instance(self)
+        if type(self).zoom_changed is not Zoomable.zoom_changed:
+            Zoomable.add_instance(self)
         if Zoomable.zoomratio is None:
             Zoomable.zoomratio = self.compute_zoom_ratio(self._cur_zoom)
 
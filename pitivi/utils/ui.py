@@ -192,20 +192,21 @@ EDITOR_PERSPECTIVE_CSS = """
         border: %(clip_border_width)spx solid shade(rgb(25, 25, 25), 2.5);
     }
 
-    .AudioBackground:selected,
-    .VideoBackground:selected {
+    /* Only the clip widget has the selected state, not its children. */
+    .Clip:selected .AudioBackground,
+    .Clip:selected .VideoBackground {
         border-color: rgb(132, 131, 79)
     }
 
-    .UriClip .AudioBackground:selected {
+    .UriClip:selected .AudioBackground {
         background-color: shade(rgb(60, 97, 43), 0.4);
     }
 
-    .UriClip .VideoBackground:selected {
+    .UriClip:selected .VideoBackground {
         background-color: shade(rgb(25, 25, 25), 0.4);
     }
 
-    .TitleClip .VideoBackground:selected  {
+    .TitleClip:selected .VideoBackground  {
         background-color: shade(rgb(94, 78, 102), 0.4);
     }
 
@@ -215,9 +216,9 @@ EDITOR_PERSPECTIVE_CSS = """
         opacity: 1;
      }
 
-    .VideoPreviewer:selected,
-    .AudioPreviewer:selected,
-    .TitlePreviewer:selected {
+    .Clip:selected .VideoPreviewer,
+    .Clip:selected .AudioPreviewer,
+    .Clip:selected .TitlePreviewer {
         opacity: 0.15;
     }
 
@@ -198,6 +198,24 @@ def get_edge(structure):
     return edge
 
 
+def get_clip_widget(timeline, clip):
+    """Gets the widget of the clip, scrolling to it if needed.
+
+    The widgets are created only for the clips close to the visible
+    area of the timeline.
+
+    Args:
+        timeline (GES.Timeline): The timeline containing the clip.
+        clip (GES.Clip): The clip whose widget is needed.
+
+    Returns:
+        elements.Clip: The widget of the clip, or None if it cannot be created.
+    """
+    if not clip.ui:
+        timeline.ui.hadj.set_value(Zoomable.ns_to_pixel(clip.props.start))
+    return clip.ui
+
+
 def _release_button_if_needed(scenario, timeline, container, layer_prio,
                               position, y):
     next_actions = scenario.get_actions()
@@ -221,9 +239,10 @@ def _release_button_if_needed(scenario, timeline, container, layer_prio,
         scenario.dragging = False
         x = Zoomable.ns_to_pixel_accurate(position)
         event = create_event(Gdk.EventType.BUTTON_RELEASE, button=1, x=x, y=y)
+        container_ui = get_clip_widget(timeline, container)
         with mock.patch.object(Gtk, "get_event_widget") as get_event_widget:
-            get_event_widget.return_value = container.ui
-            container.ui._button_release_event_cb(None, event)
+            get_event_widget.return_value = container_ui
+            container_ui._button_release_event_cb(None, event)
 
         if layer_prio > 0 and container.get_layer().get_priority() != layer_prio:
             scenario.report_simple(GLib.quark_from_string("scenario::execution-error"),
@@ -298,7 +317,12 @@ def edit_container_func(scenario, action):
         return 0
 
     edge = get_edge(action.structure)
-    container_ui = container.ui
+    container_ui = get_clip_widget(timeline, container)
+    if not container_ui:
+        scenario.report_simple(GLib.quark_from_string("scenario::execution-error"),
+                               "Could not create the widget of the container: %s"
+                               % action.structure["container-name"])
+        return 1
 
     set_editing_mode(timeline, scenario, action)
 
@@ -330,12 +354,12 @@ def edit_container_func(scenario, action):
 
     if not hasattr(scenario, "dragging") or scenario.dragging is False \
             or scenario.last_edge != edge:
-        event_widget = container.ui
+        event_widget = container_ui
         if isinstance(container, GES.SourceClip):
             if edge == GES.Edge.EDGE_START:
-                event_widget = container.ui.left_handle
+                event_widget = container_ui.left_handle
             elif edge == GES.Edge.EDGE_END:
-                event_widget = container.ui.right_handle
+                event_widget = container_ui.right_handle
 
         scenario.dragging = True
         event = create_event(Gdk.EventType.BUTTON_PRESS, button=1, y=y)
@@ -347,8 +371,10 @@ def edit_container_func(scenario, action):
     event = create_event(Gdk.EventType.MOTION_NOTIFY, button=1,
                          x=x, y=y, state=Gdk.ModifierType.BUTTON1_MASK)
     with mock.patch.object(Gtk, "get_event_widget") as get_event_widget:
-        get_event_widget.return_value = container.ui
+        get_event_widget.return_value = container_ui
         timeline.ui._motion_notify_event_cb(None, event)
+    # Apply the edit right away instead of on the next frame.
+    timeline.ui.flush_drag_update()
 
     GstValidate.print_action(action,
                              "Editing %s to %s in %s mode, edge: %s "
@@ -436,8 +462,15 @@ def select_clips_func(scenario, action):
     if mode:
         mode = mode.lower()
 
+    clip_ui = get_clip_widget(timeline, clip)
+    if not clip_ui:
+        scenario.report_simple(GLib.quark_from_string("scenario::execution-error"),
+                               "Could not create the widget of the clip: %s"
+                               % clip.get_name())
+        return 1
+
     if mode == "ctrl":
-        if clip.ui.get_state_flags() & Gtk.StateFlags.SELECTED:
+        if clip.selected:
             should_select = False
 
         event = create_event(Gdk.EventType.KEY_PRESS, keyval=Gdk.KEY_Control_L)
@@ -445,17 +478,17 @@ def select_clips_func(scenario, action):
 
     event = create_event(Gdk.EventType.BUTTON_RELEASE, button=1)
     with mock.patch.object(Gtk, "get_event_widget") as get_event_widget:
-        get_event_widget.return_value = clip.ui
-        clip.ui._button_release_event_cb(None, event)
+        get_event_widget.return_value = clip_ui
+        clip_ui._button_release_event_cb(None, event)
 
     selection = action.structure["selection"]
     if not selection:
         if should_select:
-            if not clip.ui.get_state_flags() & Gtk.StateFlags.SELECTED:
+            if not clip.selected:
                 scenario.report_simple(GLib.quark_from_string("scenario::execution-error"),
                                        "Clip %s should be selected but is not"
                                        % clip.get_name())
-        elif clip.ui.get_state_flags() & Gtk.StateFlags.SELECTED:
+        elif clip.selected:
             scenario.report_simple(GLib.quark_from_string("scenario::execution-error"),
                                    "Clip %s should be UNselected but is not"
                                    % clip.get_name())
@@ -463,12 +496,12 @@ def select_clips_func(scenario, action):
         for layer in timeline.get_layers():
             for clip in layer.get_clips():
                 if clip.get_name() in selection:
-                    if not clip.ui.get_state_flags() & Gtk.StateFlags.SELECTED:
+                    if not clip.selected:
                         scenario.report_simple(GLib.quark_from_string("scenario::execution-error"),
                                                "Clip %s should be selected (as defined in selection %s)"
                                                " but is not" % (selection, clip.get_name()))
                 else:
-                    if clip.ui.get_state_flags() & Gtk.StateFlags.SELECTED:
+                    if clip.selected:
                         scenario.report_simple(GLib.quark_from_string("scenario::execution-error"),
                                                "Clip %s should NOT be selected (as defined in selection %s)"
                                                " but it is" % (selection, clip.get_name()))
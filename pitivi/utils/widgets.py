@@ -1049,7 +1049,8 @@ class GstElementSettingsWidget(Gtk.Box, Loggable):
     def __get_track_element_of_same_type(self, effect):
         track_type = effect.get_track_type()
         for track_element in effect.get_parent().get_children(False):
-            if hasattr(track_element, "ui_element") and \
+            # The source has no widget when far from the visible area.
+            if getattr(track_element, "ui_element", None) and \
                     track_element.get_track_type() == track_type:
                 return track_element
         self.warning("Failed to find track element of type %s", track_type)
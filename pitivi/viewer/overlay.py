@@ -78,4 +78,4 @@ class Overlay(Gtk.DrawingArea, Loggable):
         self.queue_draw()
 
     def _commit(self):
-        self.stack.app.project_manager.current_project.pipeline.commit_timeline()
+        self.stack.app.project_manager.current_project.pipeline.commit_timeline(preview=True)
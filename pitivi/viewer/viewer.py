@@ -34,6 +34,9 @@ from pitivi.viewer.guidelines import GuidelinesPopover
 from pitivi.viewer.overlay_stack import OverlayStack
 
 
+# The min interval between two seeks in the trim preview pipeline.
+TRIM_PREVIEW_SEEK_INTERVAL_MS = 50
+
 GlobalSettings.add_config_section("viewer")
 GlobalSettings.add_config_option("viewerDocked", section="viewer",
                                  key="docked",
@@ -87,6 +90,9 @@ class ViewerContainer(Gtk.Box, Loggable):
         self.project = None
         self.trim_pipeline = None
         self.trim_pipelines_cache = collections.OrderedDict()
+        # The position to seek to when the rate limiting allows it.
+        self.__trim_seek_position = None
+        self.__trim_seek_timeout_id = 0
         self.docked = True
         self.target = None
 
@@ -582,7 +588,29 @@ class ViewerContainer(Gtk.Box, Loggable):
             self.trim_pipeline.connect("state-change", self._state_change_cb)
             self.trim_pipeline.set_simple_state(Gst.State.PAUSED)
 
+        self.__trim_preview_seek(position)
+
+    def __trim_preview_seek(self, position):
+        """Seeks the trim preview pipeline, at most once per interval.
+
+        The positions requested in the meantime are dropped, except the
+        last one, which is seeked to when the interval passes.
+        """
+        if self.__trim_seek_timeout_id:
+            self.__trim_seek_position = position
+            return
+
         self.trim_pipeline.simple_seek(position)
+        self.__trim_seek_timeout_id = GLib.timeout_add(TRIM_PREVIEW_SEEK_INTERVAL_MS,
+                                                       self.__trim_seek_timeout_cb)
+
+    def __trim_seek_timeout_cb(self):
+        self.__trim_seek_timeout_id = 0
+        position = self.__trim_seek_position
+        self.__trim_seek_position = None
+        if position is not None and self.trim_pipeline:
+            self.__trim_preview_seek(position)
+        return False
 
     def get_trim_preview_pipeline(self, uri):
         try:
@@ -616,6 +644,11 @@ class ViewerContainer(Gtk.Box, Loggable):
 
     def clip_trim_preview_finished(self):
         """Switches back to the project pipeline following a clip trimming."""
+        if self.__trim_seek_timeout_id:
+            GLib.source_remove(self.__trim_seek_timeout_id)
+            self.__trim_seek_timeout_id = 0
+        self.__trim_seek_position = None
+
         if not self.trim_pipeline:
             return
         self.target.switch_widget(self.overlay_stack)
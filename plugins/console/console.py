@@ -61,6 +61,33 @@ class PitiviNamespace(Namespace):
         """The GES.Timeline of the current project."""
         return self._app.gui.editor.timeline_ui.timeline.ges_timeline
 
+    @Namespace.shortcut
+    def undo_stats(self, count=10):
+        """Prints the statistics of the last undoable operations.
+
+        The operations are profiled only while `app.action_log.profiling`
+        is True, which can be set permanently in the "undo" section of
+        the settings file.
+
+        Args:
+            count (int): The max number of operations to show.
+        """
+        action_log = self._app.action_log
+        if not action_log:
+            print(_("No project loaded."))
+            return
+
+        if not action_log.profiling:
+            print(_("The operations are not being profiled, "
+                    "set app.action_log.profiling = True."))
+
+        for stack, stats in action_log.get_stats()[-count:]:
+            print(stack.action_group_name, stats)
+            classes = sorted(stats.actions_count_by_class.items(),
+                             key=lambda item: item[1], reverse=True)
+            for class_name, actions_count in classes:
+                print("    %s: %d" % (class_name, actions_count))
+
 
 class Console(GObject.GObject, Peas.Activatable):
     """Plugin which adds a Python console for development purposes."""
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2020, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Utilities shared by the benchmarks.
+
+The benchmarks are not part of the unit tests suite. Each module is a
+script which prints a JSON report, for example:
+
+    $ python3 -m tests.benchmarks.proxy --output proxy.json
+"""
+import json
+import platform
+import resource
+import sys
+import time
+
+from gi.repository import Gst
+
+from pitivi.configure import GITVERSION
+from pitivi.configure import VERSION
+
+# Bump when the structure of the reports changes.
+REPORT_FORMAT_VERSION = 1
+
+
+def cpu_seconds():
+    """Returns the CPU time consumed by the process, including all threads."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def reset_peak_rss():
+    """Resets the peak RSS of the process, if supported by the system.
+
+    Returns:
+        bool: Whether the peak RSS has been reset.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_kb():
+    """Returns the peak RSS of the process in KiB."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # Since the start of the process.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Timer:
+    """Measures the wall and CPU time spent in a block."""
+
+    def __init__(self):
+        self.wall_seconds = 0
+        self.cpu_seconds = 0
+        self._start_wall = 0
+        self._start_cpu = 0
+
+    def start(self):
+        self._start_wall = time.monotonic()
+        self._start_cpu = cpu_seconds()
+
+    def stop(self):
+        self.wall_seconds = time.monotonic() - self._start_wall
+        self.cpu_seconds = cpu_seconds() - self._start_cpu
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *unused_args):
+        self.stop()
+
+
+def create_report(name, parameters, results):
+    """Creates a machine-readable report of a benchmark run.
+
+    Args:
+        name (str): The name of the benchmark.
+        parameters (dict): The parameters the benchmark has been run with.
+        results (object): The JSON-serializable results.
+
+    Returns:
+        dict: The report, including the info needed to compare runs.
+    """
+    return {
+        "format": REPORT_FORMAT_VERSION,
+        "benchmark": name,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "pitivi": {"version": VERSION, "git": GITVERSION},
+        "gstreamer": Gst.version_string(),
+        "python": platform.python_version(),
+        "machine": {"system": platform.system(),
+                    "machine": platform.machine(),
+                    "processor": platform.processor()},
+        "parameters": parameters,
+        "results": results,
+    }
+
+
+def write_report(report, path=None):
+    """Writes the report as JSON to the specified file or to stdout."""
+    if path:
+        with open(path, "w") as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2020, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+r"""Benchmark of the proxy transcoding throughput.
+
+Synthetic sources are generated with videotestsrc and audiotestsrc and
+proxied headless through the real ProxyManager jobs path.
+
+Examples:
+    $ python3 -m tests.benchmarks.proxy
+    $ python3 -m tests.benchmarks.proxy --codecs h264,mjpeg --resolutions 1920x1080 \\
+          --durations 10 --jobs 1,4 --formats jpeg,prores --output proxy.json
+
+With --jobs 1 the jobs run one after the other so the CPU time and the
+peak RSS are measured per job. Otherwise they are only measured for the
+whole batch.
+"""
+# pylint: disable=protected-access
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from gi.repository import GES
+from gi.repository import GLib
+from gi.repository import Gst
+
+from pitivi.utils.proxy import ENCODING_FORMAT_JPEG
+from pitivi.utils.proxy import ENCODING_FORMAT_PRORES
+from pitivi.utils.proxy import ProxyingStrategy
+from tests import common
+from tests.benchmarks import create_report
+from tests.benchmarks import peak_rss_kb
+from tests.benchmarks import reset_peak_rss
+from tests.benchmarks import Timer
+from tests.benchmarks import write_report
+
+FRAMERATE = 30
+AUDIO_RATE = 48000
+
+# Maps a codec name to the video encoder, the audio encoder, the muxer
+# and the file extension used to generate the synthetic sources.
+SOURCE_CODECS = {
+    "h264": ("x264enc", "lamemp3enc", "mp4mux", "mp4"),
+    "vp8": ("vp8enc", "vorbisenc", "webmmux", "webm"),
+    "theora": ("theoraenc", "vorbisenc", "oggmux", "ogv"),
+    "mjpeg": ("jpegenc", "audioconvert", "qtmux", "mov"),
+    "prores": ("avenc_prores_ks", "audioconvert", "qtmux", "mov"),
+    "audio": (None, "flacenc", "matroskamux", "mka"),
+}
+
+ENCODING_FORMATS = {
+    "jpeg": ENCODING_FORMAT_JPEG,
+    "prores": ENCODING_FORMAT_PRORES,
+}
+
+
+def create_source(directory, codec, width, height, duration):
+    """Generates a synthetic media file.
+
+    Returns:
+        str: The URI of the file or None if the elements are missing.
+    """
+    video_encoder, audio_encoder, muxer, extension = SOURCE_CODECS[codec]
+    for element in (video_encoder, audio_encoder, muxer):
+        if element and not Gst.ElementFactory.find(element):
+            return None
+
+    path = os.path.join(directory, "%s-%dx%d-%ds.%s" % (codec, width, height, duration, extension))
+    num_buffers = duration * FRAMERATE
+    description = ["audiotestsrc wave=ticks num-buffers=%d samplesperbuffer=%d"
+                   " ! audio/x-raw,rate=%d ! audioconvert ! %s ! queue ! mux."
+                   % (num_buffers, AUDIO_RATE // FRAMERATE, AUDIO_RATE, audio_encoder)]
+    if video_encoder:
+        description.append("videotestsrc pattern=ball num-buffers=%d"
+                           " ! video/x-raw,width=%d,height=%d,framerate=%d/1"
+                           " ! videoconvert ! %s ! queue ! mux."
+                           % (num_buffers, width, height, FRAMERATE, video_encoder))
+    description.append("%s name=mux ! filesink location=\"%s\"" % (muxer, path))
+
+    pipeline = Gst.parse_launch(" ".join(description))
+    pipeline.set_state(Gst.State.PLAYING)
+    message = pipeline.get_bus().timed_pop_filtered(
+        Gst.CLOCK_TIME_NONE, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    pipeline.set_state(Gst.State.NULL)
+    if message.type == Gst.MessageType.ERROR:
+        error, unused_debug = message.parse_error()
+        print("Failed generating %s: %s" % (path, error), file=sys.stderr)
+        return None
+
+    return Gst.filename_to_uri(path)
+
+
+def run_batch(uris, encoding_format, num_jobs, timeout):
+    """Proxies the specified sources.
+
+    The jobs not finished when the timeout expires are cancelled and
+    reported as unfinished, without being included in the totals.
+
+    Returns:
+        dict: The measurements for the batch and for each job.
+    """
+    app = common.create_pitivi_mock(proxying_strategy=ProxyingStrategy.ALL,
+                                    num_transcoding_jobs=num_jobs)
+    manager = app.proxy_manager
+    manager._ProxyManager__encoding_target_file = encoding_format
+    manager._ProxyManager__encoding_profile = \
+        manager._ProxyManager__get_encoding_profile(encoding_format)
+    if not manager._ProxyManager__encoding_profile:
+        return None
+
+    serial = num_jobs == 1
+    assets = []
+    for uri in uris:
+        asset = GES.UriClipAsset.request_sync(uri)
+        asset.force_proxying = True
+        assets.append(asset)
+
+    jobs = {}
+    mainloop = GLib.MainLoop()
+
+    def start_job(asset):
+        jobs[asset] = {"source": os.path.basename(asset.props.id),
+                       "remuxed": manager._asset_should_be_remuxed(asset),
+                       "finished": False,
+                       "timer": Timer()}
+        if serial:
+            reset_peak_rss()
+        jobs[asset]["timer"].start()
+        manager.add_job(asset)
+
+    def job_finished(asset, proxy, error=None):
+        job = jobs[asset]
+        timer = job.pop("timer")
+        timer.stop()
+        job["finished"] = True
+        media_seconds = asset.get_duration() / Gst.SECOND
+        job["media_seconds"] = media_seconds
+        job["wall_seconds"] = timer.wall_seconds
+        job["realtime_factor"] = media_seconds / timer.wall_seconds if timer.wall_seconds else None
+        job["cpu_seconds"] = timer.cpu_seconds if serial else None
+        job["peak_rss_kb"] = peak_rss_kb() if serial else None
+        job["bytes_written"] = os.path.getsize(Gst.uri_get_location(proxy.props.id)) if proxy else 0
+        job["error"] = str(error) if error else None
+
+        if serial and pending:
+            start_job(pending.pop(0))
+        elif all(job["finished"] for job in jobs.values()):
+            mainloop.quit()
+
+    def proxy_ready_cb(unused_manager, asset, proxy):
+        job_finished(asset, proxy)
+
+    def error_preparing_asset_cb(unused_manager, asset, unused_proxy, error):
+        job_finished(asset, None, error)
+
+    manager.connect("proxy-ready", proxy_ready_cb)
+    manager.connect("error-preparing-asset", error_preparing_asset_cb)
+
+    timed_out = False
+
+    def timeout_cb():
+        nonlocal timed_out
+        timed_out = True
+        mainloop.quit()
+        return GLib.SOURCE_REMOVE
+
+    reset_peak_rss()
+    pending = list(assets)
+    with Timer() as batch_timer:
+        if serial:
+            start_job(pending.pop(0))
+        else:
+            while pending:
+                start_job(pending.pop(0))
+        timeout_id = GLib.timeout_add_seconds(timeout, timeout_cb)
+        mainloop.run()
+    if timed_out:
+        print("Batch timed out after %ds" % timeout, file=sys.stderr)
+        manager.disconnect_by_func(proxy_ready_cb)
+        manager.disconnect_by_func(error_preparing_asset_cb)
+        for asset, job in jobs.items():
+            if not job["finished"]:
+                job.pop("timer")
+                manager.cancel_job(asset)
+        # The serial jobs which did not start.
+        for asset in pending:
+            jobs[asset] = {"source": os.path.basename(asset.props.id),
+                           "finished": False}
+    else:
+        GLib.source_remove(timeout_id)
+
+    finished_jobs = [job for job in jobs.values() if job["finished"]]
+    media_seconds = sum(job["media_seconds"] for job in finished_jobs)
+    return {
+        "encoding_format": encoding_format,
+        "num_transcoding_jobs": num_jobs,
+        "timed_out": timed_out,
+        "wall_seconds": batch_timer.wall_seconds,
+        "cpu_seconds": batch_timer.cpu_seconds,
+        "peak_rss_kb": peak_rss_kb(),
+        "realtime_factor": media_seconds / batch_timer.wall_seconds,
+        "bytes_written": sum(job["bytes_written"] for job in finished_jobs),
+        "jobs": [jobs[asset] for asset in assets],
+    }
+
+
+def parse_list(value, item_type=str):
+    return [item_type(item) for item in value.split(",") if item]
+
+
+def parse_resolution(value):
+    width, height = value.split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--codecs", default="h264,vp8,mjpeg,audio",
+                        help="Comma separated list of: %s" % ", ".join(SOURCE_CODECS))
+    parser.add_argument("--resolutions", default="1280x720,1920x1080",
+                        help="Comma separated list of WIDTHxHEIGHT")
+    parser.add_argument("--durations", default="5",
+                        help="Comma separated list of durations in seconds")
+    parser.add_argument("--formats", default="jpeg",
+                        help="Comma separated list of: %s" % ", ".join(ENCODING_FORMATS))
+    parser.add_argument("--jobs", default="1,4",
+                        help="Comma separated list of num_transcoding_jobs values")
+    parser.add_argument("--timeout", type=int, default=3600,
+                        help="Max number of seconds for a batch")
+    parser.add_argument("--output", help="Path of the JSON report, stdout by default")
+    options = parser.parse_args()
+
+    codecs = parse_list(options.codecs)
+    resolutions = parse_list(options.resolutions, parse_resolution)
+    durations = parse_list(options.durations, int)
+    formats = parse_list(options.formats)
+    num_jobs_values = parse_list(options.jobs, int)
+
+    directory = tempfile.mkdtemp(prefix="pitivi-proxy-benchmark")
+    try:
+        uris = []
+        for codec in codecs:
+            # The resolution is irrelevant for the audio-only sources.
+            for width, height in resolutions if SOURCE_CODECS[codec][0] else resolutions[:1]:
+                for duration in durations:
+                    uri = create_source(directory, codec, width, height, duration)
+                    if uri:
+                        uris.append(uri)
+                    else:
+                        print("Skipping %s, elements missing" % codec, file=sys.stderr)
+
+        batches = []
+        for encoding_format in formats:
+            for num_jobs in num_jobs_values:
+                # Make sure the proxies are created again.
+                for name in os.listdir(directory):
+                    if ".proxy.mov" in name:
+                        os.remove(os.path.join(directory, name))
+                batch = run_batch(uris, ENCODING_FORMATS[encoding_format], num_jobs,
+                                  options.timeout)
+                if batch:
+                    batches.append(batch)
+                else:
+                    print("Skipping %s, not supported" % encoding_format, file=sys.stderr)
+    finally:
+        shutil.rmtree(directory)
+
+    parameters = {"codecs": codecs,
+                  "resolutions": ["%dx%d" % resolution for resolution in resolutions],
+                  "durations": durations,
+                  "formats": formats,
+                  "jobs": num_jobs_values}
+    write_report(create_report("proxy", parameters, batches), options.output)
+
+
+if __name__ == "__main__":
+    main()
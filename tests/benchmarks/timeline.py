@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2020, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the time-range queries on the timeline layers.
+
+Synthetic layers are filled with back to back clips and queried by
+scanning all the clips, as GES does, and through the clips indexes.
+
+Examples:
+    $ python3 -m tests.benchmarks.timeline
+    $ python3 -m tests.benchmarks.timeline --clips 50000 --layers 5 --output timeline.json
+"""
+import argparse
+import random
+
+from gi.repository import GES
+from gi.repository import Gst
+
+from pitivi.utils.intervaltree import LayerClipsIndex
+from tests.benchmarks import create_report
+from tests.benchmarks import Timer
+from tests.benchmarks import write_report
+
+
+def create_layers(num_clips, num_layers, clip_duration):
+    """Creates layers with back to back clips, not part of a timeline."""
+    ges_layers = []
+    for priority in range(num_layers):
+        ges_layer = GES.Layer()
+        ges_layer.props.priority = priority
+        for i in range(num_clips // num_layers):
+            ges_clip = GES.TestClip()
+            ges_clip.props.start = i * clip_duration
+            ges_clip.props.duration = clip_duration
+            ges_layer.add_clip(ges_clip)
+        ges_layers.append(ges_layer)
+    return ges_layers
+
+
+def scan_clips_at(ges_layers, position):
+    """Finds the clips at a position the way it was done before the index."""
+    found = []
+    for ges_layer in ges_layers:
+        for ges_clip in ges_layer.get_clips():
+            start = ges_clip.props.start
+            if start <= position <= start + ges_clip.props.duration:
+                found.append(ges_clip)
+    return found
+
+
+def measure(func, args_list):
+    """Runs the function with each of the arguments.
+
+    Returns:
+        dict: The measurements.
+    """
+    with Timer() as timer:
+        for args in args_list:
+            func(*args)
+    return {"wall_seconds": timer.wall_seconds,
+            "cpu_seconds": timer.cpu_seconds,
+            "microseconds_per_query": timer.wall_seconds * 1000000 / len(args_list)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--clips", type=int, default=50000,
+                        help="The total number of clips")
+    parser.add_argument("--layers", type=int, default=5,
+                        help="The number of layers the clips are spread on")
+    parser.add_argument("--queries", type=int, default=1000,
+                        help="The number of queries of each type")
+    parser.add_argument("--output", help="Path of the JSON report, stdout by default")
+    options = parser.parse_args()
+
+    clip_duration = Gst.SECOND
+    rand = random.Random(0)
+    ges_layers = create_layers(options.clips, options.layers, clip_duration)
+    duration = options.clips // options.layers * clip_duration
+
+    with Timer() as build_timer:
+        indexes = [LayerClipsIndex(ges_layer) for ges_layer in ges_layers]
+
+    positions = [(rand.randrange(duration),) for unused_i in range(options.queries)]
+    intervals = []
+    for unused_i in range(options.queries):
+        start = rand.randrange(duration)
+        intervals.append((start, start + rand.randrange(60 * Gst.SECOND)))
+
+    results = {
+        "build_index": {"wall_seconds": build_timer.wall_seconds,
+                        "cpu_seconds": build_timer.cpu_seconds},
+        "clips_at": {
+            "scan": measure(lambda position: scan_clips_at(ges_layers, position),
+                            positions),
+            "index": measure(lambda position: [index.get_clips_at(position)
+                                               for index in indexes],
+                             positions),
+        },
+        "clips_in_interval": {
+            "scan": measure(lambda start, end: [ges_layer.get_clips_in_interval(start, end)
+                                                for ges_layer in ges_layers],
+                            intervals),
+            "index": measure(lambda start, end: [index.get_clips_in_interval(start, end)
+                                                 for index in indexes],
+                             intervals),
+        },
+    }
+
+    # Move clips around, as when editing, to measure the cost of keeping
+    # the indexes up to date.
+    ges_clips = [ges_clip for ges_layer in ges_layers for ges_clip in ges_layer.get_clips()]
+    moves = [(rand.choice(ges_clips), rand.randrange(duration))
+             for unused_i in range(options.queries)]
+
+    def move(ges_clip, start):
+        ges_clip.props.start = start
+
+    results["move_clip"] = measure(move, moves)
+
+    parameters = {"clips": options.clips,
+                  "layers": options.layers,
+                  "queries": options.queries}
+    write_report(create_report("timeline", parameters, results), options.output)
+
+
+if __name__ == "__main__":
+    main()
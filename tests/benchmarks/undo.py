@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2020, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the observation of the timeline by the undo system.
+
+A synthetic timeline is observed eagerly, as when loading a project
+before the observation became lazy, and lazily. For the lazy observation
+the time needed by the first operation to connect to the clips is also
+measured.
+
+Examples:
+    $ python3 -m tests.benchmarks.undo
+    $ python3 -m tests.benchmarks.undo --clips 20000 --layers 5 --output undo.json
+"""
+import argparse
+
+from gi.repository import GES
+from gi.repository import Gst
+
+from pitivi.undo.timeline import TimelineObserver
+from pitivi.undo.undo import UndoableActionLog
+from tests.benchmarks import create_report
+from tests.benchmarks import peak_rss_kb
+from tests.benchmarks import reset_peak_rss
+from tests.benchmarks import Timer
+from tests.benchmarks import write_report
+
+
+def create_timeline(num_clips, num_layers):
+    """Creates a timeline with back to back clips."""
+    ges_timeline = GES.Timeline.new_audio_video()
+    for unused_i in range(num_layers):
+        ges_layer = ges_timeline.append_layer()
+        for i in range(num_clips // num_layers):
+            ges_clip = GES.TestClip()
+            ges_clip.props.start = i * Gst.SECOND
+            ges_clip.props.duration = Gst.SECOND
+            ges_layer.add_clip(ges_clip)
+    return ges_timeline
+
+
+def measure_observation(num_clips, num_layers, lazy):
+    """Measures the observation of a new timeline.
+
+    Returns:
+        dict: The measurements.
+    """
+    ges_timeline = create_timeline(num_clips, num_layers)
+    action_log = UndoableActionLog()
+
+    rss_reset = reset_peak_rss()
+    rss_before_kb = peak_rss_kb()
+    with Timer() as load_timer:
+        unused_observer = TimelineObserver(ges_timeline, action_log, lazy=lazy)
+    results = {"load": {"wall_seconds": load_timer.wall_seconds,
+                        "cpu_seconds": load_timer.cpu_seconds}}
+
+    # The first operation connects to the clips not observed yet.
+    with Timer() as begin_timer:
+        action_log.begin("benchmark")
+    action_log.rollback()
+    results["first_operation"] = {"wall_seconds": begin_timer.wall_seconds,
+                                  "cpu_seconds": begin_timer.cpu_seconds}
+    if rss_reset:
+        results["peak_rss_increase_kb"] = peak_rss_kb() - rss_before_kb
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--clips", type=int, default=20000,
+                        help="The total number of clips")
+    parser.add_argument("--layers", type=int, default=5,
+                        help="The number of layers the clips are spread on")
+    parser.add_argument("--output", help="Path of the JSON report, stdout by default")
+    options = parser.parse_args()
+
+    results = {
+        "eager": measure_observation(options.clips, options.layers, lazy=False),
+        "lazy": measure_observation(options.clips, options.layers, lazy=True),
+    }
+
+    parameters = {"clips": options.clips,
+                  "layers": options.layers}
+    write_report(create_report("undo", parameters, results), options.output)
+
+
+if __name__ == "__main__":
+    main()
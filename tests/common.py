@@ -48,6 +48,7 @@ from pitivi.utils.loggable import Loggable
 from pitivi.utils.misc import path_from_uri
 from pitivi.utils.proxy import ProxyingStrategy
 from pitivi.utils.proxy import ProxyManager
+from pitivi.utils.proxy import TranscodingThroughputModel
 from pitivi.utils.timeline import Selected
 from pitivi.utils.timeline import Zoomable
 
@@ -94,7 +95,9 @@ def create_pitivi_mock(**settings):
     app.write_action = mock.MagicMock(spec=Pitivi.write_action)
     app.settings = __create_settings(**settings)
     app.gui.editor.editor_state = EditorState(app.project_manager)
-    app.proxy_manager = ProxyManager(app)
+    # Keep the learned transcoding throughput only in memory, so the
+    # tests do not depend on each other.
+    app.proxy_manager = ProxyManager(app, throughput=TranscodingThroughputModel())
 
     app.gui.editor.viewer.action_group = Gio.SimpleActionGroup()
 
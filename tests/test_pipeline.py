@@ -22,6 +22,9 @@ from gi.repository import GES
 from gi.repository import GLib
 from gi.repository import Gst
 
+from pitivi.undo.timeline import CommitTimelineFinalizingAction
+from pitivi.undo.undo import UndoableAction
+from pitivi.undo.undo import UndoableActionLog
 from pitivi.utils.pipeline import MAX_RECOVERIES
 from pitivi.utils.pipeline import Pipeline
 from pitivi.utils.pipeline import SimplePipeline
@@ -153,3 +156,72 @@ class TestPipeline(common.TestCase):
                         pipe.commit_timeline()
                         self.assertEqual(commit.call_count, 0)
                 self.assertEqual(commit.call_count, 1)
+
+    def test_commits_coalesced(self):
+        """Checks the commits are merged during an operation."""
+        pipe = Pipeline(common.create_pitivi_mock())
+        timeline = GES.Timeline()
+        pipe.set_timeline(timeline)
+        action_log = UndoableActionLog()
+        pipe.set_action_log(action_log)
+        mainloop = common.create_main_loop()
+
+        with mock.patch.object(pipe, "get_state") as get_state:
+            get_state.return_value = (0, Gst.State.PAUSED, 0)
+            with mock.patch.object(timeline, "commit") as commit:
+                with action_log.started("op",
+                                        finalizing_action=CommitTimelineFinalizingAction(pipe)):
+                    action_log.push(mock.Mock(spec=UndoableAction))
+                    for unused_i in range(3):
+                        pipe.commit_timeline()
+                    self.assertEqual(commit.call_count, 0)
+                self.assertEqual(commit.call_count, 1)
+                self.assertEqual(pipe.commits_count, 1)
+
+                # The pending idle commit has been removed.
+                mainloop.run(until_empty=True)
+                self.assertEqual(pipe.commits_count, 1)
+
+                action_log.undo()
+                self.assertEqual(pipe.commits_count, 2)
+                action_log.redo()
+                self.assertEqual(pipe.commits_count, 3)
+
+                action_log.begin("rolled back")
+                pipe.commit_timeline()
+                action_log.rollback()
+                self.assertEqual(pipe.commits_count, 3)
+                mainloop.run(until_empty=True)
+                self.assertEqual(pipe.commits_count, 4)
+
+                for unused_i in range(3):
+                    pipe.queue_commit_timeline()
+                self.assertEqual(pipe.commits_count, 4)
+                mainloop.run(until_empty=True)
+                self.assertEqual(pipe.commits_count, 5)
+                self.assertEqual(commit.call_count, 5)
+
+                pipe.set_action_log(None)
+                pipe.commit_timeline()
+                self.assertEqual(pipe.commits_count, 6)
+
+    def test_preview_commits(self):
+        """Checks the preview commits are not deferred."""
+        pipe = Pipeline(common.create_pitivi_mock())
+        timeline = GES.Timeline()
+        pipe.set_timeline(timeline)
+        action_log = UndoableActionLog()
+        pipe.set_action_log(action_log)
+
+        with mock.patch.object(pipe, "get_state") as get_state:
+            get_state.return_value = (0, Gst.State.PAUSED, 0)
+            with mock.patch.object(timeline, "commit"):
+                with action_log.started("drag"):
+                    pipe.commit_timeline()
+                    self.assertEqual(pipe.commits_count, 0)
+                    pipe.commit_timeline(preview=True)
+                    self.assertEqual(pipe.commits_count, 1)
+                    pipe.commit_timeline(preview=True)
+                    self.assertEqual(pipe.commits_count, 2)
+                # The deferred commit has been included in the preview ones.
+                self.assertEqual(pipe.commits_count, 2)
@@ -239,6 +239,38 @@ class TestProjectManager(common.TestCase):
         uri = "file:///tmp/x.xges"
         self.assertEqual(uri + "~", self.manager._make_backup_uri(uri))
 
+    def test_make_journal_uri(self):
+        uri = "file:///tmp/x.xges"
+        self.assertEqual(uri + ".journal.scenario", self.manager._make_journal_uri(uri))
+
+    def test_try_using_journal(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "x.xges")
+            uri = Gst.filename_to_uri(path)
+            journal_path = self.manager._make_journal_uri(path)
+            backup_path = self.manager._make_backup_uri(path)
+            for file_path in (path, journal_path, backup_path):
+                with open(file_path, "w"):
+                    pass
+
+            with mock.patch("pitivi.project.has_validate", True), \
+                    mock.patch.object(self.manager, "_restore_from_journal_dialog") as dialog:
+                dialog.return_value = True
+                # The journal is offered when it's at least as recent as the backup.
+                os.utime(backup_path, (1000, 1000))
+                os.utime(journal_path, (2000, 2000))
+                self.assertEqual(self.manager._try_using_journal(uri),
+                                 self.manager._make_journal_uri(uri))
+                self.assertTrue(os.path.exists(journal_path))
+
+                # The backup is used when newer, as it contains all the changes.
+                dialog.reset_mock()
+                os.utime(backup_path, (3000, 3000))
+                self.assertEqual(self.manager._try_using_journal(uri), uri)
+                dialog.assert_not_called()
+                self.assertFalse(os.path.exists(journal_path))
+                self.assertTrue(os.path.exists(backup_path))
+
     def test_backup_project(self):
         self.manager.new_blank_project()
 
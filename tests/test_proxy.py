@@ -16,10 +16,15 @@
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
 """Tests for the utils.proxy module."""
 # pylint: disable=protected-access
+import contextlib
+import tempfile
 from unittest import mock
 
 from gi.repository import GES
+from gi.repository import Gst
 
+from pitivi.utils.proxy import AssetClipsIndex
+from pitivi.utils.proxy import TranscodingThroughputModel
 from tests import common
 
 
@@ -144,3 +149,234 @@ class TestProxyManager(common.TestCase):
                 matches.return_value = True
                 self.assertTrue(manager.asset_can_be_proxied(video, scaled=True))
                 self.assertTrue(manager.asset_can_be_proxied(video))
+
+    def test_asset_can_be_remuxed(self):
+        """Checks the _asset_can_be_remuxed method."""
+        app = common.create_pitivi_mock()
+        manager = app.proxy_manager
+
+        uri = common.get_sample_uri("1sec_simpsons_trailer.mp4")
+        asset = GES.UriClipAsset.request_sync(uri)
+        self.assertTrue(manager._asset_can_be_remuxed(asset))
+
+        # No video stream.
+        uri = common.get_sample_uri("mp3_sample.mp3")
+        asset = GES.UriClipAsset.request_sync(uri)
+        self.assertFalse(manager._asset_can_be_remuxed(asset))
+
+        # The Vorbis audio cannot be stored in the remux container.
+        uri = common.get_sample_uri("tears_of_steel.webm")
+        asset = GES.UriClipAsset.request_sync(uri)
+        self.assertFalse(manager._asset_can_be_remuxed(asset))
+
+    def test_asset_should_be_remuxed(self):
+        """Checks the remuxing is preferred only for editing friendly codecs."""
+        app = common.create_pitivi_mock()
+        manager = app.proxy_manager
+
+        def check(codec, force_proxying, scaled, expected):
+            asset = mock.Mock()
+            asset.force_proxying = force_proxying
+            stream = mock.Mock()
+            asset.get_info().get_video_streams.return_value = [stream]
+            stream.get_caps().get_structure(0).get_name.return_value = codec
+            self.assertEqual(manager._asset_should_be_remuxed(asset, scaled), expected,
+                             (codec, force_proxying, scaled))
+
+        with mock.patch.object(manager, "_asset_can_be_remuxed", return_value=True):
+            check("video/x-prores", False, False, True)
+            check("video/x-prores", True, False, True)
+            check("video/x-prores", False, True, False)
+            check("video/x-h264", False, False, True)
+            check("video/x-h264", True, False, False)
+
+        with mock.patch.object(manager, "_asset_can_be_remuxed", return_value=False):
+            check("video/x-prores", False, False, False)
+
+    @contextlib.contextmanager
+    def _mocked_transcoders(self, manager):
+        """Mocks the elements used for creating transcoders."""
+        def new_full(src_uri, dest_uri, *unused_args):
+            transcoder = mock.Mock()
+            transcoder.props.src_uri = src_uri
+            transcoder.props.dest_uri = dest_uri
+            return transcoder
+
+        with mock.patch("pitivi.utils.proxy.GstTranscoder") as gst_transcoder, \
+                mock.patch("pitivi.utils.proxy.Gio.File") as gio, \
+                mock.patch("pitivi.utils.proxy.Gst.ElementFactory.make"), \
+                mock.patch.object(manager, "get_proxy_uri") as get_proxy_uri, \
+                mock.patch.object(manager, "_scale_asset_resolution") as s_res, \
+                mock.patch.object(manager, "_ProxyManager__get_encoding_profile"), \
+                mock.patch.object(manager, "_asset_should_be_remuxed", return_value=False), \
+                mock.patch.object(manager.throughput, "save"):
+            gst_transcoder.Transcoder.new_full.side_effect = new_full
+            gio.new_for_uri().query_exists.return_value = False
+            get_proxy_uri.side_effect = lambda asset, scaled=False: \
+                asset.props.id + (".scaledproxy.mov" if scaled else ".proxy.mov")
+            s_res.return_value = (1280, 720)
+            yield gst_transcoder.Transcoder.new_full
+
+    def _create_asset_mock(self, uri, duration=0):
+        asset = mock.Mock()
+        asset.props.id = uri
+        asset.get_id.return_value = uri
+        asset.get_duration.return_value = duration
+        asset.get_info().get_video_streams.return_value = []
+        asset.get_info().get_audio_streams.return_value = []
+        return asset
+
+    def test_jobs_registry(self):
+        """Checks the queued jobs are indexed by source URI and kind."""
+        app = common.create_pitivi_mock(num_transcoding_jobs=1)
+        manager = app.proxy_manager
+
+        asset = self._create_asset_mock("file:///home/file.name.mp4")
+        other_asset = self._create_asset_mock("file:///home/other.mp4")
+
+        with self._mocked_transcoders(manager) as new_full:
+            manager._ProxyManager__create_transcoder(asset, scaled=True)
+            self.assertTrue(manager.is_asset_queued(asset))
+            self.assertTrue(manager.is_asset_queued(asset, optimisation=False))
+            self.assertFalse(manager.is_asset_queued(asset, scaling=False))
+            self.assertFalse(manager.is_asset_queued(other_asset))
+
+            manager._ProxyManager__create_transcoder(asset, shadow=True)
+            self.assertTrue(manager.is_asset_queued(asset, scaling=False))
+
+        scaled, shadow = [call[0] for call in new_full.call_args_list]
+        scaled_transcoder = manager._ProxyManager__jobs[(scaled[0], "scaled")]
+        shadow_transcoder = manager._ProxyManager__jobs[(shadow[0], "shadow")]
+        self.assertFalse(manager._is_shadow_transcoder(scaled_transcoder))
+        self.assertTrue(manager._is_shadow_transcoder(shadow_transcoder))
+        self.assertIs(manager._get_second_transcoder(scaled_transcoder), shadow_transcoder)
+        self.assertIs(manager._get_second_transcoder(shadow_transcoder), scaled_transcoder)
+
+        manager.cancel_job(asset)
+        self.assertFalse(manager.is_asset_queued(asset))
+        self.assertIsNone(manager._get_second_transcoder(scaled_transcoder))
+
+    def test_remux_without_filters(self):
+        """Checks the remuxing jobs do not depend on the preview filters."""
+        asset = self._create_asset_mock("file:///home/file.mov")
+        for remux in (False, True):
+            manager = common.create_pitivi_mock().proxy_manager
+            with self._mocked_transcoders(manager), \
+                    mock.patch.object(manager, "_asset_should_be_remuxed", return_value=remux), \
+                    mock.patch.object(manager, "_ProxyManager__get_remux_profile"), \
+                    mock.patch("pitivi.utils.proxy.Gst.ElementFactory.make") as make:
+                manager._ProxyManager__create_transcoder(asset)
+                transcoder = manager._ProxyManager__jobs[(asset.props.id, "hq")]
+                transcoder.set_avoid_reencoding.assert_called_once_with(remux)
+                factories = [call[0][0] for call in make.call_args_list]
+                if remux:
+                    self.assertNotIn("teedthumbnailbin", factories)
+                    self.assertNotIn("waveformbin", factories)
+                else:
+                    self.assertIn("teedthumbnailbin", factories)
+                    self.assertIn("waveformbin", factories)
+
+    def test_shortest_job_first(self):
+        """Checks the pending jobs estimated to be the shortest start first."""
+        app = common.create_pitivi_mock(num_transcoding_jobs=1)
+        manager = app.proxy_manager
+
+        assets = [self._create_asset_mock("file:///home/%d.mp4" % seconds, seconds * Gst.SECOND)
+                  for seconds in (30, 10, 20, 5)]
+        with self._mocked_transcoders(manager):
+            for asset in assets:
+                manager._ProxyManager__create_transcoder(asset)
+        # The 5 seconds asset is cancelled while pending.
+        manager.cancel_job(assets[3])
+
+        started = []
+        while True:
+            transcoder = manager._ProxyManager__pop_pending_transcoder()
+            if not transcoder:
+                break
+            started.append(transcoder.props.src_uri)
+        self.assertListEqual(started, ["file:///home/10.mp4", "file:///home/20.mp4"])
+        self.assertEqual(manager._ProxyManager__pending_seconds, 0)
+
+
+class TestTranscodingThroughputModel(common.TestCase):
+    """Tests for the TranscodingThroughputModel class."""
+
+    def test_estimate(self):
+        """Checks the realtime factors are learned and persisted."""
+        with tempfile.NamedTemporaryFile() as temp_file:
+            model = TranscodingThroughputModel(temp_file.name)
+            # Nothing learned yet.
+            self.assertEqual(model.estimate("hq:video/x-h264:fhd", 10), 10)
+
+            model.record("hq:video/x-h264:fhd", 10, 5)
+            self.assertEqual(model.estimate("hq:video/x-h264:fhd", 10), 5)
+            # The factors learned for the same kind of jobs are used.
+            self.assertEqual(model.estimate("hq:video/x-h265:uhd", 10), 5)
+            # The observed rate of a running job is trusted gradually.
+            self.assertAlmostEqual(model.estimate("hq:video/x-h264:fhd", 10, 4, 4), 6 / 1.6)
+            self.assertEqual(model.estimate("hq:video/x-h264:fhd", 10, 5, 10), 10)
+
+            model.record("hq:video/x-h264:fhd", 10, 10)
+            factor = 2 + model.SMOOTHING * (1 - 2)
+            self.assertAlmostEqual(model.get_realtime_factor("hq:video/x-h264:fhd"), factor)
+
+            model = TranscodingThroughputModel(temp_file.name)
+            self.assertAlmostEqual(model.get_realtime_factor("hq:video/x-h264:fhd"), factor)
+
+    def test_in_memory(self):
+        """Checks the realtime factors are not persisted without a path."""
+        with mock.patch("builtins.open") as open_mock:
+            model = TranscodingThroughputModel()
+            model.record("hq:video/x-h264:fhd", 10, 5)
+            self.assertEqual(model.estimate("hq:video/x-h264:fhd", 10), 5)
+        open_mock.assert_not_called()
+
+    def test_get_job_class(self):
+        """Checks the jobs are classified by kind, codec and resolution."""
+        uri = common.get_sample_uri("tears_of_steel.webm")
+        asset = GES.UriClipAsset.request_sync(uri)
+        self.assertTrue(TranscodingThroughputModel.get_job_class(asset, "scaled")
+                        .startswith("scaled:video/x-vp8:"))
+
+        uri = common.get_sample_uri("mp3_sample.mp3")
+        asset = GES.UriClipAsset.request_sync(uri)
+        self.assertEqual(TranscodingThroughputModel.get_job_class(asset, "hq"),
+                         "hq:audio/mpeg:audio")
+
+
+class TestAssetClipsIndex(common.TestCase):
+    """Tests for the AssetClipsIndex class."""
+
+    def test_index(self):
+        """Checks the index follows the clips added, moved and removed."""
+        ges_timeline = GES.Timeline.new_audio_video()
+        layer1 = ges_timeline.append_layer()
+        uri = common.get_sample_uri("tears_of_steel.webm")
+        asset = GES.UriClipAsset.request_sync(uri)
+        clip1 = layer1.add_asset(asset, 0, 0, Gst.SECOND, GES.TrackType.UNKNOWN)
+
+        index = AssetClipsIndex(ges_timeline)
+        self.assertListEqual(index.get_clips(asset), [clip1])
+        self.assertListEqual(index.get_clips(uri), [clip1])
+        self.assertListEqual(index.get_clips(uri + ".123.proxy.mov"), [clip1])
+
+        layer2 = ges_timeline.append_layer()
+        clip2 = layer2.add_asset(asset, 0, 0, Gst.SECOND, GES.TrackType.UNKNOWN)
+        title_clip = GES.TitleClip()
+        title_clip.props.duration = Gst.SECOND
+        layer2.add_clip(title_clip)
+        self.assertSetEqual(set(index.get_clips(asset)), {clip1, clip2})
+
+        clip1.move_to_layer(layer2)
+        self.assertSetEqual(set(index.get_clips(asset)), {clip1, clip2})
+
+        layer2.remove_clip(clip2)
+        self.assertListEqual(index.get_clips(asset), [clip1])
+
+        ges_timeline.remove_layer(layer2)
+        self.assertListEqual(index.get_clips(asset), [])
+
+        index.release()
+        layer1.add_asset(asset, 0, 0, Gst.SECOND, GES.TrackType.UNKNOWN)
+        self.assertListEqual(index.get_clips(asset), [])
@@ -22,12 +22,14 @@ from gi.overrides import GObject
 from gi.repository import Gdk
 from gi.repository import GES
 from gi.repository import Gst
+from gi.repository import GstController
 from gi.repository import Gtk
 from matplotlib.backend_bases import MouseEvent
 from tests import common
 from tests.test_timeline_timeline import BaseTestTimeline
 
 from pitivi.timeline.elements import GES_TYPE_UI_TYPE
+from pitivi.timeline.elements import KeyframeCurveRenderer
 from pitivi.undo.undo import UndoableActionLog
 from pitivi.utils.timeline import Zoomable
 
@@ -197,12 +199,111 @@ class TestKeyframeCurve(BaseTestTimeline):
             values = [item.timestamp for item in control_source.get_all()]
             self.assertNotIn(inpoint + offset, values)
 
+    def test_drag_commits(self):
+        """Checks the timeline is committed on each motion while dragging."""
+        timeline_container = common.create_timeline_container()
+        timeline_container.app.action_log = UndoableActionLog()
+        timeline = timeline_container.timeline
+        ges_layer = timeline.ges_timeline.append_layer()
+        ges_clip = self.add_clip(ges_layer, 0, duration=Gst.SECOND)
+        timeline.selection.select([ges_clip])
+
+        ges_video_source = ges_clip.find_track_element(None, GES.VideoSource)
+        keyframe_curve = ges_video_source.ui.keyframe_curve
+        pipeline = timeline.ges_timeline.get_parent()
+
+        # Drag the curve line between the two edge keyframes.
+        xdata = Gst.SECOND / 2
+        x, y = keyframe_curve._ax.transData.transform((xdata, 1))
+        event = MouseEvent(name="button_press_event", canvas=keyframe_curve,
+                           x=x, y=y, button=1)
+        with mock.patch.object(pipeline, "commit_timeline") as commit_timeline, \
+                mock.patch.object(timeline, "get_window"):
+            keyframe_curve._mpl_button_press_event_cb(event)
+            for ydata in (0.8, 0.5):
+                commit_timeline.reset_mock()
+                x, y = keyframe_curve._ax.transData.transform((xdata, ydata))
+                event = MouseEvent(name="motion_notify_event", canvas=keyframe_curve,
+                                   x=x, y=y)
+                keyframe_curve._mpl_motion_event_cb(event)
+                commit_timeline.assert_called_with(preview=True)
+
     def test_no_clip_selected(self):
         """Checks nothing happens when no clip is selected."""
         timeline_container = common.create_timeline_container()
         # Make sure this does not raise any exception
         timeline_container._keyframe_cb(None, None)
 
+    def test_editor_lifetime(self):
+        """Checks the keyframe curve exists only for the selected clip."""
+        timeline_container = common.create_timeline_container()
+        timeline = timeline_container.timeline
+        ges_layer = timeline.ges_timeline.append_layer()
+        ges_clip1 = self.add_clip(ges_layer, 0, duration=Gst.SECOND)
+        ges_clip2 = self.add_clip(ges_layer, Gst.SECOND, duration=Gst.SECOND)
+        ges_source1 = ges_clip1.find_track_element(None, GES.VideoSource)
+        ges_source2 = ges_clip2.find_track_element(None, GES.VideoSource)
+        self.assertIsNone(ges_source1.ui.keyframe_curve)
+        self.assertIsNone(ges_source2.ui.keyframe_curve)
+
+        timeline.selection.select([ges_clip1])
+        self.assertIsNotNone(ges_source1.ui.keyframe_curve)
+        self.assertIsNone(ges_source2.ui.keyframe_curve)
+
+        timeline.selection.select([ges_clip2])
+        self.assertIsNone(ges_source1.ui.keyframe_curve)
+        self.assertIsNotNone(ges_source2.ui.keyframe_curve)
+
+        timeline.selection.select([ges_clip1, ges_clip2])
+        self.assertIsNone(ges_source1.ui.keyframe_curve)
+        self.assertIsNone(ges_source2.ui.keyframe_curve)
+
+
+class TestKeyframeCurveRenderer(BaseTestTimeline):
+    """Tests for the KeyframeCurveRenderer class."""
+
+    def test_points(self):
+        """Checks the curve points computed from the control source."""
+        timeline_container = common.create_timeline_container()
+        timeline = timeline_container.timeline
+        ges_layer = timeline.ges_timeline.append_layer()
+        ges_clip = self.add_clip(ges_layer, 0, duration=Gst.SECOND)
+        ges_video_source = ges_clip.find_track_element(None, GES.VideoSource)
+        binding = ges_video_source.get_control_binding("alpha")
+        control_source = binding.props.control_source
+        widget = mock.Mock()
+        renderer = KeyframeCurveRenderer(binding, widget)
+
+        # The default curve is a flat line at the max value.
+        self.assertFalse(renderer.has_keyframes())
+        line, keyframes = renderer.get_points(100, 52)
+        self.assertEqual(line, [(0, 1), (100, 1)])
+        self.assertEqual(keyframes, line)
+        self.assertEqual(renderer.get_points(100, 0), ([], []))
+
+        control_source.set(Gst.SECOND // 2, 0.0)
+        widget.queue_draw.assert_called()
+        self.assertTrue(renderer.has_keyframes())
+        line, keyframes = renderer.get_points(100, 52)
+        self.assertEqual(line, [(0, 1), (50, 51), (100, 1)])
+
+        # The non-linear curves are sampled.
+        control_source.props.mode = GstController.InterpolationMode.CUBIC
+        line, keyframes = renderer.get_points(100, 52)
+        self.assertEqual(keyframes, [(0, 1), (50, 51), (100, 1)])
+        self.assertGreater(len(line), 20)
+        self.assertEqual(line[0], (0, 1))
+        self.assertEqual(line[-1], (100, 1))
+
+        # Only the visible part is sampled.
+        line, keyframes = renderer.get_points(100, 52, 40, 60)
+        self.assertLess(len(line), 10)
+
+        renderer.release()
+        widget.reset_mock()
+        control_source.set(Gst.SECOND // 4, 0.0)
+        widget.queue_draw.assert_not_called()
+
 
 class TestVideoSource(BaseTestTimeline):
     """Tests for the VideoSource class."""
@@ -17,10 +17,13 @@
 from unittest import mock
 
 from gi.repository import GES
+from gi.repository import Gtk
 
+from pitivi.timeline.elements import VIEWPORT_MARGIN
 from pitivi.timeline.layer import AUDIO_ICONS
 from pitivi.timeline.layer import Layer
 from pitivi.timeline.layer import VIDEO_ICONS
+from pitivi.utils.timeline import Zoomable
 from tests import common
 
 
@@ -159,3 +162,108 @@ class TestLayer(common.TestCase):
         # height of layer.control_ui, which now it should not be set.
         self.assertFalse(hasattr(ges_layer, "control_ui"))
         unused_layer = Layer(ges_layer, timeline)
+
+    def test_viewport(self):
+        """Checks the widgets are created only for the clips close to the visible area."""
+        timeline_container = common.create_timeline_container()
+        timeline = timeline_container.timeline
+        ges_layer = timeline.ges_timeline.append_layer()
+        asset = GES.UriClipAsset.request_sync(
+            common.get_sample_uri("flat_colour1_640x480.png"))
+        far = Zoomable.pixel_to_ns(10 * VIEWPORT_MARGIN)
+        ges_clips = [ges_layer.add_asset(asset, i * far, 0, Zoomable.pixel_to_ns(10),
+                                         GES.TrackType.VIDEO)
+                     for i in range(3)]
+        layer = ges_layer.ui
+
+        def realized():
+            return [bool(ges_clip.ui) for ges_clip in ges_clips]
+
+        # The visible area is not known yet.
+        layer.set_viewport(0, 0)
+        self.assertEqual(realized(), [True, True, True])
+
+        width = VIEWPORT_MARGIN
+        layer.set_viewport(0, width)
+        self.assertEqual(realized(), [True, False, False])
+        self.assertEqual(len(layer._children), 1)
+        # The other clips are kept in the index.
+        self.assertEqual(layer.clips_index.get_clips_in_interval(0, 3 * far), ges_clips)
+
+        layer.set_viewport(Zoomable.ns_to_pixel(2 * far), width)
+        self.assertEqual(realized(), [False, False, True])
+
+        # Clips moved close to the visible area get a widget.
+        ges_clips[1].props.start = 2 * far - Zoomable.pixel_to_ns(VIEWPORT_MARGIN / 2)
+        self.assertEqual(realized(), [False, True, True])
+        # Clips moved far from the visible area lose it.
+        ges_clips[1].props.start = far
+        self.assertEqual(realized(), [False, False, True])
+
+    def test_widgets_recreated(self):
+        """Checks the state of the clips survives their widgets."""
+        timeline_container = common.create_timeline_container()
+        timeline = timeline_container.timeline
+        ges_layer = timeline.ges_timeline.append_layer()
+        asset = GES.UriClipAsset.request_sync(
+            common.get_sample_uri("flat_colour1_640x480.png"))
+        ges_clip = ges_layer.add_asset(asset, 0, 0, Zoomable.pixel_to_ns(10),
+                                       GES.TrackType.VIDEO)
+        video_source = ges_clip.find_track_element(None, GES.VideoSource)
+        selected = ges_clip.selected
+        layer = ges_layer.ui
+        width = VIEWPORT_MARGIN
+        layer.set_viewport(0, width)
+
+        # The widget of the selected clip is kept.
+        timeline.selection.select([ges_clip])
+        layer.set_viewport(10 * VIEWPORT_MARGIN, width)
+        self.assertIsNotNone(ges_clip.ui)
+
+        timeline.selection.select([])
+        layer.set_viewport(11 * VIEWPORT_MARGIN, width)
+        self.assertIsNone(ges_clip.ui)
+        self.assertIsNone(video_source.ui)
+
+        # Changes done while the clip has no widget.
+        timeline.selection.select([ges_clip])
+        video_source.set_child_property("posx", 10)
+        default_position = video_source.positioner.default_position
+
+        layer.set_viewport(0, width)
+        self.assertIs(ges_clip.selected, selected)
+        self.assertTrue(ges_clip.ui.get_state_flags() & Gtk.StateFlags.SELECTED)
+        self.assertEqual(video_source.ui.default_position, default_position)
+        self.assertEqual(video_source.get_child_property("posx")[1], 10)
+
+    def test_zoom_relayout(self):
+        """Checks only the clips close to the visible area are laid out on zoom."""
+        timeline_container = common.create_timeline_container()
+        timeline = timeline_container.timeline
+        ges_layer = timeline.ges_timeline.append_layer()
+        asset = GES.UriClipAsset.request_sync(
+            common.get_sample_uri("flat_colour1_640x480.png"))
+        far = Zoomable.pixel_to_ns(10 * VIEWPORT_MARGIN)
+        offset = Zoomable.pixel_to_ns(100)
+        ges_clips = [ges_layer.add_asset(asset, i * far + offset, 0, Zoomable.pixel_to_ns(10),
+                                         GES.TrackType.VIDEO)
+                     for i in range(2)]
+        layer = ges_layer.ui
+        timeline.hadj.configure(0, 0, 100 * VIEWPORT_MARGIN, 1, 1, VIEWPORT_MARGIN)
+
+        def clip_x(ges_clip):
+            return layer.child_get_property(ges_clip.ui, "x")
+
+        self.assertIsNone(ges_clips[1].ui)
+        Zoomable.set_zoom_level(Zoomable.get_current_zoom_level() + 10)
+        # The current layout is drawn stretched until idle.
+        self.assertNotEqual(clip_x(ges_clips[0]), Zoomable.ns_to_pixel(offset))
+        self.assertNotEqual(timeline.layout.layout_zoom_ratio, Zoomable.zoomratio)
+
+        common.create_main_loop().run(until_empty=True)
+        self.assertEqual(timeline.layout.layout_zoom_ratio, Zoomable.zoomratio)
+        self.assertEqual(clip_x(ges_clips[0]), Zoomable.ns_to_pixel(offset))
+        # The clip far from the visible area is laid out when getting close.
+        self.assertIsNone(ges_clips[1].ui)
+        timeline.hadj.set_value(Zoomable.ns_to_pixel(far))
+        self.assertEqual(clip_x(ges_clips[1]), Zoomable.ns_to_pixel(far + offset))
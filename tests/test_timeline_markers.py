@@ -19,6 +19,7 @@
 from unittest import mock
 
 from gi.repository import Gdk
+from gi.repository import GES
 from gi.repository import Gtk
 
 from pitivi.utils.timeline import Zoomable
@@ -110,6 +111,42 @@ class TestMarkers(BaseTestUndoTimeline):
 
         self.assert_markers(markers, [(position2, None)])
 
+    def test_marker_moved_snapping(self):
+        """Checks the moved markers snap to the clips edges."""
+        self.setup_timeline_container()
+        markers = self.timeline.get_marker_list("markers")
+        marker_box = self.timeline_container.markers
+        marker_box.markers_container = markers
+
+        clip = GES.TestClip()
+        clip.props.start = Zoomable.pixel_to_ns(400)
+        clip.props.duration = Zoomable.pixel_to_ns(100)
+        self.assertTrue(self.layer.add_clip(clip))
+
+        marker = marker_box.markers_container.add(Zoomable.pixel_to_ns(300))
+
+        event = mock.Mock(spec=Gdk.EventButton)
+        event.x = 0
+        event.y = 1
+        event.type = Gdk.EventType.BUTTON_PRESS
+        event.button = Gdk.BUTTON_PRIMARY
+
+        with mock.patch.object(Gtk, "get_event_widget") as get_event_widget:
+            get_event_widget.return_value = marker.ui
+            event.guiEvent = Gdk.Event.new(Gdk.EventType.BUTTON_PRESS)
+            marker_box.do_button_press_event(event)
+
+            with mock.patch.object(marker.ui, "translate_coordinates") as translate_coordinates:
+                translate_coordinates.return_value = (402, 0)
+                marker_box.do_motion_notify_event(event)
+                self.assertEqual(self.timeline_container.timeline.layout.snap_position,
+                                 clip.props.start)
+
+                marker_box.do_button_release_event(event)
+                self.assertEqual(self.timeline_container.timeline.layout.snap_position, 0)
+
+        self.assert_markers(markers, [(clip.props.start, None)])
+
     # pylint: disable=unbalanced-tuple-unpacking
     def test_marker_comment_ui(self):
         """Checks the comments marker UI."""
@@ -23,6 +23,7 @@ from gi.repository import GES
 from gi.repository import Gst
 from gi.repository import Gtk
 
+from pitivi.timeline.layer import Layer
 from pitivi.undo.timeline import TimelineObserver
 from pitivi.undo.undo import UndoableActionLog
 from pitivi.utils.timeline import UNSELECT
@@ -615,6 +616,62 @@ class TestEditing(BaseTestTimeline):
         self.assertEqual(len(timeline.ges_timeline.get_layers()), 1,
                          "No new layer should have been created")
 
+    def test_drag_updates_coalesced(self):
+        """Checks the clip is moved at most once per frame."""
+        timeline_container = common.create_timeline_container()
+        timeline = timeline_container.timeline
+        clip, = self.add_clips_simple(timeline, 1)
+        layer = clip.get_layer()
+
+        with mock.patch.object(Gtk, "get_event_widget") as get_event_widget, \
+                mock.patch.object(timeline, "get_frame_clock"), \
+                mock.patch.object(timeline, "add_tick_callback") as add_tick_callback, \
+                mock.patch.object(timeline, "remove_tick_callback"), \
+                mock.patch.object(timeline, "get_layer_at") as get_layer_at:
+            add_tick_callback.return_value = 1
+            get_layer_at.return_value = layer, []
+
+            event = mock.Mock()
+            event.x = 100
+            event.get_button.return_value = True, 1
+            get_event_widget.return_value = clip.ui
+            timeline._button_press_event_cb(None, event)
+
+            def drag_to(x):
+                event = mock.Mock()
+                event.x = x
+                event.get_state.return_value = Gdk.ModifierType.BUTTON1_MASK
+                with mock.patch.object(clip.ui, "translate_coordinates") as translate_coordinates:
+                    translate_coordinates.return_value = (x, 0)
+                    timeline._motion_notify_event_cb(None, event)
+
+            # The first update is applied right away.
+            drag_to(110)
+            self.assertEqual(clip.props.start, timeline.pixel_to_ns(10))
+            self.assertEqual(add_tick_callback.call_count, 1)
+
+            # The next ones wait for the next frame.
+            drag_to(120)
+            drag_to(130)
+            self.assertEqual(clip.props.start, timeline.pixel_to_ns(10))
+
+            tick_cb = add_tick_callback.call_args[0][0]
+            self.assertTrue(tick_cb(timeline, None))
+            self.assertEqual(clip.props.start, timeline.pixel_to_ns(30))
+            self.assertFalse(tick_cb(timeline, None))
+
+            # The pending update is applied when the button is released.
+            add_tick_callback.reset_mock()
+            drag_to(140)
+            drag_to(150)
+            self.assertEqual(add_tick_callback.call_count, 1)
+            self.assertEqual(clip.props.start, timeline.pixel_to_ns(40))
+
+            event = mock.Mock()
+            event.get_button.return_value = True, 1
+            timeline._button_release_event_cb(None, event)
+            self.assertEqual(clip.props.start, timeline.pixel_to_ns(50))
+
 
 class TestShiftSelection(BaseTestTimeline):
 
@@ -799,7 +856,47 @@ class TestTimelineContainer(BaseTestTimeline):
         self.assertListEqual(list(timeline_container.timeline.clips()), [title_clip])
 
         # Check the title clips are ignored.
-        timeline_container.update_clips_asset(mock.Mock(), mock.Mock())
+        asset = mock.Mock(spec=GES.Asset)
+        asset.props.id = "file:///home/file.name.mp4"
+        timeline_container.update_clips_asset(asset, mock.Mock())
+
+    def test_updates_batched(self):
+        timeline_container = common.create_timeline_container()
+        timeline = timeline_container.timeline
+        ges_layer = timeline.ges_timeline.append_layer()
+        layer = ges_layer.ui
+        self.assertEqual(layer.media_types, GES.TrackType(0))
+
+        with mock.patch.object(Layer, "check_media_types",
+                               autospec=True, side_effect=Layer.check_media_types) as check_media_types:
+            with timeline.updates_batched():
+                with timeline.updates_batched():
+                    clips = [self.add_clip(ges_layer, start) for start in (20, 0, 10)]
+                self.assertTrue(timeline.batching_updates)
+                check_media_types.assert_not_called()
+
+        self.assertFalse(timeline.batching_updates)
+        check_media_types.assert_called_once_with(layer)
+        self.assertEqual(layer.media_types, GES.TrackType.AUDIO | GES.TrackType.VIDEO)
+        z_orders = [child.z_order for child in layer._children]
+        self.assertEqual(z_orders, sorted(z_orders))
+        self.assertEqual({child.ges_clip for child in layer._children}, set(clips))
+
+    def test_playhead_redraw_area(self):
+        timeline_container = common.create_timeline_container()
+        layout = timeline_container.timeline.layout
+
+        with mock.patch.object(layout, "queue_draw_area") as queue_draw_area, \
+                mock.patch.object(layout, "queue_draw") as queue_draw:
+            layout.set_playhead_position(Gst.SECOND)
+            self.assertEqual(layout.playhead_position, Gst.SECOND)
+            # The old and the new playhead areas are redrawn.
+            self.assertEqual(queue_draw_area.call_count, 2)
+            queue_draw.assert_not_called()
+
+            queue_draw_area.reset_mock()
+            layout.set_playhead_position(Gst.SECOND)
+            queue_draw_area.assert_not_called()
 
 
 class TestClipsEdges(BaseTestTimeline):
@@ -897,3 +994,45 @@ class TestDragFromOutside(BaseTestTimeline):
         # Use same asset to mimic dragging multiple assets
         self.check_drag_assets_to_timeline(self.ges_timeline.ui, [asset, asset])
         self.assertEqual(layer.get_clips(), clips)
+
+    def test_drop_at_last_motion(self):
+        """Checks the clips are dropped where the last motion event was."""
+        timeline_ui = self.ges_timeline.ui
+        asset = GES.UriClipAsset.request_sync(
+            common.get_sample_uri("tears_of_steel.webm"))
+        self.assertTrue(timeline_ui._project.add_asset(asset))
+        layer, = self.ges_timeline.get_layers()
+
+        with mock.patch.object(Gdk, "drag_status"), \
+                mock.patch.object(Gtk, "drag_finish"), \
+                mock.patch.object(timeline_ui, "get_frame_clock"), \
+                mock.patch.object(timeline_ui, "add_tick_callback") as add_tick_callback, \
+                mock.patch.object(timeline_ui, "remove_tick_callback"):
+            add_tick_callback.return_value = 1
+            target = mock.Mock()
+            target.name.return_value = URI_TARGET_ENTRY.target
+            timeline_ui.drag_dest_find_target = mock.Mock(return_value=target)
+            timeline_ui.drag_get_data = mock.Mock()
+            timeline_ui._drag_motion_cb(None, None, 0, 0, 0)
+
+            selection_data = mock.Mock()
+            selection_data.get_data_type = mock.Mock(return_value=target)
+            selection_data.get_uris.return_value = [asset.props.id]
+            timeline_ui._drag_data_received_cb(None, None, 0, 0, selection_data, None, 0)
+
+            def translate_coordinates_func(widget, x, y):
+                return x, y
+            timeline_ui.translate_coordinates = translate_coordinates_func
+            timeline_ui._drag_motion_cb(timeline_ui, None, 10, SEPARATOR_HEIGHT, 0)
+            ges_clip, = layer.get_clips()
+            self.assertEqual(ges_clip.props.start, timeline_ui.pixel_to_ns(10))
+
+            # The last motion is waiting for the next frame.
+            timeline_ui._drag_motion_cb(timeline_ui, None, 100, SEPARATOR_HEIGHT, 0)
+            self.assertEqual(ges_clip.props.start, timeline_ui.pixel_to_ns(10))
+
+            timeline_ui._drag_leave_cb(None, None, None)
+            timeline_ui._drag_drop_cb(None, None, 100, SEPARATOR_HEIGHT, 0)
+
+        ges_clip, = layer.get_clips()
+        self.assertEqual(ges_clip.props.start, timeline_ui.pixel_to_ns(100))
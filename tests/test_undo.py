@@ -142,6 +142,17 @@ class TestUndoableActionLog(common.TestCase):
         self.log.redo()
         self.assertFalse(self.log.dirty())
 
+        # Replace the operation with a different one.
+        self.log.undo()
+        with self.log.started("meh"):
+            self.log.push(mock.Mock(spec=UndoableAction))
+        self.assertEqual(len(self.log.undo_stacks), 1)
+        self.assertTrue(self.log.dirty())
+
+        self.log.undo()
+        self.log.checkpoint()
+        self.assertFalse(self.log.dirty())
+
     def test_commit(self):
         """Checks committing a stack."""
         self.assertEqual(len(self.log.undo_stacks), 0)
@@ -207,6 +218,79 @@ class TestUndoableActionLog(common.TestCase):
         self.assertEqual(len(self.log.undo_stacks), 1)
         self.assertEqual(len(self.log.redo_stacks), 0)
 
+    def test_compaction(self):
+        gobject = mock.Mock()
+        with self.log.started("one"):
+            self.log.push(PropertyChangedAction(gobject, "field", 1, 2))
+            with self.log.started("nested"):
+                self.log.push(PropertyChangedAction(gobject, "field", 2, 3))
+        stack, = self.log.undo_stacks
+        self.assertEqual(stack.actions_count, 2)
+
+        for i in range(UndoableActionLog.COMPACTION_DELAY):
+            with self.log.started("other %d" % i):
+                self.log.push(mock.Mock(spec=UndoableAction))
+        self.assertTrue(stack.compacted)
+        self.assertEqual(stack.actions_count, 1)
+        action, = stack.done_actions
+        self.assertEqual((action.old_value, action.new_value), (1, 3))
+
+        stack.undo()
+        gobject.set_property.assert_called_once_with("field", 1)
+
+    def test_history_limits(self):
+        def create_action():
+            action = mock.Mock(spec=UndoableAction)
+            action.expand.return_value = False
+            action.coalesce.return_value = False
+            return action
+
+        log = UndoableActionLog(max_operations=3, max_actions=5)
+        for unused_i in range(4):
+            with log.started("one action"):
+                log.push(create_action())
+        self.assertEqual(len(log.undo_stacks), 3)
+
+        log.checkpoint()
+        with log.started("three actions"):
+            for unused_i in range(3):
+                log.push(create_action())
+        self.assertEqual([stack.actions_count for stack in log.undo_stacks], [1, 1, 3])
+
+        # The history is shortened, but the checkpoint is still valid.
+        log.undo()
+        self.assertFalse(log.dirty())
+
+        # The last operation is kept even if it exceeds the limits.
+        with log.started("many actions"):
+            for unused_i in range(10):
+                log.push(create_action())
+        self.assertEqual([stack.actions_count for stack in log.undo_stacks], [10])
+
+    def test_coalescing(self):
+        gobject = mock.Mock()
+        finalizing_action = mock.Mock()
+        for value in range(3):
+            with self.log.started("slider", finalizing_action=finalizing_action):
+                self.log.push(PropertyChangedAction(gobject, "field", value, value + 1))
+        stack, = self.log.undo_stacks
+        action, = stack.done_actions
+        self.assertEqual((action.old_value, action.new_value), (0, 3))
+        self.assertEqual(finalizing_action.do.call_count, 3)
+
+        # The saved operations are not changed.
+        self.log.checkpoint()
+        with self.log.started("slider"):
+            self.log.push(PropertyChangedAction(gobject, "field", 3, 4))
+        self.assertEqual(len(self.log.undo_stacks), 2)
+
+        # The operations done some time apart are not merged.
+        with mock.patch("pitivi.undo.undo.time.monotonic") as monotonic:
+            monotonic.return_value = 1000000
+            with self.log.started("slider"):
+                self.log.push(PropertyChangedAction(gobject, "field", 4, 5))
+        self.assertEqual(len(self.log.undo_stacks), 3)
+
     def test_finalizing_action(self):
         action1 = mock.Mock()
         action2 = mock.Mock()
@@ -286,6 +370,65 @@ class TestUndoableActionLog(common.TestCase):
         self.assertEqual(len(self.log.undo_stacks), 0)
         self.assertEqual(len(self.log.redo_stacks), 0)
 
+    def test_report_expanded(self):
+        """Checks the expanded actions are reported once, at commit."""
+        reported = []
+        self.log.connect("pre-push", lambda unused_log, action: reported.append(action))
+        action = mock.Mock(spec=UndoableAction)
+        action.expand.return_value = False
+
+        with self.log.started("one"):
+            self.log.push(action)
+            self.log.report_expanded(action)
+            self.log.report_expanded(action)
+            with self.log.started("two"):
+                self.log.report_expanded(action)
+            self.assertEqual(reported, [action])
+        self.assertEqual(reported, [action, action])
+
+        # The expanded actions of an operation rolled back are not reported.
+        reported.clear()
+        self.log.begin("three")
+        action2 = mock.Mock(spec=UndoableAction)
+        self.log.push(action2)
+        self.log.report_expanded(action2)
+        self.log.rollback()
+        with self.log.started("four"):
+            self.log.push(action)
+        self.assertEqual(reported, [action2, action])
+
+    def test_profiling(self):
+        clip = GES.TitleClip()
+        unused_observer = GObjectObserver(clip, ["start", "duration"], self.log)
+
+        with self.log.started("not profiled"):
+            clip.props.start = 1
+
+        self.log.profiling = True
+        with self.log.started("profiled"):
+            clip.props.start = 2
+            clip.props.duration = 10
+            with self.log.started("nested"):
+                clip.props.start = 3
+        self.assertEqual(self.log.get_stats(), [(self.log.undo_stacks[-1], mock.ANY)])
+
+        stack, stats = self.log.get_stats()[0]
+        self.assertEqual(stack.action_group_name, "profiled")
+        self.assertEqual(stats.actions_count_by_class, {"PropertyChangedAction": 3})
+        self.assertGreater(stats.estimated_bytes, 0)
+        self.assertGreater(stats.observers_seconds, 0)
+        self.assertEqual(stats.undo_count, 0)
+
+        self.log.undo()
+        self.assertEqual(self.log.get_stats(), [(stack, stats)])
+        self.assertEqual(stats.undo_count, 1)
+        self.assertGreater(stats.undo_seconds, 0)
+        self.assertEqual(clip.props.start, 1)
+
+        self.log.redo()
+        self.assertEqual(stats.do_count, 1)
+        self.assertGreater(stats.do_seconds, 0)
+
     def test_undo_redo(self):
         """Tries an undo() redo() sequence."""
         # begin
@@ -17,6 +17,8 @@
 # License along with this program; if not, see <http://www.gnu.org/licenses/>.
 """Tests for the pitivi.undo.timeline module."""
 # pylint: disable=protected-access
+import gc
+import weakref
 from unittest import mock
 
 from gi.repository import Gdk
@@ -31,8 +33,11 @@ from pitivi.timeline.timeline import TimelineContainer
 from pitivi.undo.project import AssetAddedAction
 from pitivi.undo.timeline import ClipAdded
 from pitivi.undo.timeline import ClipRemoved
+from pitivi.undo.timeline import KeyframesAction
+from pitivi.undo.timeline import TimelineObserver
 from pitivi.undo.timeline import TrackElementAdded
 from pitivi.undo.undo import PropertyChangedAction
+from pitivi.undo.undo import UndoableActionLog
 from pitivi.utils.ui import LAYER_HEIGHT
 from pitivi.utils.ui import URI_TARGET_ENTRY
 from tests import common
@@ -182,6 +187,51 @@ class TestTimelineObserver(BaseTestUndoTimeline):
         self.check_layers([layer1, layer2, layer3])
         self.check_removal(self.timeline.get_layers())
 
+    def test_lazy_observation(self):
+        clips = []
+        for i in range(3):
+            clip = GES.TitleClip()
+            clip.props.start = i * Gst.SECOND
+            clip.props.duration = Gst.SECOND
+            self.assertTrue(self.layer.add_clip(clip))
+            clips.append(clip)
+
+        action_log = UndoableActionLog()
+        observer = TimelineObserver(self.timeline, action_log)
+        layer_observer = observer.layer_observers[self.layer]
+        self.assertEqual(layer_observer.clip_observers, {})
+
+        # A change before an operation is not recorded.
+        clips[0].props.start = 10 * Gst.SECOND
+
+        with action_log.started("move clip"):
+            self.assertEqual(set(layer_observer.clip_observers), set(clips))
+            clips[0].props.start = 20 * Gst.SECOND
+
+        action_log.undo()
+        self.assertEqual(clips[0].props.start, 10 * Gst.SECOND)
+        action_log.redo()
+        self.assertEqual(clips[0].props.start, 20 * Gst.SECOND)
+
+    def test_lazy_observation_idle(self):
+        clip1 = GES.TitleClip()
+        self.assertTrue(self.layer.add_clip(clip1))
+        clip2 = GES.TitleClip()
+        clip2.props.start = Gst.SECOND
+        self.assertTrue(self.layer.add_clip(clip2))
+
+        action_log = UndoableActionLog()
+        observer = TimelineObserver(self.timeline, action_log)
+        layer_observer = observer.layer_observers[self.layer]
+
+        # A clip removed before being observed is simply forgotten.
+        self.layer.remove_clip(clip2)
+
+        with mock.patch.object(layer_observer, "PENDING_CLIPS_CHUNK_SIZE", 1):
+            common.create_main_loop().run(until_empty=True)
+        self.assertEqual(list(layer_observer.clip_observers), [clip1])
+        self.assertFalse(layer_observer.connect_to_pending_clips())
+
     def check_removal(self, ges_layers):
         if len(ges_layers) == 1:
             # We don't support removing the last remaining layer.
@@ -841,6 +891,55 @@ class TestControlSourceObserver(BaseTestUndoTimeline):
         self.action_log.redo()
         self.assertEqual(0.9, control_source.get_all()[0].value)
 
+    def test_control_source_value_moved(self):
+        stacks = []
+        self.action_log.connect("commit", BaseTestUndoTimeline.commit_cb, stacks)
+
+        uri = common.get_sample_uri("tears_of_steel.webm")
+        asset = GES.UriClipAsset.request_sync(uri)
+        clip = asset.extract()
+        self.layer.add_clip(clip)
+        source = clip.get_children(False)[1]
+
+        control_source = GstController.InterpolationControlSource()
+        control_source.props.mode = GstController.InterpolationMode.LINEAR
+        source.set_control_source(control_source, "alpha", "direct")
+        for i in range(1000):
+            self.assertTrue(control_source.set(i * Gst.MSECOND, i / 1000))
+
+        def get_keyframes():
+            return [(keyframe.timestamp, keyframe.value)
+                    for keyframe in control_source.get_all()]
+
+        keyframes = get_keyframes()
+
+        # Drag a keyframe back and forth, as KeyframeCurve does.
+        with self.action_log.started("Move keyframe"):
+            timestamp = 500 * Gst.MSECOND
+            for dest_timestamp in [500.5, 501.5, 499.5, 500.5]:
+                dest_timestamp = int(dest_timestamp * Gst.MSECOND)
+                self.assertTrue(control_source.unset(timestamp))
+                self.assertTrue(control_source.set(dest_timestamp, 0.7))
+                timestamp = dest_timestamp
+
+        moved_keyframes = get_keyframes()
+        self.assertEqual(len(moved_keyframes), 1000)
+
+        # The changes have been merged in a diff of the two keyframes.
+        self.assertEqual(len(stacks), 1)
+        self.assertEqual(len(stacks[0].done_actions), 1)
+        action = stacks[0].done_actions[0]
+        self.assertIsInstance(action, KeyframesAction)
+        self.assertEqual(action.old_values, {500 * Gst.MSECOND: 0.5,
+                                             int(500.5 * Gst.MSECOND): None})
+        self.assertEqual(action.new_values, {500 * Gst.MSECOND: None,
+                                             int(500.5 * Gst.MSECOND): 0.7})
+
+        self.action_log.undo()
+        self.assertEqual(get_keyframes(), keyframes)
+        self.action_log.redo()
+        self.assertEqual(get_keyframes(), moved_keyframes)
+
 
 class TestTrackElementObserver(BaseTestUndoTimeline):
 
@@ -1006,6 +1105,51 @@ class TestTimelineElementObserver(BaseTestUndoTimeline):
         self.action_log.redo()
         self.assertEqual(effect1.get_child_property("scratch-lines")[1], 0)
 
+    def test_property_changes_coalesced(self):
+        clip1 = GES.TitleClip()
+        self.layer.add_clip(clip1)
+        source = clip1.get_children(False)[0]
+        posx = source.get_child_property("posx")[1]
+        posy = source.get_child_property("posy")[1]
+        scenario_actions = []
+        self.action_log.connect("pre-push",
+                                lambda unused_log, action: scenario_actions.append(action))
+
+        # Changes of the same property interleaved with other changes.
+        with self.action_log.started("Video position change"):
+            for position in range(1, 11):
+                source.set_child_property("posx", position)
+                source.set_child_property("posy", position)
+        stack, = self.action_log.undo_stacks
+        self.assertEqual(len(stack.done_actions), 2, stack.done_actions)
+        # The pushed actions are reported again with the final values
+        # when the operation is committed.
+        self.assertEqual(scenario_actions, stack.done_actions * 2)
+
+        # Quick operations changing the same property.
+        for position in range(11, 21):
+            with self.action_log.started("Video position change"):
+                source.set_child_property("posx", position)
+        self.assertEqual(len(self.action_log.undo_stacks), 2)
+
+        self.action_log.undo()
+        self.assertEqual(source.get_child_property("posx")[1], 10)
+        self.action_log.undo()
+        self.assertEqual(source.get_child_property("posx")[1], posx)
+        self.assertEqual(source.get_child_property("posy")[1], posy)
+        self.action_log.redo()
+        self.action_log.redo()
+        self.assertEqual(source.get_child_property("posx")[1], 20)
+        self.assertEqual(source.get_child_property("posy")[1], 10)
+
+        # The observer does not keep the operations alive.
+        stack_ref = weakref.ref(stack)
+        del stack
+        self.action_log.undo_stacks.clear()
+        self.action_log.redo_stacks.clear()
+        gc.collect()
+        self.assertIsNone(stack_ref())
+
 
 class TestGObjectObserver(BaseTestUndoTimeline):
 
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2020, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Tests for the utils.intervaltree module."""
+import random
+
+from gi.repository import GES
+
+from pitivi.utils.intervaltree import IntervalTree
+from pitivi.utils.intervaltree import LayerClipsIndex
+from pitivi.utils.intervaltree import TimelineEdgesIndex
+from tests import common
+
+
+class TestIntervalTree(common.TestCase):
+    """Tests for the IntervalTree class."""
+
+    def test_queries(self):
+        tree = IntervalTree()
+        tree.add("a", 0, 10)
+        tree.add("b", 10, 20)
+        tree.add("c", 5, 5)
+        self.assertEqual(len(tree), 3)
+        self.assertIn("c", tree)
+
+        self.assertEqual(tree.find_at(5), ["a", "c"])
+        self.assertEqual(tree.find_at(10), ["a", "b"])
+        self.assertEqual(tree.find_at(21), [])
+        self.assertEqual(tree.find_overlapping(0, 10), ["a", "c"])
+        self.assertEqual(tree.find_overlapping(10, 11), ["b"])
+        self.assertEqual(tree.find_overlapping(20, 30), [])
+
+        tree.update("a", 30, 40)
+        self.assertEqual(tree.get_interval("a"), (30, 40))
+        self.assertEqual(tree.find_at(35), ["a"])
+        self.assertEqual(list(tree), ["c", "b", "a"])
+
+        tree.remove("b")
+        self.assertEqual(tree.find_overlapping(0, 100), ["c", "a"])
+
+    def test_random_operations(self):
+        """Compares the results with the ones of a linear scan."""
+        rand = random.Random(42)
+        tree = IntervalTree()
+        intervals = {}
+        for item in range(2000):
+            operation = rand.random()
+            if operation < 0.6 or not intervals:
+                start = rand.randint(0, 1000)
+                intervals[item] = (start, start + rand.randint(0, 50))
+                tree.add(item, *intervals[item])
+            elif operation < 0.8:
+                removed = rand.choice(list(intervals))
+                del intervals[removed]
+                tree.remove(removed)
+            else:
+                moved = rand.choice(list(intervals))
+                start = rand.randint(0, 1000)
+                intervals[moved] = (start, start + rand.randint(0, 50))
+                tree.update(moved, *intervals[moved])
+
+            position = rand.randint(0, 1100)
+            self.assertEqual(
+                set(tree.find_at(position)),
+                {i for i, (start, end) in intervals.items() if start <= position <= end})
+
+            low = rand.randint(0, 1100)
+            high = low + rand.randint(1, 100)
+            found = tree.find_overlapping(low, high)
+            self.assertEqual(
+                set(found),
+                {i for i, (start, end) in intervals.items() if start < high and end > low})
+            starts = [intervals[i][0] for i in found]
+            self.assertEqual(starts, sorted(starts))
+
+
+class TestLayerClipsIndex(common.TestCase):
+    """Tests for the LayerClipsIndex class."""
+
+    def test_index(self):
+        ges_layer = GES.Layer()
+        clip1 = GES.TestClip()
+        clip1.props.start = 0
+        clip1.props.duration = 10
+        self.assertTrue(ges_layer.add_clip(clip1))
+
+        index = LayerClipsIndex(ges_layer)
+        self.assertEqual(index.get_clips_at(5), [clip1])
+
+        clip2 = GES.TestClip()
+        clip2.props.start = 20
+        clip2.props.duration = 10
+        self.assertTrue(ges_layer.add_clip(clip2))
+        self.assertEqual(index.get_clips_in_interval(0, 100), [clip1, clip2])
+
+        # Move and trim the clips.
+        clip1.props.start = 50
+        clip2.props.duration = 40
+        self.assertEqual(index.get_clips_at(55), [clip2, clip1])
+        self.assertEqual(index.get_clips_in_interval(0, 20), [])
+
+        ges_layer.remove_clip(clip2)
+        self.assertEqual(index.get_clips_at(55), [clip1])
+
+        index.release()
+        clip1.props.start = 0
+        self.assertEqual(index.get_clips_at(55), [])
+
+
+class TestTimelineEdgesIndex(common.TestCase):
+    """Tests for the TimelineEdgesIndex class."""
+
+    def test_edges(self):
+        ges_timeline = GES.Timeline.new_audio_video()
+        ges_timeline.set_marker_list("markers", GES.MarkerList.new())
+        ges_layer = ges_timeline.append_layer()
+        clip1 = GES.TestClip()
+        clip1.props.start = 10
+        clip1.props.duration = 10
+        self.assertTrue(ges_layer.add_clip(clip1))
+
+        index = TimelineEdgesIndex(ges_timeline)
+        self.assertEqual(index.get_next_clip_edge(0), 10)
+        self.assertEqual(index.get_next_clip_edge(10), 20)
+        self.assertIsNone(index.get_next_clip_edge(20))
+        self.assertEqual(index.get_previous_clip_edge(20), 10)
+        self.assertIsNone(index.get_previous_clip_edge(10))
+
+        ges_layer2 = ges_timeline.append_layer()
+        clip2 = GES.TestClip()
+        clip2.props.start = 30
+        clip2.props.duration = 10
+        self.assertTrue(ges_layer2.add_clip(clip2))
+        self.assertEqual(index.get_next_clip_edge(20), 30)
+
+        clip2.props.start = 50
+        self.assertEqual(index.get_next_clip_edge(20), 50)
+        self.assertEqual(index.get_previous_clip_edge(100), 60)
+
+        ges_layer2.remove_clip(clip2)
+        self.assertIsNone(index.get_next_clip_edge(20))
+
+    def test_snap_position(self):
+        ges_timeline = GES.Timeline.new_audio_video()
+        ges_markers = GES.MarkerList.new()
+        ges_timeline.set_marker_list("markers", ges_markers)
+        ges_layer = ges_timeline.append_layer()
+        clip = GES.TestClip()
+        clip.props.start = 100
+        clip.props.duration = 100
+        self.assertTrue(ges_layer.add_clip(clip))
+        marker = ges_markers.add(150)
+
+        index = TimelineEdgesIndex(ges_timeline)
+        self.assertEqual(index.get_snap_position(95, 10), 100)
+        self.assertEqual(index.get_snap_position(145, 10), 150)
+        self.assertIsNone(index.get_snap_position(125, 10))
+        self.assertIsNone(index.get_snap_position(95, 10, excluded_clips=[clip]))
+        self.assertIsNone(index.get_snap_position(145, 10, excluded_markers=[marker]))
+
+        index.playhead_position = 130
+        self.assertEqual(index.get_snap_position(125, 10), 130)
+
+        ges_markers.move(marker, 122)
+        self.assertEqual(index.get_snap_position(125, 10), 122)
+
+        index.release()
+        self.assertIsNone(index.get_snap_position(95, 10))
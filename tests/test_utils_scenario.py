@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2020, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Tests for the utils.scenario module."""
+import os
+import tempfile
+import time
+from unittest import mock
+
+from gi.repository import Gst
+
+from pitivi.utils.scenario import ProjectJournal
+from pitivi.utils.scenario import prune_scenarios
+from pitivi.utils.scenario import ScenarioRecorder
+from pitivi.utils.scenario import SNAPSHOTS_DIR
+from tests import common
+
+
+def create_edit(container_name, position, edge="edge_none"):
+    structure = Gst.Structure.new_empty("edit-container")
+    structure["container-name"] = container_name
+    structure["position"] = float(position)
+    structure["edit-mode"] = "edit_normal"
+    structure["edge"] = edge
+    return structure
+
+
+def read_actions(path):
+    with open(path) as scenario:
+        return [Gst.Structure.from_string(line)[0]
+                for line in scenario.read().splitlines()]
+
+
+class TestScenarioRecorder(common.TestCase):
+    """Tests for the ScenarioRecorder class."""
+
+    def test_recording(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "test.scenario")
+            # Record all the actions at the same time, to avoid waits.
+            with mock.patch.object(Gst, "util_get_timestamp", return_value=0):
+                recorder = ScenarioRecorder(path)
+                recorder.record(Gst.Structure.new_empty("set-state"))
+                recorder.record(create_edit("clip1", 1))
+                recorder.record(create_edit("clip1", 2))
+                recorder.record(create_edit("clip1", 3))
+                recorder.record(create_edit("clip1", 3, edge="edge_end"))
+                recorder.record(create_edit("clip2", 4))
+
+                recorder.sync()
+                actions = read_actions(path)
+                self.assertEqual([action.get_name() for action in actions],
+                                 ["description", "set-state", "edit-container",
+                                  "edit-container", "edit-container"])
+                self.assertEqual(actions[2]["position"], 3)
+                self.assertEqual(actions[3]["edge"], "edge_end")
+                self.assertEqual(actions[4]["container-name"], "clip2")
+
+                recorder.record(Gst.Structure.new_empty("stop"))
+                recorder.close()
+
+            actions = read_actions(path)
+            self.assertEqual([action.get_name() for action in actions],
+                             ["description", "set-state",
+                              "edit-container", "edit-container",
+                              "edit-container", "stop"])
+
+    def test_waits(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "test.scenario")
+            with mock.patch.object(Gst, "util_get_timestamp") as get_timestamp:
+                get_timestamp.return_value = 0
+                recorder = ScenarioRecorder(path)
+                get_timestamp.return_value = Gst.SECOND
+                recorder.record(create_edit("clip1", 1))
+                get_timestamp.return_value = 2 * Gst.SECOND
+                recorder.record(create_edit("clip1", 2))
+                recorder.close()
+
+            actions = read_actions(path)
+            self.assertEqual([action.get_name() for action in actions],
+                             ["description", "wait", "edit-container"])
+            # The waits of the merged actions are summed.
+            self.assertEqual(actions[1]["duration"], 2.0)
+            self.assertEqual(actions[2]["position"], 2)
+
+    def test_child_properties_merged(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "test.scenario")
+            with mock.patch.object(Gst, "util_get_timestamp", return_value=0):
+                recorder = ScenarioRecorder(path)
+                for prop_name, value in (("posx", 1), ("posx", 2), ("posy", 3)):
+                    structure = Gst.Structure.new_empty("set-child-property")
+                    structure["element-name"] = "videotestsource0"
+                    structure["property"] = prop_name
+                    structure["value"] = value
+                    recorder.record(structure)
+                recorder.close()
+
+            actions = read_actions(path)
+            self.assertEqual([(action.get_name(), action["property"], action["value"])
+                              for action in actions[1:]],
+                             [("set-child-property", "posx", 2),
+                              ("set-child-property", "posy", 3)])
+
+    def test_project_snapshots(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            project_path = os.path.join(temp_dir, "project.xges")
+            with open(project_path, "w") as project:
+                project.write("<ges version='0.4'>\n</ges>\n")
+
+            uris = []
+            for name in ("1.scenario", "2.scenario"):
+                path = os.path.join(temp_dir, name)
+                recorder = ScenarioRecorder(path)
+                recorder.record_project(project_path, temp_dir)
+                recorder.close()
+
+                actions = read_actions(path)
+                self.assertEqual([action.get_name() for action in actions],
+                                 ["description", "load-project"])
+                uris.append(actions[1]["uri"])
+
+            # The same content is stored only once.
+            self.assertEqual(uris[0], uris[1])
+            snapshots = os.listdir(os.path.join(temp_dir, SNAPSHOTS_DIR))
+            self.assertEqual(len(snapshots), 1)
+            with open(Gst.uri_get_location(uris[0])) as snapshot:
+                self.assertEqual(snapshot.read(), "<ges version='0.4'>\n</ges>\n")
+
+
+class TestProjectJournal(common.TestCase):
+    """Tests for the ProjectJournal class."""
+
+    def test_journal(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "project.xges.journal.scenario")
+            journal = ProjectJournal("file:///project.xges", path)
+            journal.record(Gst.Structure.new_empty("seek"))
+            journal.commit()
+            # Nothing to recover yet.
+            self.assertFalse(os.path.exists(path))
+
+            # Make the writing blocking to check the file content.
+            with mock.patch.object(ScenarioRecorder, "flush", ScenarioRecorder.sync), \
+                    mock.patch.object(Gst, "util_get_timestamp") as get_timestamp:
+                get_timestamp.return_value = 0
+                journal.record(create_edit("clip1", 1))
+                # The actions of an uncommitted operation are not written.
+                get_timestamp.return_value = 10 * Gst.SECOND
+                journal.record(create_edit("clip2", 2))
+                journal.record(Gst.Structure.new_empty("play"))
+                self.assertFalse(os.path.exists(path))
+
+                journal.commit()
+                actions = read_actions(path)
+                self.assertEqual([action.get_name() for action in actions],
+                                 ["description", "load-project",
+                                  "edit-container", "edit-container"])
+                self.assertEqual(actions[1]["uri"], "file:///project.xges")
+                self.assertEqual(actions[3]["container-name"], "clip2")
+
+            journal.discard()
+            self.assertFalse(os.path.exists(path))
+
+    def test_journal_not_writable(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "missing", "project.xges.journal.scenario")
+            journal = ProjectJournal("file:///project.xges", path)
+            journal.record(create_edit("clip1", 1))
+            # The journaling is disabled instead of failing the operation.
+            journal.commit()
+            self.assertFalse(os.path.exists(path))
+
+            journal.record(create_edit("clip1", 2))
+            journal.commit()
+            journal.discard()
+            self.assertFalse(os.path.exists(path))
+
+
+class TestPruneScenarios(common.TestCase):
+    """Tests for the prune_scenarios function."""
+
+    def create_scenario(self, scenarios_dir, name, content, age):
+        project_path = os.path.join(scenarios_dir, name + ".xges")
+        with open(project_path, "w") as project:
+            project.write(content)
+
+        path = os.path.join(scenarios_dir, name + ".scenario")
+        recorder = ScenarioRecorder(path)
+        recorder.record_project(project_path, scenarios_dir)
+        recorder.close()
+        os.unlink(project_path)
+
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_prune(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            snapshots_dir = os.path.join(temp_dir, SNAPSHOTS_DIR)
+            old = self.create_scenario(temp_dir, "old", "old", age=100)
+            shared1 = self.create_scenario(temp_dir, "shared1", "shared", age=50)
+            shared2 = self.create_scenario(temp_dir, "shared2", "shared", age=10)
+            self.assertEqual(len(os.listdir(snapshots_dir)), 2)
+
+            # Prune by age.
+            prune_scenarios(temp_dir, max_age=60, max_size=1024 * 1024)
+            self.assertFalse(os.path.exists(old))
+            self.assertTrue(os.path.exists(shared1))
+            self.assertTrue(os.path.exists(shared2))
+            self.assertEqual(len(os.listdir(snapshots_dir)), 1)
+
+            # Prune by size, keeping only the most recent scenario.
+            size = os.path.getsize(shared2) + len("shared")
+            prune_scenarios(temp_dir, max_age=60, max_size=size)
+            self.assertFalse(os.path.exists(shared1))
+            self.assertTrue(os.path.exists(shared2))
+            self.assertEqual(len(os.listdir(snapshots_dir)), 1)
+
+            prune_scenarios(temp_dir, max_age=0, max_size=size)
+            self.assertEqual(os.listdir(temp_dir), [SNAPSHOTS_DIR])
+            self.assertEqual(os.listdir(snapshots_dir), [])
+
+    def test_prune_in_recorder(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            old = self.create_scenario(temp_dir, "old", "old", age=100)
+            project_path = os.path.join(temp_dir, "new.xges")
+            with open(project_path, "w") as project:
+                project.write("new")
+
+            path = os.path.join(temp_dir, "new.scenario")
+            recorder = ScenarioRecorder(path)
+            recorder.prune_scenarios(temp_dir, max_age=60, max_size=1024 * 1024)
+            recorder.record_project(project_path, temp_dir)
+            recorder.close()
+
+            self.assertFalse(os.path.exists(old))
+            # The snapshot stored after pruning is kept.
+            actions = read_actions(path)
+            self.assertEqual([action.get_name() for action in actions],
+                             ["description", "load-project"])
+            self.assertTrue(os.path.exists(Gst.uri_get_location(actions[1]["uri"])))
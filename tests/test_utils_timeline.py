@@ -17,8 +17,11 @@
 from unittest import mock
 
 from gi.repository import GES
+from gi.repository import Gst
+from gi.repository import Gtk
 
 from pitivi.utils.timeline import EditingContext
+from pitivi.utils.timeline import FrameGrid
 from pitivi.utils.timeline import SELECT
 from pitivi.utils.timeline import SELECT_ADD
 from pitivi.utils.timeline import Selected
@@ -100,6 +103,22 @@ class TestSelection(BaseTestTimeline):
         self.assertFalse(selection.can_group)
         self.assertFalse(selection.can_ungroup)
 
+    def test_clip_widget_state(self):
+        timeline_container = common.create_timeline_container()
+        timeline = timeline_container.timeline
+        clip1, clip2 = self.add_clips_simple(timeline, 2)
+
+        timeline.selection.set_selection([clip1, clip2], SELECT)
+        for clip in (clip1, clip2):
+            self.assertTrue(clip.ui.get_state_flags() & Gtk.StateFlags.SELECTED)
+            # The children are styled based on the state of the clip.
+            for child in clip.ui.get_children():
+                self.assertFalse(child.get_state_flags() & Gtk.StateFlags.SELECTED)
+
+        timeline.selection.set_selection([clip2], UNSELECT)
+        self.assertTrue(clip1.ui.get_state_flags() & Gtk.StateFlags.SELECTED)
+        self.assertFalse(clip2.ui.get_state_flags() & Gtk.StateFlags.SELECTED)
+
     def test_toplevels(self):
         timeline_container = common.create_timeline_container()
         timeline = timeline_container.timeline
@@ -131,6 +150,34 @@ class TestSelection(BaseTestTimeline):
         self.assertSetEqual(selection.toplevels, {group1, clip3, clip4})
 
 
+class TestFrameGrid(common.TestCase):
+    """Tests for the FrameGrid class."""
+
+    def test_same_as_ges(self):
+        project = common.create_project()
+        for framerate in (Gst.Fraction(24000, 1001), Gst.Fraction(25, 1),
+                          Gst.Fraction(30000, 1001), Gst.Fraction(120, 1)):
+            project.videorate = framerate
+            ges_timeline = project.ges_timeline
+            frame_grid = project.frame_grid
+            self.assertEqual(frame_grid.framerate, framerate)
+            self.assertEqual(frame_grid.frame_duration, ges_timeline.get_frame_time(1))
+            for frame in (0, 1, 2, 1001, 123456):
+                self.assertEqual(frame_grid.get_frame_time(frame),
+                                 ges_timeline.get_frame_time(frame))
+            for timestamp in (0, 1, Gst.SECOND - 1, Gst.SECOND, 1234567890123):
+                self.assertEqual(frame_grid.get_frame_at(timestamp),
+                                 ges_timeline.get_frame_at(timestamp))
+
+    def test_snap(self):
+        frame_grid = FrameGrid(Gst.Fraction(25, 1))
+        frame_duration = Gst.SECOND // 25
+        self.assertEqual(frame_grid.snap(0), 0)
+        self.assertEqual(frame_grid.snap(frame_duration), frame_duration)
+        self.assertEqual(frame_grid.snap(frame_duration + 1), frame_duration)
+        self.assertEqual(frame_grid.snap(2 * frame_duration - 1), 2 * frame_duration)
+
+
 class TestEditingContext(common.TestCase):
     """Tests for the EditingContext class."""
 
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Pitivi video editor
+# Copyright (c) 2020, Pitivi contributors
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, see <http://www.gnu.org/licenses/>.
+"""Tests for the pitivi.viewer.overlay module."""
+# pylint: disable=protected-access,no-self-use
+from unittest import mock
+
+from gi.repository import GES
+from gi.repository import Gst
+
+from pitivi.undo.timeline import CommitTimelineFinalizingAction
+from pitivi.undo.undo import UndoableActionLog
+from pitivi.utils.pipeline import Pipeline
+from pitivi.viewer.overlay import Overlay
+from tests import common
+
+
+class TestOverlay(common.TestCase):
+    """Tests for the Overlay class."""
+
+    def test_commit_while_dragging(self):
+        """Checks the timeline is committed on each motion while dragging."""
+        pipe = Pipeline(common.create_pitivi_mock())
+        timeline = GES.Timeline()
+        pipe.set_timeline(timeline)
+        action_log = UndoableActionLog()
+        pipe.set_action_log(action_log)
+
+        stack = mock.Mock()
+        stack.app.project_manager.current_project.pipeline = pipe
+        overlay = Overlay(stack, mock.Mock())
+
+        with mock.patch.object(pipe, "get_state") as get_state:
+            get_state.return_value = (0, Gst.State.PAUSED, 0)
+            with mock.patch.object(timeline, "commit"):
+                # The operation started when pressing the mouse button.
+                with action_log.started("Video position change",
+                                        finalizing_action=CommitTimelineFinalizingAction(pipe)):
+                    for count in range(1, 4):
+                        overlay._commit()
+                        self.assertEqual(pipe.commits_count, count)